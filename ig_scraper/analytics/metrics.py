@@ -1,4 +1,378 @@
-"""Aggregation helpers for dashboard (placeholder)."""
+"""In-process metrics registry for the scraper and dashboard.
 
-def collect_metrics():
-    return {}
+Counters, gauges and histograms are plain dicts keyed by label tuples, so
+recording a sample is a dict update on the event loop with no I/O. The
+registry can be exported as Prometheus text (file or local HTTP endpoint) and
+appended as JSON snapshots that the dashboard turns into per-account trends.
+
+The `account` label defaults to the account bound with `bind_account`, which
+lives in a context variable so concurrent `run_account` tasks do not mix up
+their samples.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger("ig_scraper.metrics")
+
+_current_account: contextvars.ContextVar[str] = contextvars.ContextVar("metrics_account", default="")
+
+_default_history = Path(__file__).resolve().parent.parent / "storage" / "metrics_history.jsonl"
+METRICS_HISTORY_PATH = Path(os.getenv("METRICS_HISTORY_PATH", "").strip() or _default_history)
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "").strip()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or "0")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def bind_account(username: str) -> contextvars.Token:
+    """Attribute samples recorded in the current task to `username`."""
+    return _current_account.set(username or "")
+
+
+def current_account() -> str:
+    return _current_account.get()
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    if "account" in labelnames and "account" not in labels:
+        labels["account"] = _current_account.get()
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Iterable[str], key: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def samples(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(zip(self.labelnames, k)), "value": v} for k, v in dict(self._values).items()]
+
+    def prometheus_lines(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in dict(self._values).items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_label_key(self.labelnames, labels)] = float(value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labelnames, labels)
+        row = self._values.get(key)
+        if row is None:
+            row = [0.0] * (len(self.buckets) + 2)
+            self._values[key] = row
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[idx] += 1
+                break
+        else:
+            row[len(self.buckets)] += 1
+        row[-1] += value
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Dict[str, Any]]:
+        out = []
+        for key, row in dict(self._values).items():
+            count = sum(row[:-1])
+            out.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": count,
+                "sum": row[-1],
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], row[:-1])),
+            })
+        return out
+
+    def prometheus_lines(self) -> List[str]:
+        lines = []
+        for key, row in dict(self._values).items():
+            cumulative = 0.0
+            for bound, n in zip([*map(str, self.buckets), "+Inf"], row[:-1]):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_hist", "_labels", "_start")
+
+    def __init__(self, hist: Histogram, labels: Dict[str, Any]):
+        self._hist = hist
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect(self) -> Dict[str, Any]:
+        return {
+            name: {"type": metric.kind, "help": metric.help, "samples": metric.samples()}
+            for name, metric in list(self._metrics.items())
+        }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+POSTS_WRITTEN = REGISTRY.counter("ig_posts_written_total", "Post payloads sent to the Lens API", ("account", "status"))
+POST_OPENS = REGISTRY.counter("ig_post_opens_total", "Post pages opened", ("account",))
+SCROLLS = REGISTRY.counter("ig_scrolls_total", "Profile grid scroll steps", ("account",))
+GRID_SCROLL = REGISTRY.histogram("ig_grid_scroll_seconds", "Time per grid scroll step until new links, network idle or timeout", ("account", "outcome"))
+PAUSES = REGISTRY.counter("ig_pauses_total", "Humanized pauses taken", ("account",))
+PAUSE_SECONDS = REGISTRY.counter("ig_pause_seconds_total", "Seconds spent in humanized pauses", ("account",))
+TARGETS = REGISTRY.counter("ig_targets_total", "Targets visited by outcome", ("account", "outcome"))
+PAGE_PREFETCH = REGISTRY.counter("ig_page_prefetch_total", "Profile page prefetches by outcome (hit/miss/failed)", ("account", "outcome"))
+EXTRACT_CALLS = REGISTRY.counter(
+    "ig_extract_calls_total", "Extraction bundle calls by function and whether the bundle had to be injected", ("account", "fn", "bundle")
+)
+DOM_PROBES = REGISTRY.counter("ig_dom_probes_total", "Batched selector probes (one evaluate per frame) by call site", ("account", "site"))
+WAITS = REGISTRY.histogram(
+    "ig_wait_seconds",
+    "Event-driven waits until their condition held (met) or timed out",
+    ("account", "site", "outcome"),
+    buckets=(*DEFAULT_BUCKETS, 60.0, 120.0, 300.0),
+)
+BASELINE_CHECKS = REGISTRY.counter(
+    "ig_baseline_checks_total", "UI layout fingerprint checks by outcome (unchanged/new/changed)", ("account", "outcome")
+)
+EXTRACTION_HEALTH = REGISTRY.gauge(
+    "ig_extraction_health", "Run-level rolling average per extraction signal (selector_hits/empty_grids)", ("signal",)
+)
+EXTRACTION_BREAKER_TRIPS = REGISTRY.counter(
+    "ig_extraction_breaker_trips_total", "Extraction-quality breaker trips by scope and signal", ("scope", "signal")
+)
+BUDGET_STOPS = REGISTRY.counter("ig_budget_stops_total", "Targets stopped early because their action budget share ran out", ("account", "action"))
+LEASES = REGISTRY.counter(
+    "ig_target_leases_total",
+    "Cross-node target lease operations by outcome (claimed/reclaimed/held/done/exhausted/completed/released/error)",
+    ("account", "outcome"),
+)
+NODE_THROUGHPUT = REGISTRY.gauge("ig_node_targets_per_minute", "Completed targets per minute per scraper node in the current lease round", ("node",))
+LOGIN_OUTCOMES = REGISTRY.counter("ig_login_outcomes_total", "Instagram login outcomes", ("account", "outcome"))
+API_LATENCY = REGISTRY.histogram("ig_api_request_seconds", "Lens API request latency", ("account", "method", "endpoint", "status"))
+API_RETRIES = REGISTRY.counter("ig_api_retries_total", "Lens API request retries", ("account", "endpoint", "reason"))
+API_BYTES = REGISTRY.counter(
+    "ig_api_bytes_total",
+    "Lens API body bytes by direction (request_raw/request_wire/response_wire/response_decoded)",
+    ("account", "endpoint", "direction", "encoding"),
+)
+API_TOKEN_REFRESH = REGISTRY.histogram(
+    "ig_api_token_refresh_seconds", "Lens API OAuth token grant latency", ("grant", "reason", "outcome")
+)
+API_TOKEN_TTL = REGISTRY.gauge("ig_api_token_ttl_seconds", "Lifetime of the current Lens API access token")
+API_CIRCUIT_OPEN = REGISTRY.gauge("ig_api_circuit_open", "1 while the Lens API circuit breaker is open")
+API_SPOOLED = REGISTRY.counter(
+    "ig_api_spooled_total", "Writes spooled while the Lens API was unhealthy, by outcome", ("account", "endpoint", "outcome")
+)
+API_SPOOL_DEPTH = REGISTRY.gauge("ig_api_spool_depth", "Writes waiting in the Lens API replay spool")
+POST_SPOOL_PENDING = REGISTRY.gauge("ig_post_spool_pending", "Post writes in the on-disk spool not yet acknowledged")
+POST_SPOOL_BYTES = REGISTRY.counter("ig_post_spool_bytes_total", "Bytes appended to the on-disk post spool")
+POST_SPOOL_FSYNC = REGISTRY.histogram(
+    "ig_post_spool_fsync_seconds", "Group fsync latency of the on-disk post spool", buckets=(0.0005, 0.001, 0.0025, *DEFAULT_BUCKETS)
+)
+POST_SPOOL_COMPACTIONS = REGISTRY.counter("ig_post_spool_compactions_total", "Fully acknowledged spool segments deleted")
+EVENTS = REGISTRY.counter("ig_events_total", "Tracked run events", ("account", "event"))
+
+
+def collect_metrics() -> Dict[str, Any]:
+    return REGISTRY.collect()
+
+
+def write_prometheus_textfile(path: Optional[str] = None) -> None:
+    """Write the registry atomically for the node_exporter textfile collector."""
+    target = path or METRICS_TEXTFILE
+    if not target:
+        return
+    p = Path(target)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(REGISTRY.to_prometheus(), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def append_snapshot(path: Optional[Path] = None, **context) -> None:
+    """Append a timestamped registry snapshot as one JSON line."""
+    p = Path(path or METRICS_HISTORY_PATH)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({"ts": time.time(), **context, "metrics": collect_metrics()}, default=str)
+    with p.open("a", encoding="utf-8") as fh:
+        fh.write(line + "\n")
+
+
+def flush(**context) -> None:
+    """Export to every configured sink; failures are reported, never raised."""
+    try:
+        write_prometheus_textfile()
+        append_snapshot(**context)
+    except OSError as exc:
+        logger.warning("Could not export metrics: %s", exc)
+
+
+def load_history(path: Optional[Path] = None, limit: int = 500) -> List[Dict[str, Any]]:
+    p = Path(path or METRICS_HISTORY_PATH)
+    if not p.exists():
+        return []
+    rows: List[Dict[str, Any]] = []
+    with p.open("r", encoding="utf-8") as fh:
+        for line in fh.readlines()[-limit:]:
+            try:
+                rows.append(json.loads(line))
+            except Exception:
+                continue
+    return rows
+
+
+def account_trends(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten snapshots into per-account rows for the dashboard.
+
+    Each row carries posts written, opens, scrolls, API request count and mean
+    API latency for one account at one snapshot.
+    """
+    rows: List[Dict[str, Any]] = []
+    for snap in history:
+        metrics = snap.get("metrics") or {}
+        per_account: Dict[str, Dict[str, float]] = {}
+
+        def _bucket(account: str) -> Dict[str, float]:
+            return per_account.setdefault(account or "-", {
+                "posts_written": 0.0, "opens": 0.0, "scrolls": 0.0,
+                "api_requests": 0.0, "api_seconds": 0.0,
+            })
+
+        for name, field in (
+            ("ig_posts_written_total", "posts_written"),
+            ("ig_post_opens_total", "opens"),
+            ("ig_scrolls_total", "scrolls"),
+        ):
+            for sample in (metrics.get(name) or {}).get("samples", []):
+                labels = sample.get("labels", {})
+                if name == "ig_posts_written_total" and labels.get("status") != "ok":
+                    continue
+                _bucket(labels.get("account", ""))[field] += float(sample.get("value", 0))
+        for sample in (metrics.get("ig_api_request_seconds") or {}).get("samples", []):
+            bucket = _bucket(sample.get("labels", {}).get("account", ""))
+            bucket["api_requests"] += float(sample.get("count", 0))
+            bucket["api_seconds"] += float(sample.get("sum", 0))
+
+        for account, values in per_account.items():
+            requests = values["api_requests"]
+            rows.append({
+                "ts": snap.get("ts"),
+                "account": account,
+                "posts_written": values["posts_written"],
+                "opens": values["opens"],
+                "scrolls": values["scrolls"],
+                "api_requests": requests,
+                "api_latency_avg_s": (values["api_seconds"] / requests) if requests else None,
+            })
+    return rows
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = REGISTRY.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """Serve `/metrics` on localhost from a daemon thread when a port is set."""
+    port = port if port is not None else METRICS_PORT
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as exc:
+        # e.g. another instance still holds the port; metrics are optional.
+        logger.warning("Metrics endpoint disabled: cannot listen on port %s: %s", port, exc)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -1,4 +1,14 @@
-"""Run and event logging (placeholder)."""
+"""Run and event logging."""
+
+import logging
+
+from analytics import metrics
+
+
+logger = logging.getLogger("ig_scraper.tracking")
+
 
 def log_event(event):
-    print(event)
+    name = event.get("event") or event.get("type") if isinstance(event, dict) else None
+    metrics.EVENTS.inc(event=str(name or "generic"))
+    logger.info("%s", event, extra={"event": str(name or "generic")})
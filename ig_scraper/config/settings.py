@@ -16,8 +16,8 @@ load_dotenv(_PROJECT_ROOT / ".env", override=False)
 BASE_URL = "https://www.instagram.com"
 HEADLESS = os.getenv("HEADLESS", "1").strip().lower() in {"1", "true", "yes"}
 
-MIN_DELAY = 1.2
-MAX_DELAY = 4.0
+MIN_DELAY = float(os.getenv("PAUSE_MIN_DELAY", "1.2") or "1.2")
+MAX_DELAY = max(MIN_DELAY, float(os.getenv("PAUSE_MAX_DELAY", "4.0") or "4.0"))
 
 ACTION_LIMITS = {
 	"scrolls": int(os.getenv("BUDGET_SCROLLS", "0") or "0"),
@@ -30,6 +30,16 @@ ACTIVE_HOURS = (
 	int(os.getenv("ACTIVE_HOURS_END", "24")),
 )
 MAX_WORKERS = max(1, int(os.getenv("MAX_WORKERS", "2")))
+# Worker processes for concurrent (non-rotating) account runs; each gets its own
+# event loop and browser, MAX_WORKERS is split across them (1 = single process).
+RUN_PROCESSES = max(1, int(os.getenv("RUN_PROCESSES", "1") or "1"))
+# Per-account bound on streamed targets waiting to be scraped (0 = unbounded).
+TARGET_QUEUE_SIZE = max(0, int(os.getenv("TARGET_QUEUE_SIZE", "500") or "500"))
+# Pages kept per browser context; with 2+ the next target's profile is loaded
+# on a spare page while the current one is scraped (1 = single page).
+PAGE_POOL_SIZE = max(1, int(os.getenv("PAGE_POOL_SIZE", "2") or "2"))
+# name=value pairs pre-set on instagram.com so the cookie banner never shows.
+CONSENT_COOKIES = os.getenv("CONSENT_COOKIES", "ig_cb=2").strip()
 # If True, the scraper will attempt to load more comments by clicking
 # "View all comments" / "Load more comments" buttons when scraping posts.
 # Enabling deep comment loading increases runtime and interaction volume.
@@ -0,0 +1,102 @@
+"""Per-account run statistics feeding `core.reputation`.
+
+`score_account` reads `success_rate`, `failures` and `last_success` from the
+account dict, but nothing produced those fields. This module keeps them in the
+run-state file under `account_stats` (keyed by username), updates them from
+`run_account` outcomes and merges them back onto account configs before
+rotation so selection and failover order can rank accounts by reputation.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+STATS_KEY = "account_stats"
+
+# Weight of the newest run in the exponentially-weighted success rate.
+SUCCESS_RATE_ALPHA = min(1.0, max(0.01, float(os.getenv("ACCOUNT_STATS_ALPHA", "0.3") or "0.3")))
+
+# Outcomes that say nothing about account health and are not recorded.
+# Markup breakage is not the account's fault (see core.health).
+NEUTRAL_OUTCOMES = {"skipped_missing_username", "skipped_cooldown", "extraction_degraded"}
+
+STAT_FIELDS = ("success_rate", "failures", "last_success")
+
+
+def load_account_stats(state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    stats = state.get(STATS_KEY) if isinstance(state, dict) else None
+    if not isinstance(stats, dict):
+        return {}
+    return {k: v for k, v in stats.items() if isinstance(v, dict)}
+
+
+def apply_account_stats(accounts: List[Dict], stats: Dict[str, Dict[str, Any]]) -> List[Dict]:
+    """Merge recorded stats onto account configs (config values are not overwritten)."""
+    merged: List[Dict] = []
+    for account in accounts:
+        entry = stats.get(account.get("username", "")) or {}
+        combined = dict(account)
+        for field in STAT_FIELDS:
+            if field in entry and field not in account:
+                combined[field] = entry[field]
+        merged.append(combined)
+    return merged
+
+
+def _run_success_ratio(run_stats: Optional[Dict[str, Any]]) -> float:
+    if not isinstance(run_stats, dict):
+        return 1.0
+    processed = int(run_stats.get("processed_targets", 0) or 0)
+    errors = int(run_stats.get("target_errors", 0) or 0)
+    attempted = processed + errors
+    if attempted <= 0:
+        return 1.0
+    return processed / attempted
+
+
+def record_account_outcome(
+    stats: Dict[str, Dict[str, Any]],
+    username: str,
+    outcome: Any,
+    run_stats: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """Fold one `run_account` outcome into `stats[username]` and return the entry.
+
+    `outcome` is the string returned by `run_account` (or the exception raised
+    by it). "ok" counts as a success weighted by the per-target error ratio in
+    `run_stats`; any other non-neutral outcome counts as a failure.
+    """
+    if not username:
+        return None
+    if isinstance(outcome, str) and outcome in NEUTRAL_OUTCOMES:
+        return None
+
+    entry = stats.setdefault(username, {})
+    previous_rate = entry.get("success_rate")
+    now = datetime.utcnow().isoformat()
+
+    if outcome == "ok":
+        observed = _run_success_ratio(run_stats)
+        # A run whose every target errored produced nothing; it earns no recency bonus.
+        if observed > 0:
+            entry["failures"] = 0
+            entry["last_success"] = now
+    else:
+        observed = 0.0
+        entry["failures"] = int(entry.get("failures", 0) or 0) + 1
+        entry["last_failure"] = now
+        entry["last_failure_reason"] = outcome if isinstance(outcome, str) else type(outcome).__name__
+
+    if isinstance(previous_rate, (int, float)):
+        rate = (1 - SUCCESS_RATE_ALPHA) * float(previous_rate) + SUCCESS_RATE_ALPHA * observed
+    else:
+        rate = observed
+    entry["success_rate"] = round(rate, 4)
+    entry["runs"] = int(entry.get("runs", 0) or 0) + 1
+
+    if isinstance(run_stats, dict):
+        entry["processed_targets"] = int(entry.get("processed_targets", 0) or 0) + int(run_stats.get("processed_targets", 0) or 0)
+        entry["target_errors"] = int(entry.get("target_errors", 0) or 0) + int(run_stats.get("target_errors", 0) or 0)
+
+    return entry
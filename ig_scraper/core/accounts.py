@@ -5,8 +5,15 @@ accounts with higher reputation (from `core.reputation`) and avoids accounts
 that are marked as on cooldown (optionally by checking `account.get('cooldown')`).
 The function is intentionally synchronous and lightweight — async cooldown
 checks are handled elsewhere when needed.
+
+`rank_accounts` orders a whole pool for rotation and failover: accounts whose
+score is close to the best one keep rotating round-robin, while accounts that
+keep failing drop to the back of the queue. Accounts without recorded stats
+are scored at the pool's mean, so one good run elsewhere does not push them
+out of the rotation.
 """
 
+import os
 import random
 from typing import List, Optional, Dict
 from . import reputation
@@ -40,3 +47,44 @@ def pick_account(pool: List[Dict]) -> Optional[Dict]:
     scored.sort(key=lambda t: (t[0], t[1]), reverse=True)
     return scored[0][2]
 
+
+# Accounts scoring within this margin of the best account share the rotation.
+ROTATION_MARGIN = float(os.getenv("REPUTATION_ROTATION_MARGIN", "0.5") or "0.5")
+
+# Fields written by `core.account_stats`; an account with none of them has no history yet.
+_STAT_FIELDS = ("success_rate", "failures", "last_success")
+
+
+def _safe_score(account: Dict) -> float:
+    try:
+        return float(reputation.score_account(account) or 0)
+    except Exception:
+        return 0.0
+
+
+def rank_accounts(pool: List[Dict], rotation_offset: int = 0, margin: float = ROTATION_MARGIN) -> List[Dict]:
+    """Return `pool` ordered for selection and failover.
+
+    - Disabled accounts are dropped.
+    - Accounts within `margin` of the best score form the healthy tier and are
+      rotated by `rotation_offset` so load still spreads across them.
+    - The remaining accounts follow, best score first.
+    """
+    candidates = [a for a in (pool or []) if not a.get("disabled")]
+    if not candidates:
+        return []
+
+    scores = [_safe_score(a) for a in candidates]
+    known = [s for a, s in zip(candidates, scores) if any(f in a for f in _STAT_FIELDS)]
+    if known and len(known) < len(scores):
+        prior = sum(known) / len(known)
+        scores = [s if any(f in a for f in _STAT_FIELDS) else max(s, prior) for a, s in zip(candidates, scores)]
+    best = max(scores)
+    healthy = [a for a, s in zip(candidates, scores) if s >= best - margin]
+    degraded = sorted(
+        ((s, idx, a) for idx, (a, s) in enumerate(zip(candidates, scores)) if s < best - margin),
+        key=lambda t: (-t[0], t[1]),
+    )
+
+    offset = max(0, int(rotation_offset or 0)) % len(healthy)
+    return [*healthy[offset:], *healthy[:offset], *(a for _, _, a in degraded)]
@@ -1,8 +1,12 @@
 import asyncio, random
 from config.settings import MIN_DELAY, MAX_DELAY
+from analytics import metrics
 
 async def pause(mult=1.0):
-    await asyncio.sleep(random.uniform(MIN_DELAY, MAX_DELAY) * mult)
+    delay = random.uniform(MIN_DELAY, MAX_DELAY) * mult
+    metrics.PAUSES.inc()
+    metrics.PAUSE_SECONDS.inc(delay)
+    await asyncio.sleep(delay)
 
 async def scroll(page, steps=2):
     for _ in range(steps):
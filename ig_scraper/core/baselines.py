@@ -1,21 +1,113 @@
-import hashlib
-from storage import api_client
+"""UI baseline drift detection.
+
+The extraction bundle fingerprints the DOM skeleton behind each extraction
+selector in the page. A fingerprint covers tag names, roles and attribute
+names, with text and attribute values stripped and repeated siblings
+collapsed. A new post or a changed like count therefore leaves it unchanged;
+a reworked layout or a selector that stops matching does not.
+
+`observe` compares fingerprints with the variants already seen for each
+selector (kept in `BASELINE_STATE_PATH`). It writes to `/api/app/baselines`
+only when a selector shows a fingerprint it has never shown before. A
+selector can legitimately alternate between a few variants (e.g. private vs.
+public profiles), so up to `BASELINE_VARIANTS` are remembered per selector.
+Saving merges with the file under a lock, since every process of a
+`RUN_PROCESSES` run observes pages of its own.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage import api_client, serialization
 from datetime import datetime
 from config.settings import ENABLE_BASELINE_WRITE
 from core.background import create_logged_task
+from core.log import get_logger
+from analytics import metrics
+
+
+BASELINE_STATE_PATH = Path(
+    os.getenv("BASELINE_STATE_PATH", "").strip()
+    or Path(__file__).resolve().parent.parent / "storage" / "baselines.json"
+)
+BASELINE_VARIANTS = max(1, int(os.getenv("BASELINE_VARIANTS", "8") or "8"))
+
+logger = get_logger("baselines")
+
+_known: Optional[Dict[str, List[str]]] = None
+
+
+def _parse(data) -> Dict[str, List[str]]:
+    return {
+        str(k): [str(x) for x in v]
+        for k, v in (data.items() if isinstance(data, dict) else ())
+        if isinstance(v, list)
+    }
+
+
+def _load() -> Dict[str, List[str]]:
+    global _known
+    if _known is None:
+        _known = _parse(serialization.read_state(BASELINE_STATE_PATH))
+    return _known
+
+
+def observe(fingerprints: Dict[str, str]) -> int:
+    """Record fingerprints from one page; returns how many selectors showed a new layout."""
+    if not ENABLE_BASELINE_WRITE or not isinstance(fingerprints, dict):
+        return 0
+
+    known = _load()
+    changed = 0
+    for selector, fingerprint in fingerprints.items():
+        if not fingerprint:
+            continue
+        variants = known.setdefault(selector, [])
+        if fingerprint in variants:
+            # Most recent first, so the cap evicts variants not seen for a while.
+            if variants[0] != fingerprint:
+                variants.remove(fingerprint)
+                variants.insert(0, fingerprint)
+            metrics.BASELINE_CHECKS.inc(outcome="unchanged")
+            continue
+        outcome = "changed" if variants else "new"
+        if variants:
+            logger.warning("UI layout change for %s: %s -> %s", selector, variants[0], fingerprint)
+        variants.insert(0, fingerprint)
+        del variants[BASELINE_VARIANTS:]
+        metrics.BASELINE_CHECKS.inc(outcome=outcome)
+        record(selector, fingerprint)
+        changed += 1
+
+    if changed:
+        seen = {selector: known[selector] for selector, fingerprint in fingerprints.items() if fingerprint}
+
+        def merge(data) -> Dict[str, List[str]]:
+            merged = _parse(data)
+            for selector, variants in seen.items():
+                # This page's variants lead; ones only other processes saw keep their order after them.
+                saved = merged.get(selector, [])
+                merged[selector] = (variants + [v for v in saved if v not in variants])[:BASELINE_VARIANTS]
+            return merged
+
+        try:
+            known.update(serialization.update_state(BASELINE_STATE_PATH, merge))
+        except OSError as e:
+            logger.warning("Failed to save UI baselines: %s", e)
+    return changed
+
 
-def record(selector, html):
+def record(selector, h):
+    """Send a selector's fingerprint to the baselines API."""
     if not ENABLE_BASELINE_WRITE:
         return
 
-    h = hashlib.md5(html.encode()).hexdigest()
     try:
         create_logged_task(
             api_client.record_baseline(selector, h, datetime.utcnow().isoformat()),
             f"record baseline for {selector}",
         )
     except RuntimeError:
-        # fallback: just warn locally
-        print("UI BASELINE (local):", selector)
-    # keep local logging for immediate visibility
-    # if remote detects change it can alert/flag
+        # No running loop: the change is only in the local state file.
+        logger.warning("UI baseline for %s recorded locally only (no event loop to send it)", selector)
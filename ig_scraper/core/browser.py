@@ -1,8 +1,19 @@
 from playwright.async_api import async_playwright
 from config.settings import HEADLESS
+from core import extract
 import os
 
 
+# Async callables awaited with every new browser context (e.g. request routing
+# for the offline simulation harness in `sim/`).
+CONTEXT_HOOKS = []
+
+
+def register_context_hook(hook) -> None:
+    if hook not in CONTEXT_HOOKS:
+        CONTEXT_HOOKS.append(hook)
+
+
 def _build_chromium_args() -> list[str]:
     args = [
         "--disable-blink-features=AutomationControlled",
@@ -48,5 +59,9 @@ async def start_browser(session_dir):
 
     ctx.set_default_timeout(default_action_timeout_ms)
     ctx.set_default_navigation_timeout(default_nav_timeout_ms)
+    # Extraction functions are compiled once per document instead of per evaluate.
+    await extract.install(ctx, ctx.pages)
+    for hook in CONTEXT_HOOKS:
+        await hook(ctx)
     page = ctx.pages[0] if ctx.pages else await ctx.new_page()
     return pw, ctx, page
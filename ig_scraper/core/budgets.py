@@ -1,14 +1,192 @@
-class Budget:
-    def __init__(self, limits):
-        self.limits = limits or {}
-        self.used = {k: 0 for k in self.limits}
+"""Action budgets.
+
+`ACTION_LIMITS` caps the scrolls, clicks and post opens of one account run.
+`BudgetPlanner` divides that allowance between the account's targets instead
+of letting the first busy profiles use it all up:
+
+- each target gets a `Budget` sized by its expected yield, an exponential
+  moving average of the new posts it produced on earlier visits (kept in
+  `BUDGET_YIELD_STATE_PATH`; unknown targets get the average);
+- the share is taken from what is still unspent, weighed against the targets
+  expected after it (the list length, or for a streamed list the number the
+  account saw last run), so whatever one target leaves over goes to the rest;
+- `close` merges the yields this planner observed into the file under a lock,
+  so processes of a `RUN_PROCESSES` run do not overwrite each other's;
+- every action also takes a token from the process-wide `RATE` bucket
+  (`BUDGET_ACTIONS_PER_MINUTE`, 0 = unthrottled), which paces all accounts
+  of the process together.
+
+A used-up share is a normal outcome: `Budget.spend` returns False, and
+`scrape_posts` stops that target and moves on.
+"""
+
+import asyncio
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from storage import serialization
+from core.log import get_logger
+
+
+BUDGET_YIELD_STATE_PATH = Path(
+    os.getenv("BUDGET_YIELD_STATE_PATH", "").strip()
+    or Path(__file__).resolve().parent.parent / "storage" / "yields.json"
+)
+BUDGET_YIELD_ALPHA = min(1.0, max(0.01, float(os.getenv("BUDGET_YIELD_ALPHA", "0.3") or "0.3")))
+# Every target gets at least this many of each action while the account has any left.
+BUDGET_TARGET_MIN = max(0, int(os.getenv("BUDGET_TARGET_MIN", "1") or "1"))
+BUDGET_ACTIONS_PER_MINUTE = max(0.0, float(os.getenv("BUDGET_ACTIONS_PER_MINUTE", "0") or "0"))
+BUDGET_ACTIONS_BURST = max(1, int(os.getenv("BUDGET_ACTIONS_BURST", "10") or "10"))
+
+# Keeps zero-yield targets from being starved outright.
+_MIN_YIELD = 0.1
+
+logger = get_logger("budgets")
+
+_state: Optional[Dict[str, Dict[str, float]]] = None
+
+
+def _parse(data) -> Dict[str, Dict[str, float]]:
+    data = data if isinstance(data, dict) else {}
+    return {
+        section: {str(k): float(v) for k, v in (data.get(section) or {}).items() if isinstance(v, (int, float))}
+        for section in ("targets", "accounts")
+    }
+
+
+def _load() -> Dict[str, Dict[str, float]]:
+    global _state
+    if _state is None:
+        _state = _parse(serialization.read_state(BUDGET_YIELD_STATE_PATH))
+    return _state
+
+
+def _ema(previous: Optional[float], new_posts: int) -> float:
+    if previous is None:
+        return float(new_posts)
+    return (1 - BUDGET_YIELD_ALPHA) * previous + BUDGET_YIELD_ALPHA * new_posts
+
 
-    def consume(self, key):
-        limit = self.limits.get(key)
-        if limit is None or limit <= 0:
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        if self.rate <= 0:
             return
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+RATE = TokenBucket(BUDGET_ACTIONS_PER_MINUTE, BUDGET_ACTIONS_BURST)
 
+
+class Budget:
+    """Action allowance of one target; `None` means the action is not limited."""
+
+    def __init__(self, shares: Dict[str, Optional[int]], rate: TokenBucket = RATE):
+        self.shares = shares
+        self.used = {k: 0 for k in shares}
+        self.rate = rate
+        self.exhausted = ""
+
+    async def spend(self, key: str) -> bool:
+        """Take one `key` action; False once this target's share of it is used up."""
+        share = self.shares.get(key)
         used = self.used.get(key, 0)
-        if used >= limit:
-            raise RuntimeError(f"Budget exceeded: {key}")
+        if share is not None and used >= share:
+            self.exhausted = self.exhausted or key
+            return False
         self.used[key] = used + 1
+        await self.rate.take()
+        return True
+
+
+class BudgetPlanner:
+    """Splits an account run's `ACTION_LIMITS` over its targets by expected yield."""
+
+    def __init__(self, limits: Dict[str, int], username: str, expected_targets: Optional[int] = None):
+        self.username = username
+        self.remaining = {k: int(v) for k, v in (limits or {}).items() if v and v > 0}
+        self.unlimited = [k for k, v in (limits or {}).items() if not v or v <= 0]
+        state = _load()
+        if expected_targets is None:
+            expected_targets = int(state["accounts"].get(username, 0))
+        self.expected_targets = expected_targets
+        self.started = 0
+        self.yields = state["targets"]
+        # New-post counts observed by this planner, replayed onto the file's estimates in `close`.
+        self.observed: Dict[str, List[int]] = {}
+        self.mean_yield = max(_MIN_YIELD, sum(self.yields.values()) / len(self.yields)) if self.yields else 1.0
+
+    @property
+    def exhausted(self) -> bool:
+        """True once no further target could open a post."""
+        if not self.remaining:
+            return False
+        if self.remaining.get("opens") == 0:
+            return True
+        return all(v <= 0 for v in self.remaining.values())
+
+    def expected_yield(self, source_id: str) -> float:
+        return max(_MIN_YIELD, self.yields.get(source_id, self.mean_yield))
+
+    def for_target(self, source_id: str) -> Budget:
+        self.started += 1
+        weight = self.expected_yield(source_id)
+        # Without an estimate of what is still to come, the target may use everything left.
+        ahead = max(0, self.expected_targets - self.started)
+        fraction = weight / (weight + self.mean_yield * ahead)
+        shares: Dict[str, Optional[int]] = {k: None for k in self.unlimited}
+        for key, left in self.remaining.items():
+            shares[key] = min(left, max(BUDGET_TARGET_MIN, math.floor(left * fraction))) if left > 0 else 0
+        return Budget(shares)
+
+    def settle(self, budget: Budget, source_id: str, new_posts: Optional[int]) -> None:
+        """Charge what `budget` used; `new_posts=None` (target failed) leaves its yield estimate alone."""
+        for key in self.remaining:
+            self.remaining[key] = max(0, self.remaining[key] - budget.used.get(key, 0))
+        if source_id and new_posts is not None:
+            self.yields[source_id] = _ema(self.yields.get(source_id), new_posts)
+            self.observed.setdefault(source_id, []).append(new_posts)
+
+    def close(self, targets_seen: int) -> None:
+        """Remember the account's target count and merge this run's yields into the saved estimates."""
+
+        def merge(data) -> Dict[str, Dict[str, float]]:
+            merged = _parse(data)
+            for source_id, counts in self.observed.items():
+                estimate = merged["targets"].get(source_id)
+                for new_posts in counts:
+                    estimate = _ema(estimate, new_posts)
+                merged["targets"][source_id] = estimate
+            if targets_seen:
+                # A run cut short by its budget did not see the whole list.
+                previous = merged["accounts"].get(self.username, 0) if self.exhausted else 0
+                merged["accounts"][self.username] = max(targets_seen, int(previous))
+            return merged
+
+        try:
+            merged = serialization.update_state(BUDGET_YIELD_STATE_PATH, merge)
+        except OSError as e:
+            logger.warning("Failed to save target yields: %s", e)
+            return
+        self.observed = {}
+        # Pick up what other processes saved; planners still open keep their own observations.
+        state = _load()
+        for section in ("targets", "accounts"):
+            state[section].update(merged[section])
@@ -6,11 +6,22 @@ click any "View more comments" / "Load more comments" buttons a few
 times to reveal additional comments.
 """
 
-from typing import List, Dict, Any
+from typing import List
 from config.settings import DEEP_COMMENT_LOADING
+from core import extract, waits
+from core.probe import first_match
+from core.records import Comment
 
 
-async def list_comments(page, deep: bool = False, max_comments: int = 200) -> List[Dict[str, Any]]:
+COMMENT_EXPANDERS = (
+    'button:has-text("View all comments")',
+    'button:has-text("Load more comments")',
+    'text=View all comments',
+)
+COMMENT_EXPAND_TIMEOUT_SECONDS = 3
+
+
+async def list_comments(page, deep: bool = False, max_comments: int = 200) -> List[Comment]:
     """Extract a list of comments from the current post page/context.
 
     Parameters:
@@ -18,51 +29,40 @@ async def list_comments(page, deep: bool = False, max_comments: int = 200) -> Li
     - `deep`: attempt to expand additional comments by clicking view-more buttons
     - `max_comments`: upper bound on comments to return
 
-    Returns a list of dicts: {"author": str, "text": str}
+    Returns a list of `Comment` records.
     """
     try:
         # optionally try to expand more comments
         if deep or DEEP_COMMENT_LOADING:
             for _ in range(6):
                 try:
-                    # common Instagram label variants
-                    btn = await page.query_selector('button:has-text("View all comments")')
-                    if not btn:
-                        btn = await page.query_selector('button:has-text("Load more comments")')
-                    if not btn:
-                        btn = await page.query_selector('text=View all comments')
+                    # common Instagram label variants, checked in one round-trip
+                    btn = await first_match(page, COMMENT_EXPANDERS, "comments")
                     if not btn:
                         break
-                    await btn.click()
-                    await page.wait_for_timeout(300)
+                    before = await extract.call(page, "commentNodeCount") or 0
+                    await page.click(btn, timeout=2000)
+                    # Continue as soon as the new comments render; stop if none arrive.
+                    if not await waits.for_function(
+                        page,
+                        "([sel, before]) => document.querySelectorAll(sel).length > before",
+                        [extract.SELECTORS["comment_nodes"], before],
+                        COMMENT_EXPAND_TIMEOUT_SECONDS,
+                        "comments_expand",
+                    ):
+                        break
                 except Exception:
                     break
 
         # evaluate DOM for comment nodes
-        comments = await page.evaluate("""
-        () => {
-            const out = [];
-            // Comments are often inside nested ULs under the article/dialog
-            const nodes = document.querySelectorAll('ul ul li');
-            for (const n of nodes) {
-                try {
-                    const author = n.querySelector('a')?.innerText || n.querySelector('h3')?.innerText || '';
-                    const span = n.querySelector('span');
-                    const text = span ? span.innerText : n.innerText || '';
-                    // ignore very short or empty nodes
-                    if (text && text.trim().length>0) out.push({author: author.trim(), text: text.trim()});
-                } catch(e) { /* continue */ }
-            }
-            return out;
-        }
-        """
-        )
+        comments = await extract.call(page, "comments")
 
         if not isinstance(comments, list):
             return []
 
         # Apply max_comments limit
-        return comments[:max_comments]
+        records = [c for c in map(Comment.from_raw, comments) if c is not None]
+        return records[:max_comments]
     except Exception:
         return []
 
@@ -0,0 +1,443 @@
+"""In-page extraction bundle.
+
+Every DOM extraction the scraper runs (post fields, grid links, comments,
+profile header, selector probes, login-page clicks) lives in one script. It
+is installed once per browser context with `add_init_script` under a
+versioned global, `__igExtract_<version>`. `call(scope, name, arg)` then
+invokes a function by name with a small argument instead of shipping the
+whole function source, which the page would compile again, on every
+`evaluate`.
+
+All selectors are in `SELECTORS`. The version is a hash of the bundle
+source including the selectors, so changing a selector changes the
+namespace and an old copy in a long-lived page is never used by mistake.
+`BASELINE_KEYS` lists the selectors whose DOM skeleton `post` and
+`snapshot` fingerprint for `core.baselines` when asked to.
+A scope that does not have the bundle (a frame that existed before the init
+script was registered) gets it injected on first use.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Iterable
+
+from analytics import metrics
+
+
+SELECTORS = {
+    # Post page, in preference order.
+    "caption": [
+        "article h1",
+        "h1",
+        "article ul li h1",
+        'article ul li div[dir="auto"] span',
+        "article ul li span",
+    ],
+    "likes": [
+        'section a[href*="liked_by"] span',
+        "section span[title]",
+        "section span",
+    ],
+    "og_description": 'meta[property="og:description"]',
+    "meta_description": 'meta[name="description"]',
+    "ld_json": 'script[type="application/ld+json"]',
+    "published_at": "time[datetime]",
+    "comment_count": "ul ul li, article ul ul li",
+    # Comments under the article or dialog.
+    "comment_nodes": "ul ul li",
+    # Profile grid and header.
+    "grid_links": 'a[href*="/p/"], a[href*="/reel/"], a[data-testid="user-post-item"]',
+    "profile_root": "main",
+    "profile_bio": "header section div span",
+    "profile_followers": "a[href$='/followers/'] span",
+    "profile_following": "a[href$='/following/'] span",
+    # Login page.
+    "clickable_text": 'button, a, [role="button"], div, span',
+    "login_form": "form",
+}
+
+# Selectors whose DOM skeleton is fingerprinted for UI baselines (core.baselines), per page type.
+BASELINE_KEYS = {
+    "profile": ["profile_root", "profile_bio", "profile_followers", "profile_following", "grid_links"],
+    "post": ["caption", "likes", "published_at", "comment_nodes", "og_description"],
+}
+FINGERPRINT_DEPTH = int(os.getenv("FINGERPRINT_DEPTH", "6") or "6")
+
+_BUNDLE_TEMPLATE = r"""
+(() => {
+    const NS = __NAMESPACE__;
+    if (globalThis[NS]) return;
+    const S = __SELECTORS__;
+
+    const norm = (s) => String(s || '').replace(/\s+/g, ' ').trim().toLowerCase();
+    const clean = (value) => (value ? String(value).replace(/\s+/g, ' ').trim() : '');
+    const text = (el) => (el && el.innerText ? el.innerText : '').trim();
+    const attr = (el, key) => (el && el.getAttribute ? (el.getAttribute(key) || '') : '').trim();
+    const first = (selectors) => {
+        for (const sel of selectors) {
+            const el = document.querySelector(sel);
+            if (el) return el;
+        }
+        return null;
+    };
+    const firstNonEmpty = (values) => {
+        for (const value of values) {
+            const current = clean(value);
+            if (current) return current;
+        }
+        return '';
+    };
+    const normalizeMetaDescription = (value) => {
+        const current = clean(value);
+        if (!current) return '';
+        const idx = current.indexOf(': "');
+        if (idx >= 0 && current.endsWith('"')) return clean(current.slice(idx + 3, -1));
+        return current;
+    };
+    const numberFrom = (raw) => {
+        if (!raw) return 0;
+        const cleaned = raw.replace(/,/g, '').trim();
+        if (/^\d+(\.\d+)?[kKmMbB]$/.test(cleaned)) {
+            const n = parseFloat(cleaned.slice(0, -1));
+            const u = cleaned.slice(-1).toLowerCase();
+            if (u === 'k') return Math.round(n * 1000);
+            if (u === 'm') return Math.round(n * 1000000);
+            if (u === 'b') return Math.round(n * 1000000000);
+        }
+        const n = Number(cleaned.replace(/[^0-9.]/g, ''));
+        return Number.isFinite(n) ? n : 0;
+    };
+    const ldJsonCaption = () => {
+        try {
+            for (const script of document.querySelectorAll(S.ld_json)) {
+                const raw = script.textContent || '';
+                if (!raw.trim()) continue;
+                const parsed = JSON.parse(raw);
+                for (const node of (Array.isArray(parsed) ? parsed : [parsed])) {
+                    if (!node || typeof node !== 'object') continue;
+                    const maybeCaption =
+                        node.caption ||
+                        node.articleBody ||
+                        (node.description && !String(node.description).includes('Instagram photos and videos'));
+                    if (maybeCaption) return clean(maybeCaption);
+                }
+            }
+        } catch (_) {}
+        return '';
+    };
+    // cyrb53: a fast 53-bit string hash, returned as hex.
+    const hash = (str) => {
+        let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+        for (let i = 0; i < str.length; i++) {
+            const ch = str.charCodeAt(i);
+            h1 = Math.imul(h1 ^ ch, 2654435761);
+            h2 = Math.imul(h2 ^ ch, 1597334677);
+        }
+        h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+        h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+        return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16);
+    };
+    // Tag, role and attribute names only; sibling subtrees with the same shape count once.
+    const skeleton = (el, depth) => {
+        const attrs = el.getAttributeNames().filter((n) => n !== 'style').sort().join(',');
+        const role = el.getAttribute('role');
+        let out = el.tagName.toLowerCase() + (role ? '[' + role + ']' : '') + '{' + attrs + '}';
+        if (depth > 0 && el.children.length) {
+            const kinds = new Set();
+            for (const child of el.children) kinds.add(skeleton(child, depth - 1));
+            out += '(' + Array.from(kinds).join('') + ')';
+        }
+        return out;
+    };
+    const fingerprints = (opts) => {
+        if (!opts || !opts.keys) return undefined;
+        const out = {};
+        for (const key of opts.keys) {
+            const list = Array.isArray(S[key]) ? S[key] : [S[key]];
+            out[key] = 'missing';
+            for (let i = 0; i < list.length; i++) {
+                const el = document.querySelector(list[i]);
+                if (!el) continue;
+                // Which fallback matched is part of the layout signal.
+                out[key] = (list.length > 1 ? i + ':' : '') + hash(skeleton(el, opts.depth));
+                break;
+            }
+        }
+        return out;
+    };
+    const waitForSelector = (sel, timeoutMs) => new Promise((resolve) => {
+        if (document.querySelector(sel)) return resolve(true);
+        const observer = new MutationObserver(() => {
+            if (document.querySelector(sel)) done(true);
+        });
+        const timer = setTimeout(() => done(false), timeoutMs);
+        const done = (found) => {
+            observer.disconnect();
+            clearTimeout(timer);
+            resolve(found);
+        };
+        observer.observe(document.documentElement, {childList: true, subtree: true});
+    });
+    const pageState = () => {
+        const path = location.pathname.toLowerCase();
+        if (path.startsWith('/accounts/login')) return 'login';
+        if (path.includes('/challenge/') || path.includes('/checkpoint/')) return 'challenge';
+        return 'ok';
+    };
+    const publishedAt = () => {
+        const timeEl = document.querySelector(S.published_at);
+        return timeEl ? (timeEl.getAttribute('datetime') || '') : '';
+    };
+
+    const api = {
+        version: __VERSION__,
+
+        post(opts) {
+            const caption = firstNonEmpty([
+                text(first(S.caption)),
+                ldJsonCaption(),
+                normalizeMetaDescription(attr(document.querySelector(S.og_description), 'content')),
+                normalizeMetaDescription(attr(document.querySelector(S.meta_description), 'content')),
+            ]);
+            const misses = Object.entries({
+                caption: first(S.caption),
+                likes: first(S.likes),
+                published_at: document.querySelector(S.published_at),
+            }).filter(([, el]) => !el).map(([key]) => key);
+            return {
+                post_id: location.pathname.replace(/\/$/, ''),
+                caption,
+                likes: numberFrom(text(first(S.likes))),
+                comments: document.querySelectorAll(S.comment_count).length,
+                published_at: publishedAt(),
+                fingerprints: fingerprints(opts && opts.fingerprint),
+                // Post selectors that matched nothing, for core.health.
+                selector_misses: misses,
+            };
+        },
+
+        publishedAt,
+
+        comments() {
+            const out = [];
+            for (const n of document.querySelectorAll(S.comment_nodes)) {
+                try {
+                    const author = n.querySelector('a')?.innerText || n.querySelector('h3')?.innerText || '';
+                    const span = n.querySelector('span');
+                    const body = span ? span.innerText : n.innerText || '';
+                    if (body && body.trim().length > 0) out.push({author: author.trim(), text: body.trim()});
+                } catch (e) { /* continue */ }
+            }
+            return out;
+        },
+
+        commentNodeCount() {
+            return document.querySelectorAll(S.comment_nodes).length;
+        },
+
+        profile() {
+            const count = (sel) => Number((document.querySelector(sel)?.innerText || '').replace(/,/g, '')) || 0;
+            return {
+                bio: document.querySelector(S.profile_bio)?.innerText || '',
+                followers: count(S.profile_followers),
+                following: count(S.profile_following),
+            };
+        },
+
+        // Everything the runner needs from a freshly opened profile page in one call:
+        // page state, layout fingerprints, profile fields and the first grid links.
+        async snapshot({waitMs, grid, fingerprint}) {
+            const state = pageState();
+            if (state !== 'ok') return {state};
+            await waitForSelector(S.profile_root, waitMs);
+            const main = document.querySelector(S.profile_root);
+            const root = main || document.body;
+            return {
+                state,
+                root: main ? 'main' : (root ? 'body' : ''),
+                fingerprints: fingerprints(fingerprint),
+                profile: api.profile(),
+                grid: await api.grid(grid),
+            };
+        },
+
+        // Which of `selectors` are present; see core.probe for the supported forms.
+        probe(selectors) {
+            const root = document.body || document.documentElement;
+            let bodyText = null;
+            const pageText = () => (bodyText === null ? (bodyText = norm(root ? root.innerText : '')) : bodyText);
+            const hasText = /^(.*?):has-text\((["'])(.*)\2\)$/;
+            const textOf = (el) => norm(el.innerText || el.textContent);
+            return selectors.map((sel) => {
+                try {
+                    if (sel.startsWith('text=')) {
+                        const raw = sel.slice(5);
+                        const quoted = raw.match(/^(["'])(.*)\1$/);
+                        if (quoted) {
+                            const want = quoted[2].replace(/\s+/g, ' ').trim();
+                            return Array.from(root.querySelectorAll('*')).some(
+                                (el) => (el.innerText || el.textContent || '').replace(/\s+/g, ' ').trim() === want
+                            );
+                        }
+                        return pageText().includes(norm(raw));
+                    }
+                    const m = sel.match(hasText);
+                    if (m) {
+                        const want = norm(m[3]);
+                        return Array.from(document.querySelectorAll(m[1] || '*')).some((el) => textOf(el).includes(want));
+                    }
+                    return !!document.querySelector(sel);
+                } catch (e) {
+                    return false;
+                }
+            });
+        },
+
+        // Incremental grid link collector; see core.grid.
+        // `reset` starts a new grid visit before running `op` ('collect' or 'scroll').
+        async grid({op, key, reset, scrollBy, settleMs, idleMs, maxMs}) {
+            const storageKey = '__igGrid:' + key;
+            if (reset) {
+                try { sessionStorage.removeItem(storageKey); } catch (e) {}
+                if (window.__igGridCollector && window.__igGridCollector.key === key) {
+                    window.__igGridCollector.observer.disconnect();
+                    window.__igGridCollector = null;
+                }
+            }
+            let c = window.__igGridCollector;
+            if (!c || c.key !== key) {
+                if (c) c.observer.disconnect();
+                let stored = [];
+                try { stored = JSON.parse(sessionStorage.getItem(storageKey) || '[]'); } catch (e) {}
+                c = window.__igGridCollector = {key, seen: new Set(stored), fresh: [], waiters: [], outcome: 'initial'};
+                const add = (a) => {
+                    const href = a.href || a.getAttribute('href');
+                    if (!href) return;
+                    const url = href.split('?')[0].replace(/\/$/, '');
+                    if (url && !c.seen.has(url)) { c.seen.add(url); c.fresh.push(url); }
+                };
+                const scan = (node) => {
+                    if (node.nodeType !== 1) return;
+                    if (node.matches(S.grid_links)) add(node);
+                    for (const a of node.querySelectorAll(S.grid_links)) add(a);
+                };
+                c.observer = new MutationObserver((records) => {
+                    const before = c.fresh.length;
+                    for (const r of records) {
+                        if (r.type === 'attributes') scan(r.target);
+                        else for (const n of r.addedNodes) scan(n);
+                    }
+                    if (c.fresh.length > before) for (const w of c.waiters.splice(0)) w();
+                });
+                c.observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, attributeFilter: ['href']});
+                scan(document.documentElement);
+            }
+
+            if (op === 'scroll') {
+                if (c.fresh.length) {
+                    c.outcome = 'links';
+                } else {
+                    window.scrollBy(0, scrollBy);
+                    await new Promise((resolve) => {
+                        let done = false;
+                        let lastActivity = performance.now();
+                        let resources = null;
+                        const finish = (why) => {
+                            if (done) return;
+                            done = true;
+                            c.outcome = why;
+                            c.waiters = [];
+                            clearTimeout(hard);
+                            clearInterval(idle);
+                            if (resources) resources.disconnect();
+                            resolve();
+                        };
+                        try {
+                            resources = new PerformanceObserver(() => { lastActivity = performance.now(); });
+                            resources.observe({type: 'resource'});
+                        } catch (e) {}
+                        c.waiters.push(() => setTimeout(() => finish('links'), settleMs));
+                        const idle = setInterval(() => {
+                            if (performance.now() - lastActivity >= idleMs) finish('idle');
+                        }, 50);
+                        const hard = setTimeout(() => finish('timeout'), maxMs);
+                    });
+                }
+            }
+
+            const links = c.fresh.splice(0);
+            if (links.length) {
+                try { sessionStorage.setItem(storageKey, JSON.stringify(Array.from(c.seen))); } catch (e) {}
+            }
+            const root = document.scrollingElement || document.documentElement;
+            return {links, outcome: c.outcome, atEnd: window.innerHeight + window.scrollY >= root.scrollHeight - 2};
+        },
+
+        // Click the first element whose text equals or contains one of `labels`.
+        clickText(labels) {
+            const normalized = labels.map((x) => norm(x)).filter(Boolean);
+            for (const node of document.querySelectorAll(S.clickable_text)) {
+                const label = norm(node.innerText || node.textContent);
+                if (!label) continue;
+                if (normalized.some((want) => label === want || label.includes(want))) {
+                    node.click();
+                    return true;
+                }
+            }
+            return false;
+        },
+
+        click(sel) {
+            const el = document.querySelector(sel);
+            if (el) el.click();
+            return !!el;
+        },
+
+        submitForm() {
+            const f = document.querySelector(S.login_form);
+            if (f) f.submit();
+            return !!f;
+        },
+    };
+
+    Object.defineProperty(globalThis, NS, {value: Object.freeze(api), enumerable: false});
+})()
+"""
+
+_selectors_json = json.dumps(SELECTORS, sort_keys=True)
+BUNDLE_VERSION = hashlib.sha1((_BUNDLE_TEMPLATE + _selectors_json).encode("utf-8")).hexdigest()[:10]
+NAMESPACE = f"__igExtract_{BUNDLE_VERSION}"
+BUNDLE_SCRIPT = (
+    _BUNDLE_TEMPLATE.replace("__NAMESPACE__", json.dumps(NAMESPACE))
+    .replace("__SELECTORS__", _selectors_json)
+    .replace("__VERSION__", json.dumps(BUNDLE_VERSION))
+)
+
+# The only source sent per call: look the function up and run it.
+_CALL_SCRIPT = (
+    "async ([name, arg]) => { const b = globalThis[%s]; "
+    "if (!b) return {missing: true}; return {value: await b[name](arg)}; }" % json.dumps(NAMESPACE)
+)
+
+
+async def install(ctx, pages: Iterable[Any] = ()) -> None:
+    """Register the bundle for every new document in `ctx` and load it into already open `pages`."""
+    await ctx.add_init_script(script=BUNDLE_SCRIPT)
+    for page in pages:
+        try:
+            await page.evaluate(BUNDLE_SCRIPT)
+        except Exception:
+            pass
+
+
+async def call(scope: Any, name: str, arg: Any = None) -> Any:
+    """Run bundle function `name` in `scope` (a Page or Frame) and return its result."""
+    result = await scope.evaluate(_CALL_SCRIPT, [name, arg])
+    if isinstance(result, dict) and result.get("missing"):
+        metrics.EXTRACT_CALLS.inc(fn=name, bundle="injected")
+        await scope.evaluate(BUNDLE_SCRIPT)
+        result = await scope.evaluate(_CALL_SCRIPT, [name, arg])
+    else:
+        metrics.EXTRACT_CALLS.inc(fn=name, bundle="installed")
+    return result.get("value") if isinstance(result, dict) else None
@@ -0,0 +1,87 @@
+"""Incremental post-link collection on a profile grid.
+
+`GridCollector` drives the `grid` function of the extraction bundle
+(`core.extract`), which sets up a collector the first time it is called on
+a grid. A MutationObserver records post links as they are added
+to the DOM. Each call returns only links that were not returned before, so a
+long scroll costs one small round-trip per step instead of re-sending the
+whole grid every time.
+
+`scroll()` scrolls and then waits inside the page until one of these
+happens:
+
+- new links appear (plus `GRID_SETTLE_MS` for the rest of the batch);
+- no resource has loaded for `GRID_IDLE_MS` (network idle, nothing more
+  coming);
+- `GRID_SCROLL_TIMEOUT_MS` passes.
+
+This replaces the fixed `mouse.wheel` plus humanized pause per step. The
+set of returned links is kept in `sessionStorage` under the grid's path, so
+coming back to the grid from a post (a fresh document) does not return the
+same links again.
+"""
+
+import os
+import time
+
+from analytics import metrics
+from core import extract
+
+
+GRID_SCROLL_PX = int(os.getenv("GRID_SCROLL_PX", "2200") or "2200")
+GRID_SETTLE_MS = int(os.getenv("GRID_SETTLE_MS", "150") or "150")
+GRID_IDLE_MS = int(os.getenv("GRID_IDLE_MS", "600") or "600")
+GRID_SCROLL_TIMEOUT_MS = int(os.getenv("GRID_SCROLL_TIMEOUT_MS", "5000") or "5000")
+
+
+class GridCollector:
+    def __init__(self, page, key: str):
+        self.page = page
+        self.key = key
+        self.at_end = False
+        self.outcome = ""
+        self._reset = True
+        self._primed = None
+
+    def args(self, op: str, reset: bool = False) -> dict:
+        return {
+            "op": op,
+            "key": self.key,
+            "reset": reset,
+            "scrollBy": GRID_SCROLL_PX,
+            "settleMs": GRID_SETTLE_MS,
+            "idleMs": GRID_IDLE_MS,
+            "maxMs": GRID_SCROLL_TIMEOUT_MS,
+        }
+
+    def prime(self, result) -> None:
+        """Use a `reset` result fetched by another call (the profile snapshot) as the first `collect`."""
+        self._reset = False
+        self._primed = self._accept(result)
+
+    async def _call(self, op: str) -> list[str]:
+        # The first call of a grid visit, whichever op it is, starts from a clean slate.
+        reset, self._reset = self._reset, False
+        return self._accept(await extract.call(self.page, "grid", self.args(op, reset)))
+
+    def _accept(self, result) -> list[str]:
+        if not isinstance(result, dict):
+            return []
+        self.at_end = bool(result.get("atEnd"))
+        self.outcome = result.get("outcome") or ""
+        links = result.get("links")
+        return links if isinstance(links, list) else []
+
+    async def collect(self) -> list[str]:
+        """Post links added since the previous call (all visible links on the first call)."""
+        if self._primed is not None:
+            links, self._primed = self._primed, None
+            return links
+        return await self._call("collect")
+
+    async def scroll(self) -> list[str]:
+        """Scroll one step and return the links it revealed, waiting only as long as content keeps loading."""
+        started = time.perf_counter()
+        links = await self._call("scroll")
+        metrics.GRID_SCROLL.observe(time.perf_counter() - started, outcome=self.outcome or "unknown")
+        return links
@@ -0,0 +1,107 @@
+"""Extraction-quality circuit breaker.
+
+When Instagram changes its markup the scraper keeps "working": posts come
+back with empty captions, profile grids return no links. `ExtractionHealth`
+keeps rolling windows of the signals that show this:
+
+- selector hit rate: the share of the post selectors (`HIT_SELECTORS`)
+  that matched an element on each post page, as reported by the extraction
+  bundle. A post without a caption still has its caption element, so this
+  tracks the markup rather than the content;
+- whether each target's grid returned any post links.
+
+Once a window has `EXTRACTION_HEALTH_MIN_SAMPLES` samples and its average
+crosses its threshold, the breaker trips. The runner and `scrape_posts`
+check `tripped` before each navigation and stop instead of spending browser
+time and budget on junk rows.
+
+There is one monitor per account run. Each one also feeds the process-wide
+`RUN_HEALTH`, so a layout break seen across accounts stops the whole run,
+including account failover. The account run then returns
+`extraction_degraded`, which `core.account_stats` leaves out of the
+account's reputation. With `EXTRACTION_ALERT=1` a trip is also sent through
+`alerts.slack`.
+"""
+
+import os
+from collections import deque
+from typing import Deque, Iterable, Optional
+
+from analytics import metrics
+from core.log import get_logger
+
+
+EXTRACTION_HEALTH_ENABLED = os.getenv("EXTRACTION_HEALTH", "1").strip().lower() in {"1", "true", "yes"}
+EXTRACTION_HEALTH_WINDOW = max(5, int(os.getenv("EXTRACTION_HEALTH_WINDOW", "30") or "30"))
+EXTRACTION_HEALTH_MIN_SAMPLES = max(1, int(os.getenv("EXTRACTION_HEALTH_MIN_SAMPLES", "10") or "10"))
+EXTRACTION_MIN_SELECTOR_HIT_RATE = float(os.getenv("EXTRACTION_MIN_SELECTOR_HIT_RATE", "0.6") or "0.6")
+EXTRACTION_MAX_EMPTY_GRID_RATE = float(os.getenv("EXTRACTION_MAX_EMPTY_GRID_RATE", "0.8") or "0.8")
+EXTRACTION_ALERT = os.getenv("EXTRACTION_ALERT", "0").strip().lower() in {"1", "true", "yes"}
+EXTRACTION_ALERT_WEBHOOK = os.getenv("EXTRACTION_ALERT_WEBHOOK", "").strip() or None
+
+# Post selectors (core.extract.SELECTORS) counted for the hit rate.
+HIT_SELECTORS = ("caption", "likes", "published_at")
+
+logger = get_logger("health")
+
+
+class ExtractionHealth:
+    def __init__(self, scope: str, parent: Optional["ExtractionHealth"] = None, window: int = EXTRACTION_HEALTH_WINDOW):
+        self.scope = scope
+        self.parent = parent
+        self.selector_hits: Deque[float] = deque(maxlen=window)
+        self.empty_grids: Deque[float] = deque(maxlen=window)
+        self.reason = ""
+
+    @property
+    def tripped(self) -> bool:
+        return bool(self.reason) or (self.parent is not None and self.parent.tripped)
+
+    @property
+    def trip_reason(self) -> str:
+        return self.reason or (self.parent.trip_reason if self.parent is not None else "")
+
+    def record_post(self, selector_misses: Iterable[str]) -> None:
+        missed = set(selector_misses or ())
+        hits = [key not in missed for key in HIT_SELECTORS]
+        self._add("selector_hits", sum(hits) / len(hits))
+        if self.parent is not None:
+            self.parent.record_post(missed)
+
+    def record_grid(self, saw_links: bool) -> None:
+        self._add("empty_grids", 0.0 if saw_links else 1.0)
+        if self.parent is not None:
+            self.parent.record_grid(saw_links)
+
+    def _add(self, signal: str, value: float) -> None:
+        window: Deque[float] = getattr(self, signal)
+        window.append(value)
+        if not EXTRACTION_HEALTH_ENABLED or self.reason or len(window) < EXTRACTION_HEALTH_MIN_SAMPLES:
+            return
+        mean = sum(window) / len(window)
+        if self.parent is None:
+            metrics.EXTRACTION_HEALTH.set(mean, signal=signal)
+        if signal == "selector_hits" and mean < EXTRACTION_MIN_SELECTOR_HIT_RATE:
+            self._trip(f"selector hit rate {mean:.3f} < {EXTRACTION_MIN_SELECTOR_HIT_RATE}", signal)
+        elif signal == "empty_grids" and mean > EXTRACTION_MAX_EMPTY_GRID_RATE:
+            self._trip(f"empty grid rate {mean:.3f} > {EXTRACTION_MAX_EMPTY_GRID_RATE}", signal)
+
+    def _trip(self, reason: str, signal: str) -> None:
+        self.reason = reason
+        metrics.EXTRACTION_BREAKER_TRIPS.inc(scope="run" if self.parent is None else "account", signal=signal)
+        message = f"Extraction breaker tripped for {self.scope}: {reason}; halting navigation"
+        logger.error(message, extra={"event": "extraction_breaker", "signal": signal})
+        if EXTRACTION_ALERT:
+            try:
+                from alerts.slack import send_slack
+
+                send_slack(message, webhook_url=EXTRACTION_ALERT_WEBHOOK)
+            except Exception as e:
+                logger.warning("Failed to send extraction alert: %s", e)
+
+
+RUN_HEALTH = ExtractionHealth("run")
+
+
+def for_account(username: str) -> ExtractionHealth:
+    return ExtractionHealth(username, parent=RUN_HEALTH)
@@ -0,0 +1,475 @@
+"""Cross-node target leases.
+
+Several scraper nodes can work through the same Lens source list. Every node
+pages the full list as before, but an account only scrapes a target once it
+holds that target's lease in the shared store set by `LEASE_STORE`:
+
+- a SQLite file path (the default backend; every transaction also takes an
+  exclusive `flock` on `<path>.lock`, so processes on one host queue up on
+  the lock file rather than on SQLite's busy timeout), or
+- a `postgres://` / `postgresql://` URL (needs `psycopg`), for nodes on
+  different hosts.
+
+A lease is held by one process (`<LEASE_NODE>:<pid>`) for `LEASE_SECONDS`
+and renewed by a heartbeat while the process runs. Leases belong to a round:
+`LEASE_ROUND` when set (e.g. a run id passed by the scheduler), otherwise the
+`LEASE_ROUND_SECONDS` slot (one run interval) the process started in, so
+nodes started by the same cron tick share a round. A scraped target is done
+for the rest of its round and scraped again by the next one. Targets that
+fail or are skipped are released straight away: the holder gives them up and
+the heartbeat no longer renews them. A lease whose holder died expires; the
+next node to reach the target takes it over, and each node also sweeps
+expired leases (the stragglers) once its own stream of the source list ends.
+A target is claimed at most `LEASE_MAX_ATTEMPTS` times per round.
+
+Each process keeps counters in the store, so `report` can log completed
+targets per minute for every node in the current round.
+
+With `LEASE_STORE` unset, `claimed` passes targets straight through and a
+single node sees everything, as before.
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from analytics import metrics
+from config.schedule import RUN_INTERVAL_MINUTES
+from core.background import create_logged_task
+from core.log import get_logger
+from core.records import Target
+
+try:
+    import fcntl
+except ImportError:  # Windows: SQLite's own locking only.
+    fcntl = None
+
+
+LEASE_STORE = os.getenv("LEASE_STORE", "").strip()
+LEASE_NODE = os.getenv("LEASE_NODE", "").strip() or socket.gethostname()
+LEASE_SECONDS = max(30, int(os.getenv("LEASE_SECONDS", "600") or "600"))
+LEASE_ROUND_SECONDS = max(60, int(os.getenv("LEASE_ROUND_SECONDS", str(RUN_INTERVAL_MINUTES * 60)) or "900"))
+# A node whose clock runs slightly behind still lands in the round its cron tick started.
+_ROUND_GRACE_SECONDS = 60
+LEASE_ROUND = os.getenv("LEASE_ROUND", "").strip() or str(int((time.time() + _ROUND_GRACE_SECONDS) // LEASE_ROUND_SECONDS))
+LEASE_MAX_ATTEMPTS = max(1, int(os.getenv("LEASE_MAX_ATTEMPTS", "3") or "3"))
+# Rows and holder counters untouched for this long are deleted.
+LEASE_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Claim outcomes; only the first two mean "scrape it".
+CLAIMED = "claimed"
+RECLAIMED = "reclaimed"
+HELD = "held"
+DONE = "done"
+EXHAUSTED = "exhausted"
+
+logger = get_logger("leases")
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS leases (
+        target_key TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        source_id TEXT NOT NULL DEFAULT '',
+        source_url TEXT NOT NULL DEFAULT '',
+        state TEXT NOT NULL,
+        holder TEXT NOT NULL,
+        node TEXT NOT NULL,
+        lease_until DOUBLE PRECISION NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        round_id TEXT NOT NULL,
+        updated_at DOUBLE PRECISION NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_leases_holder ON leases (holder, state)",
+    "CREATE INDEX IF NOT EXISTS idx_leases_expiry ON leases (state, lease_until)",
+    """
+    CREATE TABLE IF NOT EXISTS lease_holders (
+        holder TEXT PRIMARY KEY,
+        node TEXT NOT NULL,
+        round_id TEXT NOT NULL,
+        started_at DOUBLE PRECISION NOT NULL,
+        heartbeat_at DOUBLE PRECISION NOT NULL,
+        claimed INTEGER NOT NULL DEFAULT 0,
+        reclaimed INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+)
+
+
+def target_key(target: Target) -> str:
+    return f"{target.source_id}:{target.username.lower()}"
+
+
+class LeaseStore:
+    """Blocking lease operations on SQLite or Postgres; see `Leases` for the async side."""
+
+    def __init__(self, url: str, round_id: str):
+        self.round_id = round_id
+        self.postgres = url.startswith(("postgres://", "postgresql://"))
+        self._mutex = threading.Lock()
+        self._lock_path: Optional[Path] = None
+        if self.postgres:
+            import psycopg
+
+            self.conn = psycopg.connect(url)
+        else:
+            path = Path(url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_path = path.with_name(path.name + ".lock")
+            self.conn = sqlite3.connect(str(path), timeout=30, isolation_level=None, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        with self._tx() as cur:
+            for statement in _SCHEMA:
+                cur.execute(statement)
+
+    def _sql(self, query: str) -> str:
+        return query.replace("?", "%s") if self.postgres else query
+
+    @contextmanager
+    def _tx(self) -> Iterator[Any]:
+        with self._mutex:
+            lock_fd = None
+            if self._lock_path is not None and fcntl is not None:
+                lock_fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                cur = self.conn.cursor()
+                if not self.postgres:
+                    cur.execute("BEGIN IMMEDIATE")
+                try:
+                    yield cur
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+                self.conn.commit()
+            finally:
+                if lock_fd is not None:
+                    os.close(lock_fd)
+
+    def register(self, holder: str, node: str, now: float) -> None:
+        with self._tx() as cur:
+            cur.execute(
+                self._sql(
+                    "INSERT INTO lease_holders (holder, node, round_id, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (holder) DO UPDATE SET heartbeat_at = excluded.heartbeat_at"
+                ),
+                (holder, node, self.round_id, now, now),
+            )
+            cutoff = now - LEASE_RETENTION_SECONDS
+            cur.execute(self._sql("DELETE FROM lease_holders WHERE heartbeat_at < ?"), (cutoff,))
+            cur.execute(self._sql("DELETE FROM leases WHERE updated_at < ? AND lease_until < ?"), (cutoff, now))
+
+    def claim(self, key: str, target: Target, holder: str, node: str, now: float) -> str:
+        with self._tx() as cur:
+            cur.execute(
+                self._sql(
+                    "SELECT state, holder, lease_until, attempts, round_id FROM leases WHERE target_key = ?"
+                    + (" FOR UPDATE" if self.postgres else "")
+                ),
+                (key,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                cur.execute(
+                    self._sql(
+                        "INSERT INTO leases (target_key, username, source_id, source_url, state, holder, node, "
+                        "lease_until, attempts, round_id, updated_at) VALUES (?, ?, ?, ?, 'leased', ?, ?, ?, 1, ?, ?) "
+                        "ON CONFLICT (target_key) DO NOTHING"
+                    ),
+                    (
+                        key, target.username, target.source_id, target.source_url,
+                        holder, node, now + LEASE_SECONDS, self.round_id, now,
+                    ),
+                )
+                # Postgres: another node inserted it between our SELECT and INSERT.
+                outcome = CLAIMED if cur.rowcount else HELD
+            else:
+                outcome = self._take(cur, key, row, holder, node, now)
+            if outcome in (CLAIMED, RECLAIMED):
+                cur.execute(
+                    self._sql(
+                        "UPDATE lease_holders SET claimed = claimed + 1, reclaimed = reclaimed + ?, heartbeat_at = ? "
+                        "WHERE holder = ?"
+                    ),
+                    (1 if outcome == RECLAIMED else 0, now, holder),
+                )
+            return outcome
+
+    def _take(self, cur, key: str, row, holder: str, node: str, now: float) -> str:
+        state, current, lease_until, attempts, round_id = row
+        if state == "leased" and current and lease_until > now:
+            return CLAIMED if current == holder else HELD
+        this_round = round_id == self.round_id
+        if state == "done" and this_round:
+            return DONE
+        if state == "leased" and this_round and attempts >= LEASE_MAX_ATTEMPTS:
+            return EXHAUSTED
+        retry = state == "leased" and this_round
+        cur.execute(
+            self._sql(
+                "UPDATE leases SET state = 'leased', holder = ?, node = ?, lease_until = ?, attempts = ?, "
+                "round_id = ?, updated_at = ? WHERE target_key = ?"
+            ),
+            (holder, node, now + LEASE_SECONDS, attempts + 1 if retry else 1, self.round_id, now, key),
+        )
+        return RECLAIMED if retry else CLAIMED
+
+    def complete(self, key: str, holder: str, now: float) -> None:
+        with self._tx() as cur:
+            cur.execute(
+                self._sql(
+                    "UPDATE leases SET state = 'done', lease_until = 0, updated_at = ? "
+                    "WHERE target_key = ? AND holder = ? AND state = 'leased'"
+                ),
+                (now, key, holder),
+            )
+            if cur.rowcount:
+                cur.execute(
+                    self._sql("UPDATE lease_holders SET completed = completed + 1, heartbeat_at = ? WHERE holder = ?"),
+                    (now, holder),
+                )
+
+    def release(self, keys: List[str], holder: str, now: float) -> None:
+        """Give leases up at once; `keys=[]` releases everything `holder` still holds.
+
+        The holder is cleared, so its heartbeat cannot renew them and any node can reclaim them.
+        """
+        with self._tx() as cur:
+            if not keys:
+                cur.execute(
+                    self._sql(
+                        "UPDATE leases SET holder = '', lease_until = 0, updated_at = ? WHERE holder = ? AND state = 'leased'"
+                    ),
+                    (now, holder),
+                )
+            for key in keys:
+                cur.execute(
+                    self._sql(
+                        "UPDATE leases SET holder = '', lease_until = 0, updated_at = ? "
+                        "WHERE target_key = ? AND holder = ? AND state = 'leased'"
+                    ),
+                    (now, key, holder),
+                )
+
+    def renew(self, holder: str, now: float) -> None:
+        with self._tx() as cur:
+            cur.execute(
+                self._sql("UPDATE leases SET lease_until = ? WHERE holder = ? AND state = 'leased' AND lease_until > ?"),
+                (now + LEASE_SECONDS, holder, now),
+            )
+            cur.execute(self._sql("UPDATE lease_holders SET heartbeat_at = ? WHERE holder = ?"), (now, holder))
+
+    def heartbeat(self, holder: str, now: float) -> None:
+        with self._tx() as cur:
+            cur.execute(self._sql("UPDATE lease_holders SET heartbeat_at = ? WHERE holder = ?"), (now, holder))
+
+    def stragglers(self, now: float, limit: int = 1000) -> List[Target]:
+        """Expired leases of this round that can still be retried."""
+        with self._tx() as cur:
+            cur.execute(
+                self._sql(
+                    "SELECT username, source_id, source_url FROM leases "
+                    "WHERE state = 'leased' AND lease_until < ? AND attempts < ? AND round_id = ? "
+                    "ORDER BY lease_until LIMIT ?"
+                ),
+                (now, LEASE_MAX_ATTEMPTS, self.round_id, limit),
+            )
+            return [Target(username, source_id or "", source_url or "") for username, source_id, source_url in cur.fetchall()]
+
+    def throughput(self) -> List[Dict[str, Any]]:
+        """Per-node counters of this round."""
+        with self._tx() as cur:
+            cur.execute(
+                self._sql(
+                    "SELECT node, COUNT(*), SUM(claimed), SUM(reclaimed), SUM(completed), MIN(started_at), MAX(heartbeat_at) "
+                    "FROM lease_holders WHERE round_id = ? GROUP BY node ORDER BY node"
+                ),
+                (self.round_id,),
+            )
+            rows = cur.fetchall()
+        report = []
+        for node, processes, claimed, reclaimed, completed, started, last_seen in rows:
+            minutes = max(1.0, (last_seen - started) / 60)
+            report.append({
+                "node": node,
+                "processes": processes,
+                "claimed": claimed or 0,
+                "reclaimed": reclaimed or 0,
+                "completed": completed or 0,
+                "targets_per_minute": round((completed or 0) / minutes, 2),
+            })
+        return report
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Leases:
+    """This process's view of the lease store; every store call runs in a thread."""
+
+    def __init__(self, url: str, node: str):
+        self.url = url
+        self.node = node
+        self.holder = f"{node}:{os.getpid()}"
+        self.started = time.time()
+        self._store: Optional[LeaseStore] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._opening = asyncio.Lock()
+
+    async def _call(self, fn_name: str, *args):
+        async with self._opening:
+            if self._store is None:
+                self._store = await asyncio.to_thread(LeaseStore, self.url, LEASE_ROUND)
+        return await asyncio.to_thread(getattr(self._store, fn_name), *args)
+
+    async def claim(self, target: Target) -> bool:
+        try:
+            if self._heartbeat is None:
+                # First claim of this process: it shows up in the throughput report from here on.
+                await self._call("register", self.holder, self.node, time.time())
+            outcome = await self._call("claim", target_key(target), target, self.holder, self.node, time.time())
+        except Exception as e:
+            # Fail open: a store outage costs duplicate scrapes, not a stalled run.
+            logger.warning("Lease store unavailable, scraping %s without a lease: %s", target.username, e)
+            metrics.LEASES.inc(outcome="error")
+            return True
+        metrics.LEASES.inc(outcome=outcome)
+        if outcome == RECLAIMED:
+            logger.info("Reclaimed expired lease on %s", target.username)
+        if self._heartbeat is None:
+            self._heartbeat = create_logged_task(self._renew_forever(), f"lease heartbeat ({self.holder})")
+        return outcome in (CLAIMED, RECLAIMED)
+
+    async def complete(self, target: Target) -> None:
+        await self._safely("complete", target_key(target), self.holder, time.time())
+        metrics.LEASES.inc(outcome="completed")
+
+    async def release(self, keys: List[str]) -> None:
+        await self._safely("release", keys, self.holder, time.time())
+        metrics.LEASES.inc(len(keys) or 1, outcome="released")
+
+    async def stragglers(self) -> List[Target]:
+        try:
+            return await self._call("stragglers", time.time())
+        except Exception as e:
+            logger.warning("Could not read expired leases: %s", e)
+            return []
+
+    async def _safely(self, fn_name: str, *args) -> None:
+        try:
+            await self._call(fn_name, *args)
+        except Exception as e:
+            logger.warning("Lease store %s failed: %s", fn_name, e)
+
+    async def _renew_forever(self) -> None:
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            await self._safely("renew", self.holder, time.time())
+
+    async def close(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._store is None:
+            return
+        await self._safely("release", [], self.holder, time.time())
+        await self._safely("heartbeat", self.holder, time.time())
+        store, self._store = self._store, None
+        store.close()
+
+    async def report(self) -> List[Dict[str, Any]]:
+        try:
+            rows = await self._call("throughput")
+        except Exception as e:
+            logger.warning("Could not read node throughput: %s", e)
+            return []
+        for row in rows:
+            metrics.NODE_THROUGHPUT.set(row["targets_per_minute"], node=row["node"])
+            logger.info(
+                "Node %s: %s target(s) completed (%s/min), %s claimed, %s reclaimed, %s process(es)",
+                row["node"], row["completed"], row["targets_per_minute"], row["claimed"], row["reclaimed"], row["processes"],
+                extra={"event": "node_throughput", **row},
+            )
+        return rows
+
+
+LEASES: Optional[Leases] = Leases(LEASE_STORE, LEASE_NODE) if LEASE_STORE else None
+
+
+class Claims:
+    """An account's target stream, filtered to the targets this process leased.
+
+    The runner reports each target with `complete` or `release`; whatever is
+    still held when the account stops (e.g. the lookahead target) goes back
+    with `release_unfinished`.
+    """
+
+    def __init__(self, targets, leases: Optional[Leases]):
+        self.targets = targets
+        self.leases = leases
+        self._held: Dict[str, Target] = {}
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        if hasattr(self.targets, "__aiter__"):
+            source = self.targets
+        else:
+            async def listed():
+                for target in self.targets:
+                    yield target
+
+            source = listed()
+        async for target in source:
+            if self.leases is None or not isinstance(target, Target) or not target.username:
+                yield target
+                continue
+            if await self.leases.claim(target):
+                self._held[target_key(target)] = target
+                yield target
+
+    async def complete(self, target) -> None:
+        if self.leases is not None and isinstance(target, Target) and self._held.pop(target_key(target), None):
+            await self.leases.complete(target)
+
+    async def release(self, target) -> None:
+        if self.leases is not None and isinstance(target, Target) and self._held.pop(target_key(target), None):
+            await self.leases.release([target_key(target)])
+
+    async def release_unfinished(self) -> None:
+        if self.leases is not None and self._held:
+            keys, self._held = list(self._held), {}
+            await self.leases.release(keys)
+
+
+def claimed(targets) -> Claims:
+    return Claims(targets, LEASES)
+
+
+async def with_stragglers(stream: AsyncIterator[Target]) -> AsyncIterator[Target]:
+    """`stream`, followed by the expired leases other nodes left behind."""
+    async for target in stream:
+        yield target
+    if LEASES is None:
+        return
+    stragglers = await LEASES.stragglers()
+    if stragglers:
+        logger.info("Sweeping %s expired lease(s) left by other nodes", len(stragglers))
+    for target in stragglers:
+        yield target
+
+
+async def close() -> None:
+    if LEASES is not None:
+        await LEASES.close()
+
+
+async def report() -> None:
+    if LEASES is not None:
+        await LEASES.report()
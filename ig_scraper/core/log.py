@@ -0,0 +1,178 @@
+"""Structured, queue-backed logging for the scraper.
+
+`setup_logging` installs a `QueueHandler` on the `ig_scraper` logger so the
+event loop only enqueues records; a `QueueListener` thread formats them and
+writes to stdout (and `LOG_FILE` when set). Records carry the account, target
+and post bound via `bind`, which uses context variables so concurrent account
+tasks keep their own context.
+
+Environment:
+- `LOG_FORMAT`: `json` (default) or `text`
+- `LOG_LEVEL`: base level for `ig_scraper` loggers (default INFO)
+- `LOG_LEVELS`: per-module overrides, e.g. `api_client=WARNING,posts=DEBUG`
+- `LOG_FILE`: optional extra file sink
+- `LOG_RATE_LIMIT_BURST` / `LOG_RATE_LIMIT_WINDOW`: identical messages allowed
+  per logger and window before they are suppressed and counted
+"""
+
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+ROOT_LOGGER = "ig_scraper"
+CONTEXT_FIELDS = ("account", "target", "post")
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def bind(**fields) -> contextvars.Token:
+    """Attach context fields (account/target/post) to later records in this task."""
+    return _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
+def unbind(token: contextvars.Token) -> None:
+    _context.reset(token)
+
+
+@contextlib.contextmanager
+def bound(**fields):
+    token = bind(**fields)
+    try:
+        yield
+    finally:
+        unbind(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound context onto the record before it leaves the loop thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Drop repeats of the same message template beyond `burst` per `window` seconds."""
+
+    def __init__(self, burst: int = 20, window: float = 60.0):
+        super().__init__()
+        self.burst = max(1, burst)
+        self.window = max(0.1, window)
+        self._seen: Dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        now = time.monotonic()
+        entry = self._seen.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            suppressed = entry[2] if entry else 0
+            self._seen[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if entry[1] < self.burst:
+            entry[1] += 1
+            return True
+        entry[2] += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        ctx = " ".join(f"{k}={getattr(record, k)}" for k in CONTEXT_FIELDS if getattr(record, k, None))
+        return f"{line} ({ctx})" if ctx else line
+
+
+def _parse_levels(raw: str) -> Dict[str, str]:
+    levels: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> logging.Logger:
+    """Configure the `ig_scraper` logger tree once; later calls are no-ops."""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return root
+
+    formatter: logging.Formatter = TextFormatter() if os.getenv("LOG_FORMAT", "json").strip().lower() == "text" else JsonFormatter()
+    sinks = [logging.StreamHandler(sys.stdout)]
+    log_file = os.getenv("LOG_FILE", "").strip()
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        sinks.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for sink in sinks:
+        sink.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(RateLimitFilter(
+        burst=int(os.getenv("LOG_RATE_LIMIT_BURST", "20") or "20"),
+        window=float(os.getenv("LOG_RATE_LIMIT_WINDOW", "60") or "60"),
+    ))
+
+    root.handlers[:] = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO")
+    root.propagate = False
+    for name, level in _parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name if name.startswith(ROOT_LOGGER) else f"{ROOT_LOGGER}.{name}").setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
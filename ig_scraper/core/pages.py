@@ -0,0 +1,171 @@
+"""Warm page pool for target visits.
+
+`PagePool` keeps a few pages per browser context ready for profile visits:
+
+- `prepare` runs once per context. It pre-sets the cookie-consent cookie and
+  installs an init script that dismisses Instagram's consent and "Not Now"
+  dialogs from inside the page as soon as they render. The runner no longer
+  probes five overlay selectors (1.2s timeout each) on every target.
+- `prefetch(url)` starts navigating a spare page to the next target while
+  the current one is still being scraped. `open(url)` hands back that page
+  once its navigation has finished, or navigates a free page on a miss.
+
+With `PAGE_POOL_SIZE=1` there is no spare page and `open` is a plain
+`goto` on the single page.
+"""
+
+import asyncio
+import json
+from typing import Dict, List
+
+from analytics import metrics
+from config.settings import BASE_URL, PAGE_POOL_SIZE, CONSENT_COOKIES
+from core.log import get_logger
+
+
+logger = get_logger("pages")
+
+NAV_TIMEOUT_MS = 60000
+
+# Dialog buttons the init script clicks, in preference order (lower-cased,
+# whole-label match so "Accept" never hits a follow-request "Accept" link).
+OVERLAY_LABELS = [
+    "not now",
+    "allow all cookies",
+    "accept all",
+    "accept",
+    "allow essential and optional cookies",
+]
+
+OVERLAY_GUARD_SCRIPT = r"""
+(labels) => {
+    if (window.__igOverlayGuard) return;
+    window.__igOverlayGuard = true;
+    const sweep = () => {
+        const scopes = document.querySelectorAll('[role="dialog"], [role="alertdialog"]');
+        for (const scope of scopes) {
+            const buttons = Array.from(scope.querySelectorAll('button, [role="button"]'));
+            for (const label of labels) {
+                const hit = buttons.find(b => (b.innerText || '').trim().toLowerCase() === label);
+                if (hit) { hit.click(); break; }
+            }
+        }
+    };
+    let queued = false;
+    const schedule = () => {
+        if (queued) return;
+        queued = true;
+        setTimeout(() => { queued = false; sweep(); }, 50);
+    };
+    const start = () => {
+        new MutationObserver(schedule).observe(document.documentElement, {childList: true, subtree: true});
+        sweep();
+    };
+    if (document.documentElement) start();
+    else document.addEventListener('DOMContentLoaded', start, {once: true});
+}
+"""
+
+
+def _consent_cookies() -> List[dict]:
+    cookies = []
+    for pair in CONSENT_COOKIES.split(","):
+        name, _, value = pair.strip().partition("=")
+        if name and value:
+            cookies.append({"name": name.strip(), "value": value.strip(), "url": BASE_URL})
+    return cookies
+
+
+class PagePool:
+    def __init__(self, ctx, page=None, size: int = PAGE_POOL_SIZE):
+        self.ctx = ctx
+        self.size = max(1, size)
+        self._free: List = [page] if page is not None else []
+        self._pages: List = list(self._free)
+        self._prefetched: Dict[str, asyncio.Task] = {}
+        self._prefetch_pages: Dict[str, object] = {}
+        self._current = None
+
+    async def prepare(self) -> None:
+        """Set consent cookies and install the overlay guard for every page of the context."""
+        cookies = _consent_cookies()
+        if cookies:
+            try:
+                await self.ctx.add_cookies(cookies)
+            except Exception as e:
+                logger.debug("Could not pre-set consent cookies: %s", e)
+        script = f"({OVERLAY_GUARD_SCRIPT})({json.dumps(OVERLAY_LABELS)});"
+        await self.ctx.add_init_script(script=script)
+        # Init scripts only run on new documents; cover pages that are already open.
+        for page in self._pages:
+            try:
+                await page.evaluate(OVERLAY_GUARD_SCRIPT, OVERLAY_LABELS)
+            except Exception:
+                pass
+        while len(self._pages) < self.size:
+            page = await self.ctx.new_page()
+            self._pages.append(page)
+            self._free.append(page)
+
+    def _take_free(self):
+        return self._free.pop(0) if self._free else None
+
+    def prefetch(self, url: str) -> bool:
+        """Start loading `url` on a spare page; False when no spare page is free."""
+        if url in self._prefetched:
+            return True
+        page = self._take_free()
+        if page is None:
+            return False
+        self._prefetch_pages[url] = page
+        self._prefetched[url] = asyncio.create_task(
+            page.goto(url, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS)
+        )
+        return True
+
+    async def open(self, url: str):
+        """Return a page showing `url`; the page handed out by the previous call is recycled."""
+        if self._current is not None:
+            self._free.append(self._current)
+            self._current = None
+
+        task = self._prefetched.pop(url, None)
+        if task is not None:
+            page = self._prefetch_pages.pop(url)
+            try:
+                await task
+                metrics.PAGE_PREFETCH.inc(outcome="hit")
+                self._current = page
+                return page
+            except Exception as e:
+                logger.debug("Prefetch of %s failed (%s); navigating again", url, e)
+                metrics.PAGE_PREFETCH.inc(outcome="failed")
+                self._free.append(page)
+        elif self.size > 1:
+            metrics.PAGE_PREFETCH.inc(outcome="miss")
+
+        page = self._take_free()
+        if page is None:
+            page = await self.ctx.new_page()
+            self._pages.append(page)
+        self._current = page
+        await page.goto(url, wait_until="domcontentloaded", timeout=NAV_TIMEOUT_MS)
+        return page
+
+    async def discard_prefetches(self) -> None:
+        """Cancel pending prefetches and return their pages to the pool."""
+        pending = list(self._prefetched.values())
+        for url, task in self._prefetched.items():
+            task.cancel()
+            self._free.append(self._prefetch_pages.pop(url))
+        self._prefetched.clear()
+        for task in pending:
+            try:
+                await task
+            except asyncio.CancelledError:
+                # The prefetch's own cancellation is expected; the caller's must propagate.
+                current = asyncio.current_task()
+                if not task.cancelled() or (current is not None and current.cancelling()):
+                    raise
+            except Exception:
+                pass
@@ -2,12 +2,26 @@ from datetime import datetime, timedelta, timezone
 import os
 from urllib.parse import urlparse
 
-from config.settings import BASE_URL
+from config.settings import BASE_URL, ENABLE_BASELINE_WRITE
 from core.actions import pause
 from core.comments import list_comments
 from core.confidence import score
 from core.diffing import record_post_diff
+from core import baselines, extract
+from core.grid import GridCollector
 from storage import api_client
+from analytics import metrics
+from core.log import bound, get_logger
+from core.records import PostRecord
+
+
+logger = get_logger("posts")
+
+POST_EXTRACT_ARGS = (
+    {"fingerprint": {"keys": extract.BASELINE_KEYS["post"], "depth": extract.FINGERPRINT_DEPTH}}
+    if ENABLE_BASELINE_WRITE
+    else None
+)
 
 
 def _normalize_external_post_id(value: str) -> str:
@@ -19,24 +33,6 @@ def _normalize_external_post_id(value: str) -> str:
     return cleaned.rstrip("/")
 
 
-async def _visible_profile_post_urls(page) -> list[str]:
-    urls = await page.evaluate(
-        r"""
-        () => {
-            const urls = [];
-            for (const a of document.querySelectorAll('a[href*="/p/"], a[href*="/reel/"], a[data-testid="user-post-item"]')) {
-                const href = a.href || a.getAttribute('href');
-                if (!href) continue;
-                const raw = href.split('?')[0].replace(/\/$/, '');
-                if (raw) urls.push(raw);
-            }
-            return urls;
-        }
-        """
-    )
-    return urls if isinstance(urls, list) else []
-
-
 def _parse_iso_utc(value: str):
     text = (value or "").strip()
     if not text:
@@ -52,105 +48,12 @@ def _parse_iso_utc(value: str):
     return parsed.astimezone(timezone.utc)
 
 
-async def _scrape_and_write_open_post(page, username, gov, source_id: str, external_post_id: str):
-
-    post = await page.evaluate(
-        r"""
-        () => {
-            const text = (el) => (el && el.innerText ? el.innerText : "").trim();
-            const attr = (el, key) => (el && el.getAttribute ? (el.getAttribute(key) || "") : "").trim();
-            const clean = (value) => {
-                if (!value) return "";
-                return String(value)
-                    .replace(/\s+/g, ' ')
-                    .replace(/^\s+|\s+$/g, '');
-            };
-            const firstNonEmpty = (values) => {
-                for (const value of values) {
-                    const current = clean(value);
-                    if (current) return current;
-                }
-                return "";
-            };
-            const normalizeMetaDescription = (value) => {
-                const current = clean(value);
-                if (!current) return "";
-                const idx = current.indexOf(': "');
-                if (idx >= 0 && current.endsWith('"')) {
-                    return clean(current.slice(idx + 3, -1));
-                }
-                return current;
-            };
-            const numberFrom = (raw) => {
-                if (!raw) return 0;
-                const cleaned = raw.replace(/,/g, '').trim();
-                if (/^\d+(\.\d+)?[kKmMbB]$/.test(cleaned)) {
-                    const n = parseFloat(cleaned.slice(0, -1));
-                    const u = cleaned.slice(-1).toLowerCase();
-                    if (u === 'k') return Math.round(n * 1000);
-                    if (u === 'm') return Math.round(n * 1000000);
-                    if (u === 'b') return Math.round(n * 1000000000);
-                }
-                const n = Number(cleaned.replace(/[^0-9.]/g, ''));
-                return Number.isFinite(n) ? n : 0;
-            };
-
-            const captionEl =
-                document.querySelector('article h1') ||
-                document.querySelector('h1') ||
-                document.querySelector('article ul li h1') ||
-                document.querySelector('article ul li div[dir="auto"] span') ||
-                document.querySelector('article ul li span');
-
-            const ogDescriptionEl = document.querySelector('meta[property="og:description"]');
-            const descriptionEl = document.querySelector('meta[name="description"]');
-
-            let ldJsonCaption = "";
-            try {
-                for (const script of document.querySelectorAll('script[type="application/ld+json"]')) {
-                    const raw = script.textContent || '';
-                    if (!raw.trim()) continue;
-                    const parsed = JSON.parse(raw);
-                    const nodes = Array.isArray(parsed) ? parsed : [parsed];
-                    for (const node of nodes) {
-                        if (!node || typeof node !== 'object') continue;
-                        const maybeCaption =
-                            node.caption ||
-                            node.articleBody ||
-                            (node.description && !String(node.description).includes('Instagram photos and videos'));
-                        if (maybeCaption) {
-                            ldJsonCaption = clean(maybeCaption);
-                            break;
-                        }
-                    }
-                    if (ldJsonCaption) break;
-                }
-            } catch (_) {}
-
-            const caption = firstNonEmpty([
-                text(captionEl),
-                ldJsonCaption,
-                normalizeMetaDescription(attr(ogDescriptionEl, 'content')),
-                normalizeMetaDescription(attr(descriptionEl, 'content')),
-            ]);
-
-            const likesEl =
-                document.querySelector('section a[href*="liked_by"] span') ||
-                document.querySelector('section span[title]') ||
-                document.querySelector('section span');
-
-            const timeEl = document.querySelector('time[datetime]');
-
-            return {
-                post_id: location.pathname.replace(/\/$/, ''),
-                caption,
-                likes: numberFrom(text(likesEl)),
-                comments: document.querySelectorAll('ul ul li, article ul ul li').length,
-                published_at: timeEl ? (timeEl.getAttribute('datetime') || '') : '',
-            };
-        }
-        """
-    )
+async def _scrape_and_write_open_post(page, username, gov, source_id: str, external_post_id: str, health=None) -> bool:
+    """Scrape the open post and write it; True once the API (or the durable spool) has it."""
+
+    post = await extract.call(page, "post", POST_EXTRACT_ARGS) or {}
+    baselines.observe(post.pop("fingerprints", None))
+    selector_misses = post.pop("selector_misses", None) or ()
 
     if not post.get("post_id"):
         post["post_id"] = external_post_id
@@ -158,6 +61,8 @@ async def _scrape_and_write_open_post(page, username, gov, source_id: str, exter
     published_at_dt = _parse_iso_utc(post.get("published_at", ""))
 
     post["confidence"] = score(post)
+    if health is not None:
+        health.record_post(selector_misses)
     record_post_diff(post)
 
     comments_data = []
@@ -169,32 +74,36 @@ async def _scrape_and_write_open_post(page, username, gov, source_id: str, exter
         comments_data = []
 
     try:
-        payload = {
-            "sourceId": source_id or "",
-            "externalPostId": post["post_id"],
-            "postDate": (published_at_dt.isoformat() if published_at_dt else datetime.utcnow().isoformat()),
-            "postUrl": f"{BASE_URL}{post['post_id']}",
-            "content": post["caption"],
-            "keywords": "",
-            "keywordMatchedCount": 0,
-            "isSummarized": False,
-            "sentimentScore": int(post.get("confidence", 0) * 1000),
-            "commentCount": len(comments_data),
-            "comments": comments_data,
-        }
-        await api_client.write_posts([payload])
+        record = PostRecord(
+            source_id=source_id or "",
+            external_post_id=post["post_id"],
+            post_date=(published_at_dt.isoformat() if published_at_dt else datetime.utcnow().isoformat()),
+            post_url=f"{BASE_URL}{post['post_id']}",
+            content=post["caption"],
+            sentiment_score=int(post.get("confidence", 0) * 1000),
+            comments=comments_data,
+        )
+        result = await api_client.write_posts([record.to_api()])
+        stored = result is not None
+        if isinstance(result, dict) and result.get("spooled"):
+            metrics.POSTS_WRITTEN.inc(status="spooled")
+        else:
+            metrics.POSTS_WRITTEN.inc(status="ok" if stored else "failed")
     except Exception as e:
-        print(f"Failed to write post for {username} ({post.get('post_id')}): {e}")
+        stored = False
+        metrics.POSTS_WRITTEN.inc(status="failed")
+        logger.warning("Failed to write post for %s (%s): %s", username, post.get('post_id'), e)
 
     await pause(gov.mult)
 
-    return published_at_dt
+    return stored
 
 
-async def scrape_posts(page, username, budget, gov, source_id=""):
+async def scrape_posts(page, username, budget, gov, source_id="", collector=None, health=None) -> int:
+    """Scrape `username`'s new posts within `budget` (a `core.budgets.Budget`); returns how many were written."""
     if not source_id:
-        print(f"Skipping {username}: missing source_id for API duplicate checks")
-        return
+        logger.warning("Skipping %s: missing source_id for API duplicate checks", username)
+        return 0
 
     lookback_hours = max(1, int(os.getenv("SCRAPE_LOOKBACK_HOURS", "6") or "6"))
     cutoff_utc = datetime.now(timezone.utc) - timedelta(hours=lookback_hours)
@@ -212,25 +121,30 @@ async def scrape_posts(page, username, budget, gov, source_id=""):
     older_post_boundary_hit = False
     saw_any_post_links = False
 
-    while idle_scrolls < max_idle_scrolls:
-        urls = await _visible_profile_post_urls(page)
+    # Only links the grid has not returned before come back from each call.
+    if collector is None:
+        collector = GridCollector(page, urlparse(profile_url).path)
+    urls = await collector.collect()
 
+    while idle_scrolls < max_idle_scrolls:
         new_visible_urls = [u for u in urls if u not in seen_urls]
-        for u in new_visible_urls:
-            seen_urls.add(u)
+        seen_urls.update(new_visible_urls)
         if new_visible_urls:
             saw_any_post_links = True
 
         if not new_visible_urls:
             idle_scrolls += 1
-            budget.consume("scrolls")
-            await page.mouse.wheel(0, 2200)
-            await pause(gov.mult)
+            if not await budget.spend("scrolls"):
+                break
+            metrics.SCROLLS.inc()
+            urls = await collector.scroll()
             continue
 
         idle_scrolls = 0
 
         for post_url in new_visible_urls:
+            if health is not None and health.tripped:
+                break
             path = urlparse(post_url).path.rstrip("/")
             external_post_id = _normalize_external_post_id(path)
             if not external_post_id:
@@ -239,7 +153,9 @@ async def scrape_posts(page, username, budget, gov, source_id=""):
             if external_post_id in recent_ids:
                 continue
 
-            budget.consume("opens")
+            if not await budget.spend("opens"):
+                break
+            metrics.POST_OPENS.inc()
             try:
                 await page.goto(post_url, wait_until="domcontentloaded", timeout=60000)
             except Exception:
@@ -252,17 +168,10 @@ async def scrape_posts(page, username, budget, gov, source_id=""):
 
             await pause(gov.mult)
 
-            published_at_raw = await page.evaluate(
-                r"""
-                () => {
-                    const timeEl = document.querySelector('time[datetime]');
-                    return timeEl ? (timeEl.getAttribute('datetime') || '') : '';
-                }
-                """
-            )
+            published_at_raw = await extract.call(page, "publishedAt") or ""
             published_at_dt = _parse_iso_utc(published_at_raw)
             if published_at_dt and published_at_dt < cutoff_utc:
-                print(f"Reached {lookback_hours}h lookback boundary for {username} at {external_post_id}; stopping further scan.")
+                logger.info("Reached %sh lookback boundary for %s at %s; stopping further scan.", lookback_hours, username, external_post_id)
                 older_post_boundary_hit = True
                 break
 
@@ -277,9 +186,12 @@ async def scrape_posts(page, username, budget, gov, source_id=""):
                 await pause(gov.mult)
                 continue
 
-            await _scrape_and_write_open_post(page, username, gov, source_id, external_post_id)
-            recent_ids.add(external_post_id)
-            wrote_new_posts += 1
+            with bound(post=external_post_id):
+                stored = await _scrape_and_write_open_post(page, username, gov, source_id, external_post_id, health)
+            # A failed write leaves the post unmarked so the next run retries it.
+            if stored:
+                recent_ids.add(external_post_id)
+                wrote_new_posts += 1
 
             try:
                 await page.go_back(wait_until="domcontentloaded", timeout=60000)
@@ -290,17 +202,26 @@ async def scrape_posts(page, username, budget, gov, source_id=""):
                     pass
             await pause(gov.mult)
 
-        if older_post_boundary_hit:
+        if older_post_boundary_hit or budget.exhausted or (health is not None and health.tripped):
+            break
+
+        if not await budget.spend("scrolls"):
             break
+        metrics.SCROLLS.inc()
+        urls = await collector.scroll()
 
-        budget.consume("scrolls")
-        await page.mouse.wheel(0, 2200)
-        await pause(gov.mult)
+    if health is not None:
+        health.record_grid(saw_any_post_links)
 
-    if wrote_new_posts == 0:
+    if budget.exhausted:
+        metrics.BUDGET_STOPS.inc(action=budget.exhausted)
+        logger.info("Budget share for %s used up (%s) after %s new post(s); moving on.", username, budget.exhausted, wrote_new_posts)
+    elif wrote_new_posts == 0:
         if older_post_boundary_hit:
-            print(f"No new posts in the last {lookback_hours} hours for {username}.")
+            logger.info("No new posts in the last %s hours for %s.", lookback_hours, username)
         elif saw_any_post_links:
-            print(f"No new posts for {username}; skipping.")
+            logger.info("No new posts for %s; skipping.", username)
         else:
-            print(f"No post links found for {username}")
+            logger.info("No post links found for %s", username)
+
+    return wrote_new_posts
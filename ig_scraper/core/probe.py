@@ -0,0 +1,53 @@
+"""Batched selector probing.
+
+`probe(scope, selectors)` checks a whole selector list with one call into
+the extraction bundle (`core.extract`) in the page or frame and returns the
+selectors that matched, in the order given. `probe_scopes` runs the same
+probe over several frames/pages at once.
+Call sites that used to loop `query_selector` / `click(timeout=...)` over
+selector lists now cost one round-trip per frame.
+
+Besides plain CSS, the two Playwright selector forms used in this codebase
+are understood:
+
+- `text=Foo` matches when the page's visible text contains "foo"
+  (case-insensitive, whitespace-normalized). The quoted form `text="Foo"`
+  matches an element whose whole text is exactly "Foo".
+- `css:has-text("Foo")` matches an element selected by `css` whose text
+  contains "foo".
+
+Anything else that is not valid CSS simply does not match.
+"""
+
+import asyncio
+from typing import Any, Iterable, List, Sequence, Tuple
+
+from analytics import metrics
+from core import extract
+
+
+async def probe(scope: Any, selectors: Sequence[str], site: str = "") -> List[str]:
+    """Selectors from `selectors` present in `scope` (a Page or Frame), in the given order."""
+    selectors = [s for s in selectors if s]
+    if not selectors:
+        return []
+    metrics.DOM_PROBES.inc(site=site or "other")
+    try:
+        flags = await extract.call(scope, "probe", selectors)
+    except Exception:
+        return []
+    if not isinstance(flags, list):
+        return []
+    return [sel for sel, hit in zip(selectors, flags) if hit]
+
+
+async def probe_scopes(scopes: Iterable[Any], selectors: Sequence[str], site: str = "") -> List[Tuple[Any, List[str]]]:
+    """`probe` every scope concurrently; returns `(scope, matched)` pairs in scope order."""
+    scopes = list(scopes)
+    results = await asyncio.gather(*(probe(scope, selectors, site) for scope in scopes))
+    return list(zip(scopes, results))
+
+
+async def first_match(scope: Any, selectors: Sequence[str], site: str = "") -> str:
+    matched = await probe(scope, selectors, site)
+    return matched[0] if matched else ""
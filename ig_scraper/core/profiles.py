@@ -1,18 +1,70 @@
 from storage import api_client
+from dataclasses import dataclass, field
 from datetime import datetime
-from config.settings import ENABLE_PROFILE_WRITE
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+from config.settings import ENABLE_BASELINE_WRITE, ENABLE_PROFILE_WRITE
+from core import extract
+from core.grid import GridCollector
 
-async def scrape_profile(page, username):
+# How long the snapshot waits in-page for `main` to render.
+SNAPSHOT_MAIN_WAIT_MS = 8000
+
+
+@dataclass(slots=True)
+class ProfileSnapshot:
+    """One round-trip view of a freshly opened profile page."""
+
+    state: str = "ok"  # ok / login / challenge
+    root: str = ""  # "main", "body", or "" when neither could be read
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    profile: Dict[str, Any] = field(default_factory=dict)
+    collector: Optional[GridCollector] = None
+
+
+def _state_from_url(url: str) -> str:
+    lower = (url or "").lower()
+    if "/accounts/login" in lower:
+        return "login"
+    if "/challenge/" in lower or "/checkpoint/" in lower:
+        return "challenge"
+    return "ok"
+
+
+async def take_snapshot(page) -> ProfileSnapshot:
+    """Page state, layout fingerprints, profile fields and first grid links in a single evaluate.
+
+    Replaces `wait_for_selector("main")` + `inner_html("main")` + the profile
+    evaluate + the first grid collect; only fingerprints and small fields cross CDP.
+    """
+    collector = GridCollector(page, urlparse(page.url).path)
+    args = {"waitMs": SNAPSHOT_MAIN_WAIT_MS, "grid": collector.args("collect", reset=True)}
+    if ENABLE_BASELINE_WRITE:
+        args["fingerprint"] = {"keys": extract.BASELINE_KEYS["profile"], "depth": extract.FINGERPRINT_DEPTH}
+    try:
+        raw = await extract.call(page, "snapshot", args)
+    except Exception:
+        raw = None
+    if not isinstance(raw, dict):
+        return ProfileSnapshot(state=_state_from_url(page.url))
+    snap = ProfileSnapshot(
+        state=raw.get("state") or "ok",
+        root=raw.get("root") or "",
+        fingerprints=raw.get("fingerprints") if isinstance(raw.get("fingerprints"), dict) else {},
+        profile=raw.get("profile") if isinstance(raw.get("profile"), dict) else {},
+    )
+    if snap.state == "ok":
+        collector.prime(raw.get("grid"))
+        snap.collector = collector
+    return snap
+
+
+async def scrape_profile(page, username, data: Optional[Dict[str, Any]] = None):
     if not ENABLE_PROFILE_WRITE:
         return
 
-    data = await page.evaluate("""
-    () => ({
-        bio: document.querySelector("header section div span")?.innerText || "",
-        followers: Number(document.querySelector("a[href$='/followers/'] span")?.innerText.replace(/,/g,'')) || 0,
-        following: Number(document.querySelector("a[href$='/following/'] span")?.innerText.replace(/,/g,'')) || 0
-    })
-    """)
+    if data is None:
+        data = await extract.call(page, "profile")
 
     payload = {
         "username": username,
@@ -1,8 +1,9 @@
-import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Tuple, Any
 
+from storage import serialization
+
 
 STATE_PATH = Path(__file__).resolve().parent.parent / "storage" / "state.json"
 
@@ -15,15 +16,12 @@ def _ensure_state_file() -> None:
 
 def _read_state() -> Dict[str, Any]:
     _ensure_state_file()
-    try:
-        data = json.loads(STATE_PATH.read_text(encoding="utf-8") or "{}")
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
+    data = serialization.read_state(STATE_PATH)
+    return data if isinstance(data, dict) else {}
 
 
 def _write_state(state: Dict[str, Any]) -> None:
-    STATE_PATH.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    serialization.write_state(STATE_PATH, state)
 
 
 def quarantine_account(username: str, reason: str) -> None:
@@ -1,28 +1,20 @@
 """Run-state persistence helpers.
 
-Provides simple JSON-backed save/load helpers so scraper runs can persist
+Provides simple JSON-backed save/load helpers (via `storage.serialization`) so scraper runs can persist
 which targets were processed and resume after interruption.
 """
 
-import json
 from pathlib import Path
 from typing import Any, Dict
 
+from storage import serialization
+
 
 def load_state(path: str) -> Dict[str, Any]:
-    p = Path(path)
-    if not p.exists():
-        return {}
-    try:
-        with p.open("r", encoding="utf-8") as fh:
-            return json.load(fh)
-    except Exception:
-        return {}
+    state = serialization.read_state(Path(path))
+    return state if isinstance(state, dict) else {}
 
 
 def save_state(path: str, state: Dict[str, Any]) -> None:
-    p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with p.open("w", encoding="utf-8") as fh:
-        json.dump(state, fh, ensure_ascii=False, indent=2)
+    serialization.write_state(Path(path), state)
 
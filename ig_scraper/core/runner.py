@@ -1,18 +1,28 @@
 from core.browser import start_browser
+from core.pages import PagePool
+from core.probe import first_match, probe, probe_scopes
+from core import extract, waits
 from core.actions import pause
-from core.budgets import Budget
+from core.budgets import BudgetPlanner
 from core.governor import Governor
-from core.profiles import scrape_profile
+from core.profiles import scrape_profile, take_snapshot
 from core.posts import scrape_posts
-from core.baselines import record
+from core import baselines
+from core import health as extraction_health
+from core import leases
 from core.cooldowns import is_on_cooldown, set_cooldown
 from config.settings import BASE_URL, ACTION_LIMITS
-import asyncio
+from analytics import metrics
+from core.log import bound, get_logger
+from core.records import Target
 import os
 import re
 from pathlib import Path
 
 
+logger = get_logger("runner")
+
+
 async def ensure_logged_in(page, account, max_retries=2):
     username = account.get("username")
     password = account.get("password")
@@ -58,26 +68,31 @@ async def ensure_logged_in(page, account, max_retries=2):
             html = re.sub(r'(<input[^>]+name="(?:email|username)"[^>]*value=")([^"]*)(")', r'\1***\3', html, flags=re.IGNORECASE)
             with open(html_path, "w", encoding="utf-8") as fh:
                 fh.write(html)
-            print(f"Saved {png_path} and {html_path}")
+            logger.info("Saved %s and %s", png_path, html_path)
         except Exception as e:
-            print("Failed to save debug artifacts:", e)
+            logger.warning("Failed to save debug artifacts: %s", e)
 
     async def _dismiss_common_banners() -> None:
-        for banner in (
-            'text=Accept All',
-            'text=Accept',
-            'text=Agree',
-            'button:has-text("Accept")',
-            'button:has-text("Allow all cookies")',
-            'button:has-text("Allow essential and optional cookies")',
-            'button:has-text("Only allow essential cookies")',
-            'button:has-text("Not Now")',
-        ):
-            try:
-                await page.click(banner, timeout=1200)
-                break
-            except Exception:
-                pass
+        banner = await first_match(
+            page,
+            (
+                'text=Accept All',
+                'text=Accept',
+                'text=Agree',
+                'button:has-text("Accept")',
+                'button:has-text("Allow all cookies")',
+                'button:has-text("Allow essential and optional cookies")',
+                'button:has-text("Only allow essential cookies")',
+                'button:has-text("Not Now")',
+            ),
+            "banners",
+        )
+        if not banner:
+            return
+        try:
+            await page.click(banner, timeout=1200)
+        except Exception:
+            pass
 
     async def _click_text_option(options: list[str], tag: str) -> bool:
         for option in options:
@@ -88,33 +103,16 @@ async def ensure_logged_in(page, account, max_retries=2):
                 if await loc.count() > 0:
                     await loc.click(timeout=3000)
                     await page.wait_for_load_state("domcontentloaded", timeout=15000)
-                    print(f"Clicked account picker option via locator ({tag}): {option}")
+                    logger.debug("Clicked account picker option via locator (%s): %s", tag, option)
                     return True
             except Exception:
                 pass
 
         try:
-            clicked = await page.evaluate(
-                r"""
-                (labels) => {
-                    const normalized = labels.map(x => String(x || '').toLowerCase().trim()).filter(Boolean);
-                    const nodes = Array.from(document.querySelectorAll('button, a, [role="button"], div, span'));
-                    for (const node of nodes) {
-                        const text = (node.innerText || node.textContent || '').toLowerCase().replace(/\s+/g, ' ').trim();
-                        if (!text) continue;
-                        if (normalized.some(label => text === label || text.includes(label))) {
-                            node.click();
-                            return true;
-                        }
-                    }
-                    return false;
-                }
-                """,
-                options,
-            )
+            clicked = await extract.call(page, "clickText", options)
             if clicked:
                 await page.wait_for_load_state("domcontentloaded", timeout=15000)
-                print(f"Clicked account picker option via JS ({tag})")
+                logger.debug("Clicked account picker option via JS (%s)", tag)
                 return True
         except Exception:
             pass
@@ -129,13 +127,13 @@ async def ensure_logged_in(page, account, max_retries=2):
         ]
         switched = await _click_text_option(switch_profile_texts, "switch_profile")
         if switched:
-            print(f"Switched to manual login form for {username} via account picker")
+            logger.info("Switched to manual login form for %s via account picker", username)
         return switched
 
     async def _wait_for_session_after_picker_continue() -> bool:
         wait_seconds = max(2, int(os.getenv("PICKER_CONTINUE_WAIT_SECONDS", "8") or "8"))
-        checks = wait_seconds * 2
-        for _ in range(checks):
+
+        async def _session_started() -> bool:
             try:
                 current_url = (page.url or "").lower()
             except Exception:
@@ -143,43 +141,33 @@ async def ensure_logged_in(page, account, max_retries=2):
 
             if current_url and "instagram.com" in current_url and "/accounts/login" not in current_url and "/challenge/" not in current_url and "/checkpoint/" not in current_url:
                 return True
-            if await _has_auth_cookies():
-                return True
-            await asyncio.sleep(0.5)
-        return False
+            return await _has_auth_cookies()
+
+        return await waits.until(page, _session_started, wait_seconds, "picker_continue")
 
     async def _wait_for_manual_login_seed() -> bool:
         timeout_seconds = max(30, int(os.getenv("MANUAL_LOGIN_TIMEOUT_SECONDS", "300") or "300"))
-        print(
-            f"Manual login required for {username}. Complete Instagram login in the open browser window "
-            f"within {timeout_seconds}s to seed cookies."
+        logger.info(
+            "Manual login required for %s. Complete Instagram login in the open browser window "
+            "within %ss to seed cookies.",
+            username,
+            timeout_seconds,
         )
-        checks = timeout_seconds * 2
-        for _ in range(checks):
+
+        async def _seeded() -> bool:
             if await _handle_account_picker():
                 return True
-            try:
-                if _looks_logged_in(page.url) and await _has_auth_cookies():
-                    return True
-            except Exception:
-                pass
-            await asyncio.sleep(0.5)
-        return False
+            return _looks_logged_in(page.url) and await _has_auth_cookies()
+
+        return await waits.until(page, _seeded, timeout_seconds, "manual_login")
 
     async def _wait_for_manual_challenge_resolution() -> bool:
         timeout_seconds = max(30, int(os.getenv("MANUAL_CHALLENGE_TIMEOUT_SECONDS", "300") or "300"))
-        print(
-            f"Challenge/2-step detected for {username}. Complete verification in browser within {timeout_seconds}s."
-        )
-        checks = timeout_seconds * 2
-        for _ in range(checks):
-            try:
-                if _looks_logged_in(page.url) and await _has_auth_cookies():
-                    return True
-            except Exception:
-                pass
-            await asyncio.sleep(0.5)
-        return False
+        logger.warning("Challenge/2-step detected for %s. Complete verification in browser within %ss.", username, timeout_seconds)
+        return await waits.until(page, _has_session, timeout_seconds, "challenge")
+
+    async def _has_session() -> bool:
+        return _looks_logged_in(page.url) and await _has_auth_cookies()
 
     async def _handle_account_picker() -> bool:
         try:
@@ -210,12 +198,12 @@ async def ensure_logged_in(page, account, max_retries=2):
                 except Exception:
                     pass
                 if "instagram.com" in (page.url or "").lower() and "/accounts/login" not in (page.url or "").lower():
-                    print(f"Used account picker continue for {username} (cookie-confirmed)")
+                    logger.info("Used account picker continue for %s (cookie-confirmed)", username)
                     return True
                 if await _has_auth_cookies():
-                    print(f"Used account picker continue for {username} (session detected)")
+                    logger.info("Used account picker continue for %s (session detected)", username)
                     return True
-            print(f"Account picker continue did not establish session for {username}; keeping current picker state")
+            logger.warning("Account picker continue did not establish session for %s; keeping current picker state", username)
             return False
 
         if auto_switch_profile_on_picker and await _switch_picker_to_manual_login():
@@ -245,12 +233,9 @@ async def ensure_logged_in(page, account, max_retries=2):
                 'input[placeholder="Search"]',
                 'a[href*="/accounts/edit/"]',
             ]
-            for selector in logged_in_selectors:
-                try:
-                    await page.wait_for_selector(selector, timeout=2500)
-                    return True
-                except Exception:
-                    continue
+            # One wait on the combined selector instead of 2.5s per variant.
+            if await waits.for_selector(page, ", ".join(logged_in_selectors), 2.5, "logged_in"):
+                return True
             # Cookie-based success fallback for UI variants where selectors drift.
             if await _has_auth_cookies():
                 return True
@@ -268,22 +253,23 @@ async def ensure_logged_in(page, account, max_retries=2):
 
             if manual_login_seed_on_cookie_miss:
                 if headless_mode:
-                    print(
-                        f"Manual session seeding requested for {username}, but HEADLESS=1. "
-                        "Set HEADLESS=0 to complete first-time login and save cookies."
+                    logger.info(
+                        "Manual session seeding requested for %s, but HEADLESS=1. "
+                        "Set HEADLESS=0 to complete first-time login and save cookies.",
+                        username,
                     )
                 else:
                     seeded = await _wait_for_manual_login_seed()
                     if seeded:
-                        print(f"Manual login seed complete for {username}; cookies are now available.")
+                        logger.info("Manual login seed complete for %s; cookies are now available.", username)
                         return True
-                    print(f"Manual login seed timed out for {username}.")
+                    logger.warning("Manual login seed timed out for %s.", username)
 
             account["_login_failure_reason"] = "cookie_session_missing"
             if not has_password:
-                print(f"No valid IG session cookies for {username}, and no password is configured. Manual login is required.")
+                logger.info("No valid IG session cookies for %s, and no password is configured. Manual login is required.", username)
             else:
-                print(f"Session-seed auth enabled: no valid IG session cookies for {username}")
+                logger.info("Session-seed auth enabled: no valid IG session cookies for %s", username)
             return False
 
         # Navigate to explicit login page and submit credentials
@@ -305,13 +291,12 @@ async def ensure_logged_in(page, account, max_retries=2):
         await _dismiss_common_banners()
 
         # wait for any known login input to appear; IG can serve multiple form variants
-        try:
-            await page.wait_for_selector(
-                'input[name="username"], input[name="email"], input[autocomplete="username"], input[type="password"], input[name="pass"], input[name="password"]',
-                timeout=12000,
-            )
-        except Exception:
-            print("Login form did not render in time. url=", page.url)
+        login_inputs_selector = (
+            'input[name="username"], input[name="email"], input[autocomplete="username"], '
+            'input[type="password"], input[name="pass"], input[name="password"]'
+        )
+        if not await waits.for_selector(page, login_inputs_selector, 12, "login_form"):
+            logger.warning("Login form did not render in time. url=%s", page.url)
 
         username_selectors = [
             'input[name="username"]',
@@ -337,16 +322,12 @@ async def ensure_logged_in(page, account, max_retries=2):
                 'text=checkpoint',
                 'text=challenge',
             ]
-            for sel in error_selectors:
-                try:
-                    if await page.query_selector(sel):
-                        normalized = sel.lower()
-                        if "incorrect" in normalized or "password" in normalized:
-                            return "invalid_credentials"
-                        if "checkpoint" in normalized or "challenge" in normalized or "unusual login" in normalized:
-                            return "challenge_required"
-                except Exception:
-                    continue
+            for sel in await probe(page, error_selectors, "login_error"):
+                normalized = sel.lower()
+                if "incorrect" in normalized or "password" in normalized:
+                    return "invalid_credentials"
+                if "checkpoint" in normalized or "challenge" in normalized or "unusual login" in normalized:
+                    return "challenge_required"
 
             try:
                 body_text = (await page.inner_text("body")).lower()
@@ -362,7 +343,7 @@ async def ensure_logged_in(page, account, max_retries=2):
             return ""
 
         for attempt in range(max_retries):
-            print(f"Login attempt {attempt+1}/{max_retries} for {username}")
+            logger.info("Login attempt %s/%s for %s", attempt + 1, max_retries, username)
 
             await _dismiss_common_banners()
 
@@ -376,7 +357,8 @@ async def ensure_logged_in(page, account, max_retries=2):
                     pass
 
             async def _find_login_scope_and_fields():
-                scopes = [page, *list(page.frames)]
+                # A page and its main frame are the same document; probe it once.
+                scopes = [page, *[f for f in page.frames if f is not page.main_frame]]
 
                 # Include any additional tabs/pages created by Instagram auth flows.
                 try:
@@ -384,7 +366,7 @@ async def ensure_logged_in(page, account, max_retries=2):
                         if other_page is page:
                             continue
                         scopes.append(other_page)
-                        scopes.extend(list(other_page.frames))
+                        scopes.extend(f for f in other_page.frames if f is not other_page.main_frame)
                 except Exception:
                     pass
 
@@ -398,52 +380,26 @@ async def ensure_logged_in(page, account, max_retries=2):
                     seen_scope_ids.add(sid)
                     deduped_scopes.append(scope)
 
+                # One evaluate per frame covers every username/password variant.
+                probed = await probe_scopes(deduped_scopes, username_selectors + password_selectors, "login_fields")
+
                 # 1) Preferred: username+password form.
-                for scope in deduped_scopes:
-                    for us in username_selectors:
-                        try:
-                            user_el = await scope.query_selector(us)
-                        except Exception:
-                            user_el = None
-                        if not user_el:
-                            continue
-                        for ps in password_selectors:
-                            try:
-                                pass_el = await scope.query_selector(ps)
-                            except Exception:
-                                pass_el = None
-                            if pass_el:
-                                return scope, us, ps, False
+                for scope, matched in probed:
+                    user_matches = [us for us in username_selectors if us in matched]
+                    pass_matches = [ps for ps in password_selectors if ps in matched]
+                    if user_matches and pass_matches:
+                        return scope, user_matches[0], pass_matches[0], False
 
                 # 2) Fallback: password-only re-auth form.
-                for scope in deduped_scopes:
-                    for ps in password_selectors:
-                        try:
-                            pass_el = await scope.query_selector(ps)
-                        except Exception:
-                            pass_el = None
-                        if pass_el:
-                            return scope, "", ps, True
+                for scope, matched in probed:
+                    pass_matches = [ps for ps in password_selectors if ps in matched]
+                    if pass_matches:
+                        return scope, "", pass_matches[0], True
 
-                for scope in scopes:
-                    for us in username_selectors:
-                        try:
-                            user_el = await scope.query_selector(us)
-                        except Exception:
-                            user_el = None
-                        if not user_el:
-                            continue
-                        for ps in password_selectors:
-                            try:
-                                pass_el = await scope.query_selector(ps)
-                            except Exception:
-                                pass_el = None
-                            if pass_el:
-                                return scope, us, ps, False
                 return None, "", "", False
 
             if _is_challenge_like_url(page.url):
-                print(f"Challenge/checkpoint flow detected for {username}: {page.url}")
+                logger.warning("Challenge/checkpoint flow detected for %s: %s", username, page.url)
                 if manual_challenge_resolve and not headless_mode:
                     resolved = await _wait_for_manual_challenge_resolution()
                     if resolved:
@@ -454,9 +410,9 @@ async def ensure_logged_in(page, account, max_retries=2):
             login_scope, user_selector, pass_selector, password_only_form = await _find_login_scope_and_fields()
             if not login_scope:
                 try:
-                    print("Could not find login inputs on url:", page.url)
+                    logger.warning("Could not find login inputs on url: %s", page.url)
                     body_preview = (await page.inner_text("body"))[:220].replace("\n", " ")
-                    print("Login page body preview:", body_preview)
+                    logger.debug("Login page body preview: %s", body_preview)
                 except Exception:
                     pass
 
@@ -466,21 +422,21 @@ async def ensure_logged_in(page, account, max_retries=2):
                 if not cookie_only_auth:
                     switched = await _switch_picker_to_manual_login()
                     if switched:
-                        await asyncio.sleep(0.5)
+                        await waits.for_selector(page, login_inputs_selector, 5, "login_form")
                         continue
 
                 failure_reason = await _detect_login_error_reason()
                 if failure_reason:
                     account["_login_failure_reason"] = failure_reason
                 await _save_login_debug_artifacts(f"no_inputs_attempt_{attempt+1}")
-                await asyncio.sleep(1)
+                await waits.for_network_idle(page, 1, "login_retry")
                 continue
 
             if user_selector:
-                print("username selector check:", user_selector, "->", True)
+                logger.debug("username selector check: %s -> %s", user_selector, True)
             else:
-                print("username selector check: <not required for password-only re-auth form>")
-            print("password selector check:", pass_selector, "->", True)
+                logger.debug("username selector check: <not required for password-only re-auth form>")
+            logger.debug("password selector check: %s -> %s", pass_selector, True)
 
             filled_user = False
             if password_only_form:
@@ -506,9 +462,9 @@ async def ensure_logged_in(page, account, max_retries=2):
                 filled_pass = False
 
             if not (filled_user and filled_pass):
-                print("Found login fields but failed to fill one or both fields")
+                logger.warning("Found login fields but failed to fill one or both fields")
                 await _save_login_debug_artifacts(f"fill_failed_attempt_{attempt+1}")
-                await asyncio.sleep(1)
+                await waits.for_network_idle(page, 1, "login_retry")
                 continue
 
             # submit: try several ways to trigger the login
@@ -525,39 +481,39 @@ async def ensure_logged_in(page, account, max_retries=2):
                 'button:has-text("Continue")',
                 'text=Continue',
             ]
-            for s in submit_selectors:
+            for s in await probe(login_scope, submit_selectors, "login_submit"):
                 try:
                     btn = await login_scope.query_selector(s)
-                    print('submit selector check:', s, '->', bool(btn))
+                    logger.debug("submit selector check: %s -> %s", s, bool(btn))
                     if not btn:
                         continue
                     try:
                         await btn.click()
-                        print('Clicked submit element for selector:', s)
+                        logger.debug("Clicked submit element for selector: %s", s)
                     except Exception:
                         # fallback to JS click
                         try:
-                            await page.evaluate("(sel)=>{const b=document.querySelector(sel); if(b) b.click();}", s)
-                            print('Evaluated click via JS for selector:', s)
+                            await extract.call(page, "click", s)
+                            logger.debug("Evaluated click via JS for selector: %s", s)
                         except Exception as e:
-                            print('Failed to click or eval-click for', s, e)
+                            logger.warning("Failed to click or eval-click for %s: %s", s, e)
                             continue
 
                     submit_attempted = True
                     break
                 except Exception as e:
-                    print('submit selector error for', s, e)
+                    logger.debug("submit selector error for %s: %s", s, e)
                     continue
 
             if not submit_attempted:
                 # try pressing Enter while focused on password input
                 try:
-                    for ps in password_selectors:
+                    for ps in await probe(login_scope, password_selectors, "login_submit"):
                         try:
                             el = await login_scope.query_selector(ps)
                             if el:
                                 await el.press('Enter')
-                                print('Pressed Enter on', ps)
+                                logger.debug("Pressed Enter on %s", ps)
                                 submit_attempted = True
                                 break
                         except Exception:
@@ -568,8 +524,8 @@ async def ensure_logged_in(page, account, max_retries=2):
             if not submit_attempted:
                 # fallback: call form.submit() via JS
                 try:
-                    await page.evaluate("() => { const f = document.querySelector('form'); if(f) f.submit(); }")
-                    print('Called form.submit() via JS')
+                    await extract.call(page, "submitForm")
+                    logger.debug("Called form.submit() via JS")
                     submit_attempted = True
                 except Exception:
                     pass
@@ -582,12 +538,8 @@ async def ensure_logged_in(page, account, max_retries=2):
                     'a[href*="/accounts/edit/"]',
                     'nav',
                 ]
-                for success_selector in success_selectors:
-                    try:
-                        await page.wait_for_selector(success_selector, timeout=4000)
-                        return True
-                    except Exception:
-                        continue
+                if await waits.for_selector(page, ", ".join(success_selectors), 4, "login_success"):
+                    return True
 
                 await page.wait_for_load_state("domcontentloaded")
                 if _looks_logged_in(page.url) and await _has_auth_cookies():
@@ -598,13 +550,15 @@ async def ensure_logged_in(page, account, max_retries=2):
             failure_reason = await _detect_login_error_reason()
             if failure_reason:
                 account["_login_failure_reason"] = failure_reason
-                print(f"Detected login failure reason for {username}: {failure_reason}")
+                logger.info("Detected login failure reason for %s: %s", username, failure_reason)
                 if failure_reason in {"invalid_credentials", "challenge_required"}:
                     return False
 
             # save debug artifacts to inspect why login didn't complete
             await _save_login_debug_artifacts(f"post_submit_attempt_{attempt+1}")
-            await asyncio.sleep(2)
+            # A slow submit can still land; give it until the retry instead of a blind sleep.
+            if await waits.until(page, _has_session, 2, "login_retry"):
+                return True
         if not account.get("_login_failure_reason"):
             account["_login_failure_reason"] = "login_failed"
         return False
@@ -613,18 +567,58 @@ async def ensure_logged_in(page, account, max_retries=2):
             account["_login_failure_reason"] = "login_failed"
         return False
 
+async def _iter_targets(targets):
+    """Iterate a target list or an async stream of targets (see core.targets.TargetFeed)."""
+    if hasattr(targets, "__aiter__"):
+        async for target in targets:
+            yield target
+    else:
+        for target in targets:
+            yield target
+
+
+_NO_TARGET = object()
+
+
+async def _with_lookahead(targets):
+    """Yield `(target, next_target)` pairs so the next profile can be prefetched."""
+    previous = _NO_TARGET
+    async for target in _iter_targets(targets):
+        if previous is not _NO_TARGET:
+            yield previous, target
+        previous = target
+    if previous is not _NO_TARGET:
+        yield previous, None
+
+
+def _target_fields(target) -> tuple[str, str]:
+    if isinstance(target, Target):
+        return target.username, target.source_id
+    if isinstance(target, dict):
+        return target.get("username", ""), target.get("source_id", "")
+    return str(target), ""
+
+
 async def run_account(account, targets):
     username = account.get("username")
     if not username:
-        print("Skipping account with missing username")
+        logger.warning("Skipping account with missing username")
         return "skipped_missing_username"
 
     if await is_on_cooldown(username):
         return "skipped_cooldown"
 
+    metrics.bind_account(username)
+
+    account["_run_stats"] = {}
     gov = Governor()
-    budget = Budget(ACTION_LIMITS)
-    total_targets = len(targets) if isinstance(targets, list) else 0
+    health = extraction_health.for_account(username)
+    # Only targets this process holds a lease on (all of them without LEASE_STORE).
+    claims = leases.claimed(targets)
+    # Streamed targets are counted as they arrive.
+    streamed = not isinstance(targets, list)
+    total_targets = 0 if streamed else len(targets)
+    plan = BudgetPlanner(ACTION_LIMITS, username, expected_targets=None if streamed else total_targets)
     processed_targets = 0
     target_errors = 0
     skipped_empty_username = 0
@@ -636,25 +630,26 @@ async def run_account(account, targets):
     try:
         pw, ctx, page = await start_browser(session_dir)
     except Exception as e:
-        print(f"Browser startup failed for {username}: {e}")
+        logger.warning("Browser startup failed for %s: %s", username, e)
         await set_cooldown(username, 6)
         return "browser_start_failed"
     # ensure we are logged into Instagram (use session if present, otherwise perform login)
     logged = await ensure_logged_in(page, account)
+    metrics.LOGIN_OUTCOMES.inc(outcome="ok" if logged else (account.get("_login_failure_reason") or "login_failed"))
     if not logged:
         login_reason = account.get("_login_failure_reason") or "login_failed"
-        print("Login failed for", username)
+        logger.warning("Login failed for %s", username)
         if login_reason == "invalid_credentials":
-            print("Invalid credentials detected for", username)
+            logger.warning("Invalid credentials detected for %s", username)
             await set_cooldown(username, 48)
         elif login_reason == "cookie_session_missing":
-            print("Cookie-only auth: session missing/expired for", username, "- skipping credential login")
+            logger.warning("Cookie-only auth: session missing/expired for %s - skipping credential login", username)
             await set_cooldown(username, 1)
         elif login_reason == "challenge_required":
-            print("Challenge required for", username, "- skipping without quarantine")
+            logger.warning("Challenge required for %s - skipping without quarantine", username)
             await set_cooldown(username, 6)
         else:
-            print("Transient login failure for", username, "- skipping without quarantine")
+            logger.warning("Transient login failure for %s - skipping without quarantine", username)
             await set_cooldown(username, 6)
         await ctx.close()
         await pw.stop()
@@ -664,86 +659,112 @@ async def run_account(account, targets):
         os.makedirs(session_dir, exist_ok=True)
         storage_path = Path(session_dir) / "storage_state.json"
         await ctx.storage_state(path=str(storage_path))
-        print("Saved storage_state to", storage_path)
+        logger.info("Saved storage_state to %s", storage_path)
     except Exception as e:
-        print("Failed to save storage state:", e)
+        logger.warning("Failed to save storage state: %s", e)
+    pool = PagePool(ctx, page)
     try:
-        for target in targets:
-            try:
-                if isinstance(target, dict):
-                    u = target.get("username", "")
-                    source_id = target.get("source_id", "")
-                else:
-                    u = str(target)
-                    source_id = ""
-
-                if not u:
-                    skipped_empty_username += 1
-                    continue
-
-                await page.goto(f"{BASE_URL}/{u}/", wait_until="domcontentloaded", timeout=60000)
-                await pause(gov.mult)
+        # Consent cookies and the overlay guard are set up once per context
+        # instead of probing overlay buttons on every target.
+        try:
+            await pool.prepare()
+        except Exception as e:
+            logger.warning("Page pool setup failed for %s: %s", username, e)
+        paired = _with_lookahead(claims) if pool.size > 1 else ((t, None) async for t in _iter_targets(claims))
+        async for target, upcoming in paired:
+            if streamed:
+                total_targets += 1
+            u, source_id = _target_fields(target)
+            if health.tripped:
+                break
+            if plan.exhausted:
+                logger.info("Action budget for %s spent; leaving the remaining targets.", username)
+                break
+            with bound(target=u):
+                try:
+                    if not u:
+                        skipped_empty_username += 1
+                        metrics.TARGETS.inc(outcome="skipped_empty_username")
+                        continue
 
-                for overlay in (
-                    'button:has-text("Not Now")',
-                    'button:has-text("Accept")',
-                    'button:has-text("Accept all")',
-                    'button:has-text("Allow all cookies")',
-                    'text=Accept All',
-                ):
-                    try:
-                        await page.click(overlay, timeout=1200)
-                        break
-                    except Exception:
-                        pass
+                    page = await pool.open(f"{BASE_URL}/{u}/")
+                    next_username = _target_fields(upcoming)[0] if upcoming is not None else ""
+                    if next_username:
+                        pool.prefetch(f"{BASE_URL}/{next_username}/")
+                    await pause(gov.mult)
 
-                if "/accounts/login" in page.url:
-                    relogged = await ensure_logged_in(page, account, max_retries=1)
-                    if not relogged:
-                        print(f"Skipping {u}: redirected to login and relogin failed")
-                        skipped_relogin_failed += 1
+                    # State, main-content hash, profile fields and first grid links in one call.
+                    snap = await take_snapshot(page)
+                    if snap.state == "login":
+                        relogged = await ensure_logged_in(page, account, max_retries=1)
+                        metrics.LOGIN_OUTCOMES.inc(outcome="relogin_ok" if relogged else "relogin_failed")
+                        if not relogged:
+                            logger.warning("Skipping %s: redirected to login and relogin failed", u)
+                            skipped_relogin_failed += 1
+                            metrics.TARGETS.inc(outcome="skipped_relogin_failed")
+                            await claims.release(target)
+                            continue
+                        await page.goto(f"{BASE_URL}/{u}/", wait_until="domcontentloaded", timeout=60000)
+                        await pause(gov.mult)
+                        snap = await take_snapshot(page)
+
+                    if snap.state == "challenge":
+                        logger.warning("Skipping %s: challenge/checkpoint page encountered (%s)", u, page.url)
+                        skipped_challenge += 1
+                        metrics.TARGETS.inc(outcome="skipped_challenge")
+                        await claims.release(target)
                         continue
-                    await page.goto(f"{BASE_URL}/{u}/", wait_until="domcontentloaded", timeout=60000)
-                    await pause(gov.mult)
 
-                if "/challenge/" in page.url or "/checkpoint/" in page.url:
-                    print(f"Skipping {u}: challenge/checkpoint page encountered ({page.url})")
-                    skipped_challenge += 1
-                    continue
+                    if snap.root == "body":
+                        logger.warning("Using body fallback for %s: 'main' not found on %s", u, page.url)
+                    elif not snap.root:
+                        logger.warning("Could not snapshot %s: body/main unavailable on %s", u, page.url)
+                    baselines.observe(snap.fingerprints)
 
-                html = ""
-                try:
-                    await page.wait_for_selector("main", timeout=8000)
-                    html = await page.inner_html("main", timeout=5000)
-                except Exception:
+                    await scrape_profile(page, u, snap.profile or None)
+                    target_budget = plan.for_target(source_id)
+                    written = None
                     try:
-                        html = await page.inner_html("body", timeout=5000)
-                        print(f"Using body fallback for {u}: 'main' not found on {page.url}")
-                    except Exception:
-                        html = await page.content()
-                        print(f"Using page.content fallback for {u}: body/main unavailable on {page.url}")
-
-                record("article", html)
-
-                await scrape_profile(page, u)
-                await scrape_posts(page, u, budget, gov, source_id=source_id)
-                processed_targets += 1
-            except Exception as profile_error:
-                print(f"Error scraping {u}: {profile_error}")
-                target_errors += 1
-                continue
+                        written = await scrape_posts(page, u, target_budget, gov, source_id=source_id, collector=snap.collector, health=health)
+                    finally:
+                        plan.settle(target_budget, source_id, written)
+                    processed_targets += 1
+                    metrics.TARGETS.inc(outcome="processed")
+                    await claims.complete(target)
+                except Exception as profile_error:
+                    logger.warning("Error scraping %s: %s", u, profile_error)
+                    target_errors += 1
+                    metrics.TARGETS.inc(outcome="error")
+                    await claims.release(target)
+                    continue
     except Exception as e:
-        print("Hard error:", e)
+        logger.error("Hard error: %s", e)
         await set_cooldown(username, 48)
         return f"hard_error:{type(e).__name__}"
     finally:
+        await pool.discard_prefetches()
+        await claims.release_unfinished()
+        plan.close(total_targets)
+        account["_run_stats"] = {
+            "total_targets": total_targets,
+            "processed_targets": processed_targets,
+            "target_errors": target_errors,
+            "skipped_relogin_failed": skipped_relogin_failed,
+            "skipped_challenge": skipped_challenge,
+            "extraction_breaker": health.trip_reason,
+        }
         await ctx.close()
         await pw.stop()
-
-    print(
-        f"Account summary {username}: total={total_targets}, processed={processed_targets}, "
-        f"target_errors={target_errors}, skipped_empty_username={skipped_empty_username}, "
-        f"skipped_relogin_failed={skipped_relogin_failed}, skipped_challenge={skipped_challenge}"
+        metrics.flush(account=username)
+
+    logger.info(
+        "Account summary %s: total=%s, processed=%s, target_errors=%s, skipped_empty_username=%s, "
+        "skipped_relogin_failed=%s, skipped_challenge=%s",
+        username, total_targets, processed_targets, target_errors, skipped_empty_username,
+        skipped_relogin_failed, skipped_challenge,
+        extra={"event": "account_summary", **account["_run_stats"], "skipped_empty_username": skipped_empty_username},
     )
 
+    if health.tripped:
+        return "extraction_degraded"
     return "ok"
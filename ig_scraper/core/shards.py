@@ -0,0 +1,263 @@
+"""Multi-process account runner.
+
+With `RUN_PROCESSES` > 1, concurrent account runs are split across spawned
+worker processes. Each worker has its own event loop, browser(s) and Lens
+API client, so CDP message decoding, evaluate results and serialization for
+different browsers no longer share one core.
+
+The parent process stays the coordinator:
+
+- it owns the `TargetFeed` (the single paged read of the source list) and
+  pumps each account's share into that account's worker queue;
+- it receives every account result and records it in the run state file,
+  so `state.json` still has a single writer;
+- it keeps the same backpressure rules as the single-process runner. Queues
+  are bounded only when every account of a shard runs at once.
+
+Budgets stay per account and each account runs in exactly one worker, so they
+need no cross-process sharing.
+
+Worker `n` uses `<POST_SPOOL_DIR>/worker-<n>` for its durable post spool
+(the spool directory is locked per process), serves no metrics port, and
+writes its textfile metrics to `<name>.worker-<n>.prom`. Keep
+`RUN_PROCESSES` stable between runs so a worker finds and replays what its
+predecessor left in its spool.
+
+Spawned children re-import `main.py`, and with it modules that read their
+settings at import time. The worker overrides are therefore put into the
+environment the child inherits when it is started, not applied inside it.
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+_END = "__end__"
+_SKIP = "__skip__"
+# How often blocked queue operations re-check for shutdown.
+_POLL_SECONDS = 0.5
+
+logger = logging.getLogger("ig_scraper.shards")
+
+
+def shard_accounts(count: int, processes: int) -> List[List[int]]:
+    """Round-robin account indexes over at most `processes` non-empty shards."""
+    processes = max(1, min(processes, count))
+    return [list(range(w, count, processes)) for w in range(processes)]
+
+
+def per_process_concurrency(max_workers: int, processes: int) -> int:
+    return max(1, math.ceil(max_workers / max(1, processes)))
+
+
+def _worker_env(worker: int) -> Dict[str, str]:
+    base = os.getenv("POST_SPOOL_DIR", "").strip() or str(Path(__file__).resolve().parent.parent / "storage" / "spool")
+    env = {"POST_SPOOL_DIR": str(Path(base) / f"worker-{worker}"), "METRICS_PORT": "0"}
+    textfile = os.getenv("METRICS_TEXTFILE", "").strip()
+    if textfile:
+        p = Path(textfile)
+        env["METRICS_TEXTFILE"] = str(p.with_name(f"{p.stem}.worker-{worker}{p.suffix or '.prom'}"))
+    return env
+
+
+# -- worker side --------------------------------------------------------------
+
+
+def _worker_main(worker: int, accounts, target_queues, results, concurrency: int) -> None:
+    from core.log import setup_logging
+
+    setup_logging()
+    asyncio.run(_run_worker(worker, accounts, target_queues, results, concurrency))
+
+
+async def _run_worker(worker: int, accounts, target_queues, results, concurrency: int) -> None:
+    from core import leases
+    from core.background import create_logged_task
+    from core.log import bound
+    from core.runner import run_account
+    from storage import api_client
+
+    loop = asyncio.get_running_loop()
+    # One thread per account queue so blocked reads never starve each other.
+    executor = ThreadPoolExecutor(max_workers=len(accounts) + 1, thread_name_prefix=f"shard{worker}")
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    spool_replay = create_logged_task(api_client.run_spool_replay(), f"post spool replay (worker {worker})")
+
+    async def run_one(idx: int, account: dict) -> None:
+        q = target_queues[idx]
+        stop = threading.Event()
+
+        async def next_target():
+            return await loop.run_in_executor(executor, _get, q, stop)
+
+        async with semaphore:
+            first = await next_target()
+            if first == _SKIP:
+                results.put((idx, "skipped", None, None))
+                return
+
+            async def targets():
+                item = first
+                while item != _END:
+                    yield item
+                    item = await next_target()
+
+            try:
+                with bound(account=account.get("username", "")):
+                    outcome: Tuple[str, Any] = ("ok", await run_account(account, targets()))
+            except Exception as e:
+                logger.warning("Account run failed for %s: %s", account.get("username", "unknown"), e)
+                outcome = ("error", f"{type(e).__name__}: {e}")
+            finally:
+                stop.set()
+            results.put((idx, outcome[0], outcome[1], account.get("_run_stats")))
+
+    try:
+        await asyncio.gather(*(run_one(idx, account) for idx, account in accounts))
+    finally:
+        spool_replay.cancel()
+        try:
+            await spool_replay
+        except asyncio.CancelledError:
+            pass
+        await api_client.drain_spool()
+        api_client.close_spool()
+        await api_client.close()
+        await leases.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get(q, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _END
+
+
+# -- coordinator side ---------------------------------------------------------
+
+
+@contextmanager
+def _environment(overrides: Dict[str, str]):
+    saved = {k: os.environ.get(k) for k in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def _put(q, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+async def _pump(feed, idx: int, q, stop: threading.Event, executor) -> None:
+    """Forward consumer `idx` of `feed` into its worker queue."""
+    loop = asyncio.get_running_loop()
+    if not await feed.ready(idx):
+        await loop.run_in_executor(executor, _put, q, _SKIP, stop)
+        return
+    async for target in feed.targets(idx):
+        if not await loop.run_in_executor(executor, _put, q, target, stop):
+            return
+    await loop.run_in_executor(executor, _put, q, _END, stop)
+
+
+async def run_sharded(
+    accounts: Sequence[dict],
+    feed,
+    processes: int,
+    concurrency: int,
+    queue_size: int,
+    on_result: Callable[[dict, Any], None],
+) -> List[Optional[Any]]:
+    """Run `accounts` in worker processes; returns per-account results like `run_slot` (None = not started)."""
+    ctx = multiprocessing.get_context("spawn")
+    shards = shard_accounts(len(accounts), processes)
+    target_queues = [ctx.Queue(queue_size) for _ in accounts]
+    results = ctx.Queue()
+    stops = [threading.Event() for _ in accounts]
+    executor = ThreadPoolExecutor(max_workers=len(accounts) + 1, thread_name_prefix="shard-pump")
+    loop = asyncio.get_running_loop()
+
+    workers = []
+    for w, shard in enumerate(shards):
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(w, [(i, accounts[i]) for i in shard], {i: target_queues[i] for i in shard}, results, concurrency),
+            name=f"ig-shard-{w}",
+        )
+        with _environment(_worker_env(w)):
+            proc.start()
+        workers.append((proc, shard))
+    logger.info("Started %s shard worker(s) for %s account(s)", len(workers), len(accounts))
+
+    outcomes: Dict[int, Optional[Any]] = {}
+
+    def finish(idx: int, kind: str, value: Any, run_stats: Any) -> None:
+        if idx in outcomes:
+            return
+        stops[idx].set()
+        feed.close(idx)
+        if kind == "skipped":
+            outcomes[idx] = None
+            return
+        result = RuntimeError(value) if kind == "error" else value
+        outcomes[idx] = result
+        accounts[idx]["_run_stats"] = run_stats or {}
+        on_result(accounts[idx], result)
+
+    pumps = [asyncio.create_task(_pump(feed, i, target_queues[i], stops[i], executor)) for i in range(len(accounts))]
+    try:
+        while len(outcomes) < len(accounts):
+            try:
+                finish(*await loop.run_in_executor(executor, results.get, True, _POLL_SECONDS))
+                continue
+            except queue.Empty:
+                pass
+            for proc, shard in workers:
+                if proc.is_alive():
+                    continue
+                # Collect anything it reported before exiting, then fail the rest.
+                while True:
+                    try:
+                        finish(*results.get_nowait())
+                    except queue.Empty:
+                        break
+                for idx in shard:
+                    if idx not in outcomes:
+                        logger.warning("Shard worker %s exited (code %s) before %s finished", proc.name, proc.exitcode, accounts[idx].get("username", "unknown"))
+                        finish(idx, "error", f"shard worker exited with code {proc.exitcode}", None)
+    finally:
+        for stop in stops:
+            stop.set()
+        for task in pumps:
+            task.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        for proc, _ in workers:
+            await loop.run_in_executor(executor, proc.join, 60)
+            if proc.is_alive():
+                proc.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [outcomes.get(i) for i in range(len(accounts))]
@@ -0,0 +1,295 @@
+"""Source-to-target normalization.
+
+`build_targets` turns raw `/api/app/source` rows into scrape targets
+(`core.records.Target`). Small lists use the per-row
+helpers; large catalogs go through `build_targets_bulk`, which does the URL
+host check and username extraction as pandas column passes (Arrow-backed
+strings when pyarrow is installed, so the regex work runs outside Python).
+Rows whose URL or handle falls outside the shapes the vectorized pass
+understands (whitespace or non-ASCII characters, `;` params, IPv6 brackets,
+non-string values, no `//` authority) are handed to the per-row helpers, and
+handles go through `_normalize_username` itself, since Arrow's trim and
+lowercase differ from `str.strip`/`str.lower` outside ASCII. Both paths
+return the same targets in the same order.
+
+For streamed source lists, `TargetBuilder` normalizes page by page and
+`TargetFeed` hands the resulting targets to the account workers as they
+arrive.
+"""
+
+import asyncio
+import os
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.records import Target
+
+
+BULK_MIN_SOURCES = int(os.getenv("BULK_TARGET_MIN_SOURCES", "5000") or "5000")
+
+EXCLUDED_PATH_ROOTS = {"p", "reel", "explore", "stories", "accounts"}
+
+# scheme://netloc/path as split by urllib.parse.urlsplit for "simple" URLs.
+_URL_PATTERN = r"^(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//(?P<netloc>[^/?#]*)(?P<path>[^?#]*)"
+# Non-ASCII is left to Python too, so `lower()` means the same on both paths.
+_UNSAFE_URL_CHARS = r"[^\x21-\x7e]|[\[\];]"
+
+# (targets, non_instagram_filtered, missing_username, duplicate_username)
+BuildResult = Tuple[List[Target], int, int, int]
+
+
+def _normalize_username(raw: str) -> str:
+    value = (raw or "").strip()
+    if not value:
+        return ""
+    if value.startswith("@"):
+        value = value[1:]
+    return value.strip("/").lower()
+
+
+def _extract_username_from_url(source_url: str) -> str:
+    if not source_url:
+        return ""
+    try:
+        parsed = urlparse(source_url)
+        host = (parsed.netloc or "").lower()
+        if "instagram.com" not in host:
+            return ""
+        parts = [p for p in (parsed.path or "").split("/") if p]
+        if not parts:
+            return ""
+        if parts[0].lower() in EXCLUDED_PATH_ROOTS:
+            return ""
+        return _normalize_username(parts[0])
+    except Exception:
+        return ""
+
+
+def _is_instagram_source(source: dict) -> bool:
+    """Check whether a source should be treated as Instagram.
+
+    Primary signal is platform id (Instagram=4). URL host is used as an
+    additional safety check when available.
+    """
+    url = (source.get("sourceUrl") or "").strip().lower()
+    platform_value = source.get("platform")
+
+    # Backend enum: Instagram = 4
+    is_platform_instagram = str(platform_value).strip() == "4"
+
+    # Some rows may have non-instagram URLs; only accept if URL is empty or instagram host.
+    if url:
+        try:
+            host = (urlparse(url).netloc or "").lower()
+        except Exception:
+            host = ""
+        is_instagram_host = "instagram.com" in host
+    else:
+        is_instagram_host = True
+
+    return is_platform_instagram and is_instagram_host
+
+
+def _source_username(source: dict) -> str:
+    username = _extract_username_from_url(source.get("sourceUrl", ""))
+    if not username:
+        username = _normalize_username(source.get("sourceHandle", ""))
+    return username
+
+
+def _assemble(
+    sources: List[dict],
+    accepted: List[bool],
+    usernames: List[str],
+    dedup_usernames: bool,
+    seen: Optional[set] = None,
+) -> BuildResult:
+    targets: List[Target] = []
+    seen = set() if seen is None else seen
+    filtered_non_instagram = 0
+    missing_username = 0
+    duplicate_username = 0
+    for source, ok, username in zip(sources, accepted, usernames):
+        if not ok:
+            filtered_non_instagram += 1
+            continue
+        if not username:
+            missing_username += 1
+            continue
+        if dedup_usernames and username in seen:
+            duplicate_username += 1
+            continue
+        seen.add(username)
+        targets.append(Target(username, source.get("id", ""), source.get("sourceUrl", "")))
+    return targets, filtered_non_instagram, missing_username, duplicate_username
+
+
+def build_targets_scalar(sources: List[Any], dedup_usernames: bool, seen: Optional[set] = None) -> BuildResult:
+    rows = [s for s in sources if isinstance(s, dict)]
+    accepted = [_is_instagram_source(s) for s in rows]
+    usernames = [_source_username(s) if ok else "" for s, ok in zip(rows, accepted)]
+    return _assemble(rows, accepted, usernames, dedup_usernames, seen)
+
+
+def _string_dtype(pd) -> Any:
+    # Arrow-backed strings run the regex passes in C++; object dtype loops in Python.
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return object
+    return pd.ArrowDtype(pa.string())
+
+
+def build_targets_bulk(sources: List[Any], dedup_usernames: bool, seen: Optional[set] = None) -> BuildResult:
+    import pandas as pd
+
+    rows = [s for s in sources if isinstance(s, dict)]
+    if not rows:
+        return [], 0, 0, 0
+
+    urls = pd.Series([s.get("sourceUrl") for s in rows], dtype=object)
+    handles = pd.Series([s.get("sourceHandle") for s in rows], dtype=object)
+    platforms = pd.Series([s.get("platform") for s in rows], dtype=object)
+
+    url_types = urls.map(type)
+    url_is_str = url_types == str
+    url_empty = (url_types == type(None)) | (url_is_str & (urls == ""))
+    handle_ok = handles.map(type).isin([str, type(None)])
+    url_str = urls.where(url_is_str, "").astype(_string_dtype(pd))
+
+    parts = url_str.str.extract(_URL_PATTERN)
+    url_simple = url_is_str & parts["netloc"].notna() & ~url_str.str.contains(_UNSAFE_URL_CHARS, regex=True)
+    fast = (url_empty | url_simple) & handle_ok
+
+    netloc = parts["netloc"].fillna("").str.lower()
+    is_ig_host = netloc.str.contains("instagram.com", regex=False)
+    platform_ok = platforms.map(str).str.strip() == "4"
+    accepted = platform_ok & (url_empty | is_ig_host)
+
+    first_segment = parts["path"].fillna("").str.extract(r"^/*(?P<seg>[^/]+)")["seg"].fillna("")
+    url_username = first_segment.str.replace(r"^@", "", n=1, regex=True).str.lower()
+    url_username = url_username.where(is_ig_host & ~first_segment.str.lower().isin(EXCLUDED_PATH_ROOTS), "")
+
+    accepted_list = accepted.fillna(False).astype(bool).tolist()
+    username_list = url_username.tolist()
+    for idx, (handle, ok) in enumerate(zip(handles.tolist(), handle_ok.tolist())):
+        if accepted_list[idx] and not username_list[idx] and ok:
+            username_list[idx] = _normalize_username(handle)
+    for idx in (~fast).to_numpy().nonzero()[0].tolist():
+        source = rows[idx]
+        accepted_list[idx] = _is_instagram_source(source)
+        username_list[idx] = _source_username(source) if accepted_list[idx] else ""
+
+    return _assemble(rows, accepted_list, username_list, dedup_usernames, seen)
+
+
+def build_targets(sources: List[Any], dedup_usernames: bool, seen: Optional[set] = None) -> BuildResult:
+    if len(sources) >= BULK_MIN_SOURCES > 0:
+        try:
+            return build_targets_bulk(sources, dedup_usernames, seen)
+        except ImportError:
+            pass
+    return build_targets_scalar(sources, dedup_usernames, seen)
+
+
+class TargetBuilder:
+    """Incremental `build_targets` for sources that arrive page by page.
+
+    Username dedupe and the summary counters carry across `feed` calls, so
+    feeding every page in order yields the same targets as one `build_targets`
+    call over the concatenated list.
+    """
+
+    def __init__(self, dedup_usernames: bool):
+        self.dedup_usernames = dedup_usernames
+        self.seen: set = set()
+        self.sources = 0
+        self.targets = 0
+        self.filtered_non_instagram = 0
+        self.missing_username = 0
+        self.duplicate_username = 0
+
+    def feed(self, sources: List[Any]) -> List[Target]:
+        targets, non_instagram, missing, duplicate = build_targets(sources, self.dedup_usernames, self.seen)
+        self.sources += len(sources)
+        self.targets += len(targets)
+        self.filtered_non_instagram += non_instagram
+        self.missing_username += missing
+        self.duplicate_username += duplicate
+        return targets
+
+
+_DONE = object()
+
+
+class TargetFeed:
+    """Fan a target stream out to per-account work queues.
+
+    Target `i` goes to consumer `i % consumers`, the same split as the old
+    `targets[i::n]` batches. Queues are bounded by `maxsize` (0 = unbounded)
+    so a fast producer waits for the accounts instead of buffering the whole
+    catalog. A consumer that stops early is `close`d: its queue is drained and
+    later targets for it are dropped, so the producer never blocks on it.
+
+    With `replayable=True` every target handed out is also kept, and
+    `targets(idx, replay=True)` yields those again before continuing the
+    stream, so a failover account also gets the targets a failed one pulled
+    but may not have finished.
+    """
+
+    def __init__(self, consumers: int, maxsize: int = 0, replayable: bool = False):
+        self.consumers = max(1, consumers)
+        self.produced = 0
+        self.finished = False
+        self._queues = [asyncio.Queue(maxsize) for _ in range(self.consumers)]
+        self._closed = [False] * self.consumers
+        self._head: List[Any] = [None] * self.consumers
+        self._handed: Optional[List[List[Target]]] = [[] for _ in range(self.consumers)] if replayable else None
+
+    async def run(self, stream: AsyncIterator[Target]) -> int:
+        """Consume `stream` into the queues; returns the number of targets produced."""
+        try:
+            async for target in stream:
+                idx = self.produced % self.consumers
+                self.produced += 1
+                if not self._closed[idx]:
+                    await self._queues[idx].put(target)
+        finally:
+            self.finished = True
+            for idx, queue in enumerate(self._queues):
+                if not self._closed[idx]:
+                    await queue.put(_DONE)
+        return self.produced
+
+    async def ready(self, idx: int) -> bool:
+        """Wait until consumer `idx` has a first target; False if the stream ended without one."""
+        if self._head[idx] is None:
+            self._head[idx] = await self._queues[idx].get()
+        return self._head[idx] is not _DONE
+
+    def handed_out(self, idx: int) -> int:
+        """Number of targets consumer `idx` can replay."""
+        return len(self._handed[idx]) if self._handed is not None else 0
+
+    async def targets(self, idx: int, replay: bool = False) -> AsyncIterator[Target]:
+        if replay and self._handed is not None:
+            for item in list(self._handed[idx]):
+                yield item
+        while True:
+            if self._head[idx] is not None:
+                item, self._head[idx] = self._head[idx], None
+            else:
+                item = await self._queues[idx].get()
+            if item is _DONE:
+                # Leave the marker in place so a failover consumer also stops.
+                self._head[idx] = _DONE
+                return
+            if self._handed is not None:
+                self._handed[idx].append(item)
+            yield item
+
+    def close(self, idx: int) -> None:
+        self._closed[idx] = True
+        queue = self._queues[idx]
+        while not queue.empty():
+            queue.get_nowait()
@@ -0,0 +1,122 @@
+"""Event-driven waits.
+
+Each helper returns as soon as its condition holds instead of sleeping on a
+fixed schedule, and records how long it waited in
+`ig_wait_seconds{site,outcome}` (outcome `met` or `timeout`).
+
+- `until(page, check, timeout)` re-runs an async `check` whenever a frame
+  navigates or the context receives a document/XHR response. That is how
+  session cookies arrive, so a cookie check reruns right after a cookie can
+  have changed. A slow fallback re-check (`WAIT_FALLBACK_SECONDS`) covers
+  changes that raise no event.
+- `for_function` waits on a DOM condition evaluated inside the page.
+- `for_selector` and `for_network_idle` wrap the matching Playwright waits.
+
+Timeouts are in seconds.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from analytics import metrics
+
+
+WAIT_FALLBACK_SECONDS = max(0.1, float(os.getenv("WAIT_FALLBACK_SECONDS", "2") or "2"))
+
+# Responses that can carry Set-Cookie for the session.
+_COOKIE_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+
+
+def _observe(started: float, site: str, met: bool) -> None:
+    metrics.WAITS.observe(time.perf_counter() - started, site=site or "other", outcome="met" if met else "timeout")
+
+
+async def until(
+    page,
+    check: Callable[[], Awaitable[Any]],
+    timeout: float,
+    site: str = "",
+    fallback: float = WAIT_FALLBACK_SECONDS,
+) -> bool:
+    """Wait until `check()` is truthy, re-checking on navigation and responses."""
+    started = time.perf_counter()
+    deadline = started + max(0.0, timeout)
+    changed = asyncio.Event()
+
+    def _on_navigated(frame) -> None:
+        changed.set()
+
+    def _on_response(response) -> None:
+        try:
+            if response.request.resource_type not in _COOKIE_RESOURCE_TYPES:
+                return
+        except Exception:
+            pass
+        changed.set()
+
+    ctx = page.context
+    page.on("framenavigated", _on_navigated)
+    ctx.on("response", _on_response)
+    met = False
+    try:
+        while True:
+            # Events that fire while the check runs trigger one more check.
+            changed.clear()
+            try:
+                met = bool(await check())
+            except Exception:
+                met = False
+            remaining = deadline - time.perf_counter()
+            if met or remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=min(remaining, fallback))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        page.remove_listener("framenavigated", _on_navigated)
+        ctx.remove_listener("response", _on_response)
+        _observe(started, site, met)
+    return met
+
+
+async def for_function(page, expression: str, arg: Any = None, timeout: float = 5.0, site: str = "") -> bool:
+    """Wait until the JS `expression` (called with `arg`) returns truthy in the page."""
+    started = time.perf_counter()
+    met = False
+    try:
+        await page.wait_for_function(expression, arg=arg, timeout=timeout * 1000)
+        met = True
+    except Exception:
+        met = False
+    finally:
+        _observe(started, site, met)
+    return met
+
+
+async def for_selector(page, selector: str, timeout: float = 5.0, site: str = "") -> bool:
+    started = time.perf_counter()
+    met = False
+    try:
+        await page.wait_for_selector(selector, timeout=timeout * 1000)
+        met = True
+    except Exception:
+        met = False
+    finally:
+        _observe(started, site, met)
+    return met
+
+
+async def for_network_idle(page, timeout: float = 2.0, site: str = "") -> bool:
+    started = time.perf_counter()
+    met = False
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout * 1000)
+        met = True
+    except Exception:
+        met = False
+    finally:
+        _observe(started, site, met)
+    return met
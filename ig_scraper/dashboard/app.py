@@ -1,28 +1,61 @@
-import pandas as pd, streamlit as st
-from storage import api_client
+import math
+
+import streamlit as st
+from dashboard import data, mirror
 
 st.title("Instagram Scraper Dashboard")
 
-st.subheader("Profiles")
-try:
-	profiles = api_client.fetch_profiles_sync()
-	df_profiles = pd.DataFrame(profiles if isinstance(profiles, list) else [])
-	st.dataframe(df_profiles)
-except Exception as e:
-	st.error(f"Failed to load profiles: {e}")
+st.sidebar.header("Data source")
+use_mirror = st.sidebar.toggle("Use local mirror", value=False)
+page_size = st.sidebar.selectbox("Rows per page", [50, 100, 200, 500], index=1)
+search = st.sidebar.text_input("Search").strip()
+source_id = st.sidebar.text_input("Source ID (posts)").strip()
+
+mirror_version = 0.0
+if use_mirror:
+	try:
+		if st.sidebar.button("Full resync"):
+			data.sync_mirror.clear()
+			data.sync_mirror(full=True)
+		else:
+			data.sync_mirror()
+	except Exception as e:
+		st.sidebar.error(f"Mirror sync failed: {e}")
+	try:
+		for name, status in mirror.sync_status().items():
+			mirror_version = max(mirror_version, status["last_synced_at"] or 0.0)
+			st.sidebar.caption(f"{name}: {status['local_rows']} local rows (remote {status['remote_total']})")
+	except Exception as e:
+		st.sidebar.error(f"Mirror unavailable: {e}")
+
+
+def render_dataset(title, dataset):
+	st.subheader(title)
+	page = st.number_input("Page", min_value=1, value=1, step=1, key=f"page_{dataset}")
+	try:
+		df, total = data.load_page(dataset, int(page), int(page_size), search, source_id, use_mirror, mirror_version)
+		st.dataframe(df)
+		if total is not None:
+			pages = max(1, math.ceil(total / page_size))
+			st.caption(f"Page {page} of {pages} ({total} rows)")
+	except Exception as e:
+		st.error(f"Failed to load {title.lower()}: {e}")
+
+
+render_dataset("Profiles", "profiles")
+render_dataset("Posts", "posts")
+render_dataset("Post History (Diffs)", "post_history")
 
-st.subheader("Posts")
-try:
-	posts = api_client.fetch_posts_sync()
-	df_posts = pd.DataFrame(posts if isinstance(posts, list) else [])
-	st.dataframe(df_posts)
-except Exception as e:
-	st.error(f"Failed to load posts: {e}")
 
-st.subheader("Post History (Diffs)")
+st.subheader("Throughput & Latency")
 try:
-	history = api_client.fetch_post_history_sync()
-	df_history = pd.DataFrame(history if isinstance(history, list) else [])
-	st.dataframe(df_history)
+	trends = data.load_account_trends()
+	if trends.empty:
+		st.info("No metrics snapshots recorded yet.")
+	else:
+		st.caption("Posts written per account run")
+		st.line_chart(trends.pivot_table(index="ts", columns="account", values="posts_written", aggfunc="last"))
+		st.caption("Mean Lens API latency (s)")
+		st.line_chart(trends.pivot_table(index="ts", columns="account", values="api_latency_avg_s", aggfunc="last"))
 except Exception as e:
-	st.error(f"Failed to load post history: {e}")
+	st.error(f"Failed to load metrics: {e}")
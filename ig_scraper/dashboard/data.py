@@ -0,0 +1,75 @@
+"""Cached, paged data access for the Streamlit dashboard.
+
+Every widget interaction reruns `app.py`, so all reads go through
+`st.cache_data` with a TTL. Pages are fetched one at a time either straight
+from the Lens API (`SkipCount`/`MaxResultCount`) or from the local SQLite
+mirror in `dashboard.mirror`, which lets the dashboard browse the full
+dataset instead of the first 200 rows.
+"""
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from analytics import metrics
+from dashboard import mirror
+from storage import api_client
+
+
+CACHE_TTL_SECONDS = max(1, int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60") or "60"))
+MIRROR_SYNC_TTL_SECONDS = max(1, int(os.getenv("DASHBOARD_MIRROR_SYNC_SECONDS", "300") or "300"))
+
+
+def _remote_params(dataset: str, search: str, source_id: str) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    if search:
+        params["Filter"] = search
+    if source_id and dataset == "posts":
+        params["SourceId"] = source_id
+    return params
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_page(
+    dataset: str,
+    page: int,
+    page_size: int,
+    search: str = "",
+    source_id: str = "",
+    use_mirror: bool = False,
+    mirror_version: float = 0.0,
+) -> Tuple[pd.DataFrame, Optional[int]]:
+    """Return one page of `dataset` as a DataFrame plus the total row count.
+
+    `mirror_version` only takes part in the cache key so mirrored pages are
+    re-read after each sync.
+    """
+    offset = max(0, page - 1) * page_size
+    if use_mirror:
+        filters = {"sourceId": source_id} if dataset == "posts" else None
+        rows, total = mirror.query(dataset, offset=offset, limit=page_size, search=search, filters=filters)
+    else:
+        rows, total = api_client.fetch_page_sync(
+            mirror.DATASETS[dataset],
+            skip_count=offset,
+            max_result_count=page_size,
+            params=_remote_params(dataset, search, source_id),
+        )
+    return pd.DataFrame(rows if isinstance(rows, list) else []), total
+
+
+@st.cache_data(ttl=MIRROR_SYNC_TTL_SECONDS, show_spinner="Syncing local mirror...")
+def sync_mirror(full: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Incrementally sync every dataset into the local mirror (cached per TTL)."""
+    return {dataset: mirror.sync_dataset(dataset, full=full) for dataset in mirror.DATASETS}
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def load_account_trends(limit: int = 500) -> pd.DataFrame:
+    """Per-account throughput and API latency from exported metrics snapshots."""
+    df = pd.DataFrame(metrics.account_trends(metrics.load_history(limit=limit)))
+    if not df.empty:
+        df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    return df
@@ -0,0 +1,202 @@
+"""Local SQLite mirror of the Lens API datasets shown on the dashboard.
+
+The mirror is synced incrementally: pages are pulled newest-first and the sync
+stops at the first page that contains no unseen records once the mirror holds
+as many rows as the API reports, so a refresh after the initial backfill costs
+one or two requests while an interrupted backfill is resumed. Queries (paging, text search,
+field filters) then run locally without touching the API, listing records in
+the `DASHBOARD_SYNC_SORTING` order taken from their payload, which re-syncs
+do not change.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from storage import api_client
+
+
+DATASETS = {
+    "profiles": "/api/app/profiles",
+    "posts": "/api/app/scraper/posts",
+    "post_history": "/api/app/post_history",
+}
+
+_default_path = Path(__file__).resolve().parent.parent / "storage" / "dashboard_mirror.sqlite3"
+MIRROR_PATH = Path(os.getenv("DASHBOARD_MIRROR_PATH", "").strip() or _default_path)
+SYNC_PAGE_SIZE = max(1, int(os.getenv("DASHBOARD_SYNC_PAGE_SIZE", "500") or "500"))
+SYNC_SORTING = os.getenv("DASHBOARD_SYNC_SORTING", "creationTime desc").strip()
+
+_ID_FIELDS = ("id", "externalPostId", "postId", "username")
+
+
+def _sort_expression(sorting: str) -> str:
+    field, _, direction = sorting.partition(" ")
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", field):
+        return "record_id"
+    order = "ASC" if direction.strip().lower() == "asc" else "DESC"
+    return f"json_extract(payload, '$.{field}') {order}, record_id"
+
+
+# Page order for queries; record_id breaks ties so pages never overlap.
+_ORDER_BY = _sort_expression(SYNC_SORTING)
+_ORDER_INDEX = "idx_records_" + "_".join(re.findall(r"\w+", _ORDER_BY.replace("json_extract(payload", "")))
+
+
+def connect(path: Optional[Path] = None) -> sqlite3.Connection:
+    db_path = Path(path or MIRROR_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS records (
+            dataset TEXT NOT NULL,
+            record_id TEXT NOT NULL,
+            search TEXT NOT NULL DEFAULT '',
+            payload TEXT NOT NULL,
+            synced_at REAL NOT NULL,
+            PRIMARY KEY (dataset, record_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            dataset TEXT PRIMARY KEY,
+            last_synced_at REAL,
+            remote_total INTEGER
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_records_synced ON records (dataset, synced_at)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_ORDER_INDEX} ON records (dataset, {_ORDER_BY})")
+    return conn
+
+
+def _record_id(item: Dict[str, Any]) -> str:
+    for field in _ID_FIELDS:
+        value = item.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return json.dumps(item, sort_keys=True, default=str)
+
+
+def _search_text(item: Dict[str, Any]) -> str:
+    return " ".join(str(v) for v in item.values() if isinstance(v, (str, int, float))).lower()
+
+
+def sync_dataset(dataset: str, full: bool = False, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    """Pull new records for `dataset` into the mirror.
+
+    With `full=False` the sync stops at the first page without unseen records,
+    unless the mirror still holds fewer rows than the API reports (an earlier
+    backfill was interrupted); then it keeps paging towards the older rows.
+    Returns a small summary dict for display.
+    """
+    path = DATASETS[dataset]
+    own_conn = conn is None
+    conn = conn or connect()
+    params = {"Sorting": SYNC_SORTING} if SYNC_SORTING else None
+    fetched = 0
+    inserted = 0
+    remote_total = None
+    skip = 0
+    try:
+        while True:
+            items, total = api_client.fetch_page_sync(path, skip, SYNC_PAGE_SIZE, params)
+            if total is not None:
+                remote_total = total
+            rows = [x for x in items if isinstance(x, dict)]
+            if not rows:
+                break
+
+            now = time.time()
+            page_new = 0
+            for item in rows:
+                record_id = _record_id(item)
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO records (dataset, record_id, search, payload, synced_at) VALUES (?, ?, ?, ?, ?)",
+                    (dataset, record_id, _search_text(item), json.dumps(item, default=str), now),
+                )
+                if cur.rowcount:
+                    page_new += 1
+                else:
+                    conn.execute(
+                        "UPDATE records SET search = ?, payload = ?, synced_at = ? WHERE dataset = ? AND record_id = ?",
+                        (_search_text(item), json.dumps(item, default=str), now, dataset, record_id),
+                    )
+            conn.commit()
+            fetched += len(rows)
+            inserted += page_new
+
+            skip += len(items)
+            if not full and page_new == 0:
+                local_rows = conn.execute("SELECT COUNT(*) FROM records WHERE dataset = ?", (dataset,)).fetchone()[0]
+                if remote_total is None or local_rows >= remote_total:
+                    break
+            if remote_total is not None and skip >= remote_total:
+                break
+
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state (dataset, last_synced_at, remote_total) VALUES (?, ?, ?)",
+            (dataset, time.time(), remote_total),
+        )
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+    return {"dataset": dataset, "fetched": fetched, "inserted": inserted, "remote_total": remote_total}
+
+
+def query(
+    dataset: str,
+    offset: int = 0,
+    limit: int = 100,
+    search: str = "",
+    filters: Optional[Dict[str, Any]] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Return one page of mirrored records and the total matching count."""
+    own_conn = conn is None
+    conn = conn or connect()
+    where = ["dataset = ?"]
+    args: List[Any] = [dataset]
+    if search:
+        where.append("search LIKE ?")
+        args.append(f"%{search.lower()}%")
+    for field, value in (filters or {}).items():
+        if value in (None, ""):
+            continue
+        where.append("json_extract(payload, ?) = ?")
+        args.extend([f"$.{field}", value])
+    clause = " AND ".join(where)
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM records WHERE {clause}", args).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT payload FROM records WHERE {clause} ORDER BY {_ORDER_BY} LIMIT ? OFFSET ?",
+            [*args, max(1, int(limit)), max(0, int(offset))],
+        ).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return [json.loads(r[0]) for r in rows], int(total)
+
+
+def sync_status(conn: Optional[sqlite3.Connection] = None) -> Dict[str, Dict[str, Any]]:
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        rows = conn.execute("SELECT dataset, last_synced_at, remote_total FROM sync_state").fetchall()
+        counts = dict(conn.execute("SELECT dataset, COUNT(*) FROM records GROUP BY dataset").fetchall())
+    finally:
+        if own_conn:
+            conn.close()
+    return {
+        dataset: {"last_synced_at": synced, "remote_total": total, "local_rows": counts.get(dataset, 0)}
+        for dataset, synced, total in rows
+    }
@@ -1,64 +1,24 @@
 import asyncio, json
 from core.runner import run_account
-from config.settings import MAX_WORKERS, ACTIVE_HOURS
-from storage import api_client
+from core import health as extraction_health
+from core import leases
+from config.settings import MAX_WORKERS, ACTIVE_HOURS, TARGET_QUEUE_SIZE, RUN_PROCESSES
+from core.accounts import rank_accounts
+from core.account_stats import STATS_KEY, apply_account_stats, load_account_stats, record_account_outcome
+from core.targets import _extract_username_from_url, _is_instagram_source, _normalize_username, TargetBuilder, TargetFeed
+from core.records import Target
+from core.shards import per_process_concurrency, run_sharded, shard_accounts
+from storage import api_client, serialization
+from analytics import metrics
+from core.background import create_logged_task
+from core.log import bound, get_logger, setup_logging
 from datetime import datetime
 import os
 from pathlib import Path
-from urllib.parse import urlparse
 from typing import Any
 
 
-def _normalize_username(raw: str) -> str:
-    value = (raw or "").strip()
-    if not value:
-        return ""
-    if value.startswith("@"):
-        value = value[1:]
-    return value.strip("/").lower()
-
-
-def _extract_username_from_url(source_url: str) -> str:
-    if not source_url:
-        return ""
-    try:
-        parsed = urlparse(source_url)
-        host = (parsed.netloc or "").lower()
-        if "instagram.com" not in host:
-            return ""
-        parts = [p for p in (parsed.path or "").split("/") if p]
-        if not parts:
-            return ""
-        if parts[0].lower() in {"p", "reel", "explore", "stories", "accounts"}:
-            return ""
-        return _normalize_username(parts[0])
-    except Exception:
-        return ""
-
-
-def _is_instagram_source(source: dict) -> bool:
-    """Check whether a source should be treated as Instagram.
-
-    Primary signal is platform id (Instagram=4). URL host is used as an
-    additional safety check when available.
-    """
-    url = (source.get("sourceUrl") or "").strip().lower()
-    platform_value = source.get("platform")
-
-    # Backend enum: Instagram = 4
-    is_platform_instagram = str(platform_value).strip() == "4"
-
-    # Some rows may have non-instagram URLs; only accept if URL is empty or instagram host.
-    if url:
-        try:
-            host = (urlparse(url).netloc or "").lower()
-        except Exception:
-            host = ""
-        is_instagram_host = "instagram.com" in host
-    else:
-        is_instagram_host = True
-
-    return is_platform_instagram and is_instagram_host
+logger = get_logger("main")
 
 
 def _resolve_env_placeholder(value: str) -> str:
@@ -84,16 +44,48 @@ def _resolve_account_secrets(accounts: list[dict]) -> list[dict]:
 
         if not mapped.get("username"):
             session = mapped.get("session", "unknown-session")
-            print(f"Skipping account config for {session}: missing username after env resolution.")
+            logger.warning("Skipping account config for %s: missing username after env resolution.", session)
             continue
 
         resolved.append(mapped)
     return resolved
 
 
-async def load_instagram_targets() -> list[dict]:
-    targets: list[dict] = []
-    seen: set[str] = set()
+async def _iter_source_pages(platform_ids: list[str], total_limit: int | None):
+    """Yield raw source pages: per configured platform id, else one unfiltered scan."""
+    yielded_any = False
+    for platform_id in platform_ids:
+        try:
+            platform = int(platform_id)
+        except Exception:
+            logger.warning("Skipping invalid INSTAGRAM_PLATFORM_IDS value: %s", platform_id)
+            continue
+        async for page in api_client.iter_sources(
+            platform=platform,
+            is_active=True,
+            max_result_count=200,
+            total_limit=total_limit,
+        ):
+            yielded_any = yielded_any or bool(page)
+            yield page
+
+    if not yielded_any:
+        async for page in api_client.iter_sources(
+            is_active=True,
+            max_result_count=200,
+            total_limit=total_limit,
+        ):
+            yield page
+
+
+async def stream_instagram_targets():
+    """Yield scrape targets while the source list is still being paged in.
+
+    Each `/api/app/source` page is deduplicated by source id, normalized with
+    `TargetBuilder` and filtered by SCRAPE_ONLY_TARGET / SCRAPE_TARGET_LIMIT
+    before its targets are yielded, so only one page of raw sources is held
+    at a time.
+    """
     seen_source_ids: set[str] = set()
     dedup_usernames = os.getenv("DEDUP_TARGET_USERNAMES", "0").strip().lower() in {"1", "true", "yes"}
 
@@ -104,27 +96,18 @@ async def load_instagram_targets() -> list[dict]:
         if platform_id not in platform_ids:
             platform_ids.append(platform_id)
 
+    scrape_only_target = _normalize_username(os.getenv("SCRAPE_ONLY_TARGET", ""))
+    target_limit = int(os.getenv("SCRAPE_TARGET_LIMIT", "0") or "0")
+
+    builder = TargetBuilder(dedup_usernames)
     raw_sources_count = 0
-    filtered_non_instagram = 0
-    missing_username = 0
-    duplicate_username = 0
+    emitted = 0
 
     try:
-        sources = []
-        for platform_id in platform_ids:
-            try:
-                platform = int(platform_id)
-            except Exception:
-                print(f"Skipping invalid INSTAGRAM_PLATFORM_IDS value: {platform_id}")
-                continue
-            platform_sources = await api_client.fetch_sources(
-                platform=platform,
-                is_active=True,
-                max_result_count=200,
-                total_limit=source_scan_limit if source_scan_limit > 0 else None,
-            )
-            raw_sources_count += len(platform_sources)
-            for source in platform_sources:
+        async for page in _iter_source_pages(platform_ids, source_scan_limit if source_scan_limit > 0 else None):
+            raw_sources_count += len(page)
+            sources = []
+            for source in page:
                 if not isinstance(source, dict):
                     continue
                 source_id = str(source.get("id", "")).strip()
@@ -134,104 +117,93 @@ async def load_instagram_targets() -> list[dict]:
                     seen_source_ids.add(source_id)
                 sources.append(source)
 
-        if not sources:
-            sources = await api_client.fetch_sources(
-                is_active=True,
-                max_result_count=200,
-                total_limit=source_scan_limit if source_scan_limit > 0 else None,
-            )
-            raw_sources_count = len(sources)
+            for target in builder.feed(sources):
+                if scrape_only_target and _normalize_username(target.username) != scrape_only_target:
+                    continue
+                emitted += 1
+                yield target
+                if target_limit > 0 and emitted >= target_limit:
+                    logger.info("Applied SCRAPE_TARGET_LIMIT=%s", target_limit)
+                    return
     except Exception as e:
-        print(f"Failed to fetch source accounts from API: {e}")
-        return []
-
-    for source in sources:
-        if not isinstance(source, dict):
-            continue
-        if not _is_instagram_source(source):
-            filtered_non_instagram += 1
-            continue
-
-        username = _extract_username_from_url(source.get("sourceUrl", ""))
-        if not username:
-            username = _normalize_username(source.get("sourceHandle", ""))
-        if not username:
-            missing_username += 1
-            continue
-        if dedup_usernames and username in seen:
-            duplicate_username += 1
-            continue
-
-        seen.add(username)
-        targets.append({
-            "username": username,
-            "source_id": source.get("id", ""),
-            "source_url": source.get("sourceUrl", ""),
-        })
+        logger.warning("Failed to fetch source accounts from API: %s", e)
+    finally:
+        logger.info(
+            "Target load summary: raw=%s after_source_id_dedupe=%s non_instagram_filtered=%s missing_username=%s "
+            "duplicate_username_skipped=%s dedup_usernames=%s final_targets=%s",
+            raw_sources_count,
+            builder.sources,
+            builder.filtered_non_instagram,
+            builder.missing_username,
+            builder.duplicate_username,
+            "on" if dedup_usernames else "off",
+            emitted,
+            extra={"event": "target_load_summary"},
+        )
+        if scrape_only_target:
+            if emitted:
+                logger.info("Applied SCRAPE_ONLY_TARGET=%s", scrape_only_target)
+            else:
+                logger.info("No matching Instagram source found for SCRAPE_ONLY_TARGET=%s", scrape_only_target)
 
-    print(
-        "Target load summary:",
-        f"raw={raw_sources_count}",
-        f"after_source_id_dedupe={len(sources)}",
-        f"non_instagram_filtered={filtered_non_instagram}",
-        f"missing_username={missing_username}",
-        f"duplicate_username_skipped={duplicate_username}",
-        f"dedup_usernames={'on' if dedup_usernames else 'off'}",
-        f"final_targets={len(targets)}",
-    )
 
-    return targets
+async def load_instagram_targets() -> list[Target]:
+    return [target async for target in stream_instagram_targets()]
 
 
 def _load_run_state(path: Path) -> dict[str, Any]:
-    if not path.exists():
-        return {}
-    try:
-        with path.open("r", encoding="utf-8") as f:
-            payload = json.load(f)
-        if isinstance(payload, dict):
-            return payload
-    except Exception:
-        pass
-    return {}
+    payload = serialization.read_state(path)
+    return payload if isinstance(payload, dict) else {}
 
 
 def _save_run_state(path: Path, state: dict[str, Any]) -> None:
     try:
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
+        serialization.write_state(path, state)
     except PermissionError as exc:
-        print(f"Warning: could not save run state to {path} (permission denied: {exc}). "
-              "Set STATE_PATH env var to a writable location.")
+        logger.warning("Could not save run state to %s (permission denied: %s). Set STATE_PATH env var to a writable location.", path, exc)
     except OSError as exc:
-        print(f"Warning: could not save run state to {path}: {exc}")
+        logger.warning("Could not save run state to %s: %s", path, exc)
+
 
+def _select_rotated_account(eligible_accounts: list[dict], state_path: Path) -> list[dict]:
+    """Return eligible accounts in reputation-ranked rotation order.
 
-def _select_rotated_account(eligible_accounts: list[dict], state_path: Path):
+    The first entry is the account selected for this run; the rest form the
+    failover order. Recorded account stats are merged in before ranking.
+    """
     if not eligible_accounts:
-        return None
+        return []
 
     state = _load_run_state(state_path)
     rotation = state.get("account_rotation") if isinstance(state, dict) else {}
     if not isinstance(rotation, dict):
         rotation = {}
 
+    stats = load_account_stats(state)
+    ranked_pool = apply_account_stats(eligible_accounts, stats)
+
     cursor = int(rotation.get("cursor", 0) or 0)
-    normalized = max(0, cursor) % len(eligible_accounts)
-    selected = eligible_accounts[normalized]
+    ordered = rank_accounts(ranked_pool, rotation_offset=cursor)
+    if not ordered:
+        return []
+    selected = ordered[0]
 
-    rotation["cursor"] = (normalized + 1) % len(eligible_accounts)
+    rotation["cursor"] = max(0, cursor) + 1
     rotation["last_account"] = selected.get("username", "")
     state["account_rotation"] = rotation
     _save_run_state(state_path, state)
-    return selected
+    return ordered
 
 
-def _build_rotated_failover_order(accounts: list[dict], selected: dict) -> list[dict]:
-    selected_username = (selected or {}).get("username", "")
-    remaining = [a for a in accounts if a.get("username", "") != selected_username]
-    return [selected, *remaining]
+def _record_account_result(state_path: Path, account: dict, result: Any) -> None:
+    username = account.get("username", "")
+    state = _load_run_state(state_path)
+    stats = load_account_stats(state)
+    entry = record_account_outcome(stats, username, result, account.get("_run_stats"))
+    if entry is None:
+        return
+    state[STATS_KEY] = stats
+    _save_run_state(state_path, state)
 
 def in_active_window():
     h = datetime.now().hour
@@ -242,7 +214,7 @@ async def main():
     strict_serial_accounts = os.getenv("STRICT_SERIAL_ACCOUNTS", "0").strip().lower() in {"1", "true", "yes"}
     rotate_single_account_per_run = os.getenv("ROTATE_SINGLE_ACCOUNT_PER_RUN", "1").strip().lower() in {"1", "true", "yes"}
     if not in_active_window() and not force_run:
-        print(f"Outside ACTIVE_HOURS={ACTIVE_HOURS}. Set FORCE_RUN=1 to run manually now.")
+        logger.info("Outside ACTIVE_HOURS=%s. Set FORCE_RUN=1 to run manually now.", ACTIVE_HOURS)
         return
 
     project_root = Path(__file__).resolve().parent
@@ -254,89 +226,145 @@ async def main():
     accounts = _resolve_account_secrets(accounts)
 
     if not accounts:
-        print(f"No accounts found in {accounts_path}")
+        logger.info("No accounts found in %s", accounts_path)
         return
 
     eligible_accounts = list(accounts)
 
     if not eligible_accounts:
-        print("No eligible accounts to run.")
+        logger.info("No eligible accounts to run.")
         return
 
     _state_path_env = os.getenv("STATE_PATH", "").strip()
     state_path = Path(_state_path_env) if _state_path_env else project_root / "storage" / "state.json"
     if rotate_single_account_per_run:
-        selected = _select_rotated_account(eligible_accounts, state_path)
-        if not selected:
-            print("No eligible account selected for this run.")
-            return
-        print(f"Rotating accounts per run: selected {selected.get('username', 'unknown')}")
-        eligible_accounts = _build_rotated_failover_order(eligible_accounts, selected)
-
-    targets = await load_instagram_targets()
-    if not targets:
-        print("No active Instagram sources found from API. Nothing to scrape.")
-        return
-
-    scrape_only_target = _normalize_username(os.getenv("SCRAPE_ONLY_TARGET", ""))
-    if scrape_only_target:
-        targets = [t for t in targets if _normalize_username(t.get("username", "")) == scrape_only_target]
-        if not targets:
-            print(f"No matching Instagram source found for SCRAPE_ONLY_TARGET={scrape_only_target}")
+        ordered = _select_rotated_account(eligible_accounts, state_path)
+        if not ordered:
+            logger.info("No eligible account selected for this run.")
             return
-        print(f"Applied SCRAPE_ONLY_TARGET={scrape_only_target}")
-
-    target_limit = int(os.getenv("SCRAPE_TARGET_LIMIT", "0") or "0")
-    if target_limit > 0:
-        targets = targets[:target_limit]
-        print(f"Applied SCRAPE_TARGET_LIMIT={target_limit}")
-
-    print(f"Loaded {len(targets)} Instagram targets from API source list.")
+        logger.info("Rotating accounts per run: selected %s", ordered[0].get('username', 'unknown'))
+        eligible_accounts = ordered
 
+    metrics.start_http_server()
+    # Posts left in the disk spool by an earlier run (or an outage during this
+    # one) are replayed in the background while scraping goes on.
+    spool_replay = create_logged_task(api_client.run_spool_replay(), "post spool replay")
     semaphore = asyncio.Semaphore(max(1, MAX_WORKERS))
 
     async def run_limited(acc, batch):
         async with semaphore:
             try:
-                return await run_account(acc, batch)
+                with bound(account=acc.get("username", "")):
+                    result = await run_account(acc, batch)
             except Exception as e:
                 username = acc.get("username", "unknown")
-                print(f"Account run failed for {username}: {e}")
-                return e
+                logger.warning("Account run failed for %s: %s", username, e)
+                result = e
+            _record_account_result(state_path, acc, result)
+            return result
+
+    # Targets are streamed into per-account queues while later source pages
+    # are still loading. Queues are only bounded when every consumer runs at
+    # once; an account still waiting for its turn (strict serial, or more
+    # accounts than MAX_WORKERS) would otherwise fill up and stall the producer.
+    consumers = 1 if rotate_single_account_per_run else len(eligible_accounts)
+    # Rotation and strict serial runs have one account at a time; nothing to spread out.
+    use_processes = RUN_PROCESSES > 1 and consumers > 1 and not strict_serial_accounts
+    if use_processes:
+        per_process = per_process_concurrency(MAX_WORKERS, RUN_PROCESSES)
+        all_concurrent = all(len(shard) <= per_process for shard in shard_accounts(consumers, RUN_PROCESSES))
+    else:
+        all_concurrent = consumers == 1 or (not strict_serial_accounts and consumers <= MAX_WORKERS)
+    queue_size = TARGET_QUEUE_SIZE if all_concurrent else 0
+    # A rotation failover replays what the failed account pulled from the stream.
+    feed = TargetFeed(consumers, maxsize=queue_size, replayable=rotate_single_account_per_run)
+    # With LEASE_STORE set, targets other nodes abandoned are appended once the source list ends.
+    producer = asyncio.create_task(feed.run(leases.with_stragglers(stream_instagram_targets())))
 
-    if rotate_single_account_per_run:
-        for idx, acc in enumerate(eligible_accounts):
-            if idx > 0:
-                print(f"Failing over to next account: {acc.get('username', 'unknown')}")
-            result = await run_limited(acc, targets)
-            if isinstance(result, Exception):
-                continue
-            if result == "ok":
+    try:
+        if rotate_single_account_per_run:
+            if not await feed.ready(0):
+                logger.info("No active Instagram sources found from API. Nothing to scrape.")
                 return
-        print("All rotated accounts failed in this run.")
-        return
-
-    batches = [targets[i::len(eligible_accounts)] for i in range(len(eligible_accounts))]
-    account_batches = [(acc, batch) for acc, batch in zip(eligible_accounts, batches) if batch]
+            for idx, acc in enumerate(eligible_accounts):
+                if idx > 0:
+                    if not feed.handed_out(0) and not await feed.ready(0):
+                        logger.info("No streamed targets left for failover; stopping.")
+                        return
+                    logger.info("Failing over to next account: %s", acc.get('username', 'unknown'))
+                result = await run_limited(acc, feed.targets(0, replay=idx > 0))
+                if extraction_health.RUN_HEALTH.tripped:
+                    # A layout break hits every account alike; failing over only burns more sessions.
+                    logger.error("Extraction breaker open (%s); not failing over.", extraction_health.RUN_HEALTH.trip_reason)
+                    return
+                if isinstance(result, Exception):
+                    continue
+                if result == "ok":
+                    return
+            logger.warning("All rotated accounts failed in this run.")
+            return
 
-    if not account_batches:
-        print("No non-empty account batches to run.")
-        return
+        async def run_slot(idx, acc):
+            # Accounts whose share of the stream stays empty are not started.
+            if not await feed.ready(idx):
+                return None
+            try:
+                return await run_limited(acc, feed.targets(idx))
+            finally:
+                feed.close(idx)
+
+        if use_processes:
+            logger.info("RUN_PROCESSES=%s: sharding %s accounts across worker processes", RUN_PROCESSES, consumers)
+            results = await run_sharded(
+                eligible_accounts,
+                feed,
+                RUN_PROCESSES,
+                per_process,
+                queue_size,
+                lambda acc, result: _record_account_result(state_path, acc, result),
+            )
+        elif strict_serial_accounts:
+            logger.info("STRICT_SERIAL_ACCOUNTS enabled: running account batches one-by-one")
+            results = []
+            for idx, acc in enumerate(eligible_accounts):
+                results.append(await run_slot(idx, acc))
+        else:
+            results = await asyncio.gather(
+                *[run_slot(idx, acc) for idx, acc in enumerate(eligible_accounts)],
+                return_exceptions=False,
+            )
 
-    if strict_serial_accounts:
-        print("STRICT_SERIAL_ACCOUNTS enabled: running account batches one-by-one")
-        results = []
-        for acc, batch in account_batches:
-            results.append(await run_limited(acc, batch))
-    else:
-        results = await asyncio.gather(
-            *[run_limited(acc, batch) for acc, batch in account_batches],
-            return_exceptions=False,
-        )
+        results = [r for r in results if r is not None]
+        if not results:
+            logger.info("No active Instagram sources found from API. Nothing to scrape.")
+            return
 
-    failed = [r for r in results if isinstance(r, Exception)]
-    if failed:
-        print(f"Completed with {len(failed)} account-level failure(s).")
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning("Completed with %s account-level failure(s).", len(failed))
+    finally:
+        # Accounts are done; stop paging sources nobody will scrape.
+        for idx in range(consumers):
+            feed.close(idx)
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        logger.info("Streamed %s Instagram targets from API source list.", feed.produced)
+        await leases.report()
+        await leases.close()
+        spool_replay.cancel()
+        try:
+            await spool_replay
+        except asyncio.CancelledError:
+            pass
+        if await api_client.drain_spool():
+            logger.info("Flushed spooled post writes before exit.")
+        api_client.close_spool()
+        await api_client.close()
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,218 @@
+"""Offline end-to-end benchmark against the fake Instagram site and fake Lens API.
+
+Examples:
+  python scripts/bench_e2e.py --targets 5 --posts-per-profile 12
+  python scripts/bench_e2e.py --mode api --posts 2000 --api-latency 0.02 --api-error-rate 0.05
+  python scripts/bench_e2e.py --mode api --posts 2000 --compression gzip --compress-responses
+  python scripts/bench_e2e.py --mode api --posts 500 --api-latency 0.01 --api-outage-after 1 --api-outage-seconds 5
+  python scripts/bench_e2e.py --mode e2e --json > bench.json
+
+`e2e` drives `run_account` through a real Chromium whose instagram.com traffic
+is fulfilled by `sim.fake_instagram`; `api` only exercises `APIClient` writes
+and needs no browser.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sim.fake_api import FakeAPIConfig, FakeLensAPI, make_sources
+from sim.fake_instagram import FakeInstagram, FakeInstagramConfig
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("e2e", "api"), default="e2e")
+    parser.add_argument("--targets", type=int, default=3, help="synthetic source profiles")
+    parser.add_argument("--posts-per-profile", type=int, default=12)
+    parser.add_argument("--comments-per-post", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=500, help="posts to write in api mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent writers in api mode")
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument("--api-jitter", type=float, default=0.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--api-retry-after", type=float, default=None)
+    parser.add_argument("--token-ttl", type=int, default=3600, help="fake API access token lifetime (s)")
+    parser.add_argument("--api-outage-after", type=float, default=0.0, help="seconds into api mode before the outage")
+    parser.add_argument("--api-outage-seconds", type=float, default=0.0, help="post writes answer 503 for this long")
+    parser.add_argument("--no-post-spool", action="store_true", help="disable the on-disk post spool (POST_SPOOL=0)")
+    parser.add_argument("--compression", default="off", help="API_COMPRESSION for writes (off|gzip|zstd|auto)")
+    parser.add_argument("--compress-responses", action="store_true", help="fake API gzips its JSON responses")
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--pause", type=float, default=0.0, help="humanized pause range upper bound (s)")
+    parser.add_argument("--json", action="store_true", help="print a JSON summary only")
+    return parser.parse_args()
+
+
+def _sample_post(idx: int, comments: int, source_id: str) -> dict:
+    return {
+        "sourceId": source_id,
+        "externalPostId": f"/p/bench{idx:07d}",
+        "postDate": "2024-01-01T00:00:00+00:00",
+        "postUrl": f"https://www.instagram.com/p/bench{idx:07d}",
+        "content": f"Benchmark caption {idx} " + "lorem ipsum " * 20,
+        "keywords": "",
+        "keywordMatchedCount": 0,
+        "isSummarized": False,
+        "sentimentScore": 1000,
+        "commentCount": comments,
+        "comments": [{"author": f"fan{n}", "text": f"comment {n} on {idx}"} for n in range(comments)],
+    }
+
+
+async def _outage(args, fake_api) -> None:
+    await asyncio.sleep(args.api_outage_after)
+    fake_api.config.forced_status["/api/app/scraper/posts"] = 503
+    await asyncio.sleep(args.api_outage_seconds)
+    fake_api.config.forced_status.pop("/api/app/scraper/posts", None)
+
+
+async def _bench_api(args, api_client, fake_api) -> dict:
+    from analytics import metrics
+
+    outage = asyncio.create_task(_outage(args, fake_api)) if args.api_outage_seconds > 0 else None
+    queue: asyncio.Queue = asyncio.Queue()
+    for idx in range(args.posts):
+        queue.put_nowait(idx)
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            idx = queue.get_nowait()
+            result = await api_client.write_posts([_sample_post(idx, args.comments_per_post, "bench")])
+            if result is None:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(max(1, args.concurrency))])
+    if outage is not None:
+        await outage
+    # Give the circuit breaker a chance to close and replay what was spooled.
+    deadline = time.perf_counter() + api_client.client._breaker.reset_timeout + 30
+    while api_client.client.spool_depth and time.perf_counter() < deadline:
+        await asyncio.sleep(0.5)
+        await api_client.client.drain_spool()
+    elapsed = time.perf_counter() - started
+
+    spool: dict = {}
+    for sample in metrics.API_SPOOLED.samples():
+        outcome = sample["labels"]["outcome"]
+        spool[outcome] = spool.get(outcome, 0) + int(sample["value"])
+    token_refresh: dict = {}
+    for sample in metrics.API_TOKEN_REFRESH.samples():
+        key = f'{sample["labels"]["grant"]}/{sample["labels"]["reason"]}/{sample["labels"]["outcome"]}'
+        token_refresh[key] = {"count": int(sample["count"]), "avg_ms": 1000 * sample["sum"] / max(1, sample["count"])}
+    fsyncs = sum(int(sample["count"]) for sample in metrics.POST_SPOOL_FSYNC.samples())
+    retries: dict = {}
+    for sample in metrics.API_RETRIES.samples():
+        reason = sample["labels"]["reason"]
+        retries[reason] = retries.get(reason, 0) + int(sample["value"])
+    return {
+        "posts_attempted": args.posts,
+        "write_failures": failures,
+        "elapsed_s": elapsed,
+        "spool": {**spool, "pending": api_client.client.spool_depth, "fsyncs": fsyncs},
+        "retries": retries,
+        "token_refresh": token_refresh,
+    }
+
+
+async def _bench_e2e(args, usernames, site) -> dict:
+    from core.browser import register_context_hook
+    from core.runner import run_account
+    import main as scraper_main
+
+    register_context_hook(site.install)
+    targets = await scraper_main.load_instagram_targets()
+    account = {"username": "sim_account", "session": tempfile.mkdtemp(prefix="ig_sim_session_")}
+    started = time.perf_counter()
+    outcome = await run_account(account, targets)
+    elapsed = time.perf_counter() - started
+    return {
+        "outcome": outcome,
+        "targets": len(targets),
+        "run_stats": account.get("_run_stats", {}),
+        "elapsed_s": elapsed,
+    }
+
+
+async def _run(args) -> dict:
+    usernames = [f"simuser{idx:04d}" for idx in range(args.targets)]
+    fake_api = FakeLensAPI(
+        make_sources(usernames),
+        FakeAPIConfig(
+            latency_seconds=args.api_latency,
+            latency_jitter_seconds=args.api_jitter,
+            error_rate=args.api_error_rate,
+            retry_after_seconds=args.api_retry_after,
+            compress_responses=args.compress_responses,
+            token_ttl_seconds=args.token_ttl,
+            seed=1,
+        ),
+    ).start()
+    os.environ.update({
+        "API_BASE": fake_api.url,
+        "API_USER": fake_api.config.username,
+        "API_PASS": fake_api.config.password,
+        "STATE_PATH": os.path.join(tempfile.mkdtemp(prefix="ig_sim_state_"), "state.json"),
+        "SCRAPE_LOOKBACK_HOURS": str(max(1, args.posts_per_profile)),
+        "HEADLESS": "1",
+        "COOKIE_ONLY_AUTH": "1",
+        "MANUAL_LOGIN_SEED_ON_COOKIE_MISS": "0",
+        "PAUSE_MIN_DELAY": "0",
+        "PAUSE_MAX_DELAY": str(args.pause),
+        "API_COMPRESSION": args.compression,
+        "POST_SPOOL": "0" if args.no_post_spool else "1",
+        "POST_SPOOL_DIR": tempfile.mkdtemp(prefix="ig_sim_spool_"),
+    })
+
+    # Imported after the environment points at the fake API.
+    from storage import api_client
+
+    try:
+        if args.mode == "api":
+            result = await _bench_api(args, api_client, fake_api)
+        else:
+            site = FakeInstagram(
+                usernames,
+                FakeInstagramConfig(
+                    posts_per_profile=args.posts_per_profile,
+                    comments_per_post=args.comments_per_post,
+                    latency_seconds=args.page_latency,
+                ),
+            )
+            result = await _bench_e2e(args, usernames, site)
+    finally:
+        fake_api.stop()
+
+    stats = fake_api.stats()
+    elapsed = result.get("elapsed_s") or 0.0
+    result.update({
+        "mode": args.mode,
+        "posts_stored": stats["posts_stored"],
+        "posts_per_second": (stats["posts_stored"] / elapsed) if elapsed else None,
+        "api": stats,
+        "transfer": api_client.transfer_stats(),
+    })
+    return result
+
+
+def main() -> None:
+    args = _parse_args()
+    summary = asyncio.run(_run(args))
+    if args.json:
+        print(json.dumps(summary, default=str))
+        return
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Micro-benchmarks for the pure-Python extraction and normalization hot paths.
+
+Examples:
+  python scripts/bench_micro.py --sizes 10000,100000
+  python scripts/bench_micro.py --sizes 10000,100000,1000000 --save bench_baseline.json
+  python scripts/bench_micro.py --compare bench_baseline.json --threshold 1.25
+
+Each case runs over synthetic inputs of every requested size and records the
+best-of-N time per item. `--save` writes the results as a JSON baseline;
+`--compare` checks the current run against one and exits non-zero when any
+case is slower than `threshold` times its baseline.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import main as scraper_main
+from core import posts, targets
+from core.confidence import score
+from core.records import Comment, PostRecord, Target
+from storage import api_client, serialization
+
+
+def make_sources(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Synthetic source rows shaped like `/api/app/source` items (mixed quality)."""
+    rng = random.Random(seed)
+    rows = []
+    for idx in range(n):
+        kind = rng.random()
+        handle = f"user_{idx % max(1, n // 3)}"
+        if kind < 0.80:
+            url = f"https://www.instagram.com/{handle}/"
+        elif kind < 0.85:
+            url = f"https://www.instagram.com/p/C{idx:08d}/"
+        elif kind < 0.92:
+            url = f"https://twitter.com/{handle}"
+        else:
+            url = ""
+        rows.append({
+            "id": f"src-{idx}",
+            "sourceUrl": url,
+            "sourceHandle": f"@{handle}",
+            "platform": 4 if kind < 0.95 else 1,
+        })
+    return rows
+
+
+def make_post_ids(n: int) -> List[str]:
+    shapes = ("/p/C{0:08d}/", "p/C{0:08d}", "https://www.instagram.com/p/C{0:08d}/?img_index=1", "  /reel/C{0:08d}  ")
+    return [shapes[idx % len(shapes)].format(idx) for idx in range(n)]
+
+
+def make_timestamps(n: int) -> List[str]:
+    shapes = ("2024-05-0{d}T12:34:56.000Z", "2024-05-0{d}T12:34:56+02:00", "2024-05-0{d}T12:34:56", "", "garbage")
+    return [shapes[idx % len(shapes)].format(d=1 + idx % 9) for idx in range(n)]
+
+
+def make_post_payloads(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "post_id": f"/p/C{idx:08d}",
+            "caption": "" if idx % 7 == 0 else f"Caption {idx} " + "word " * 30,
+            "likes": idx % 5000 if idx % 11 else None,
+            "comments": idx % 40,
+            "published_at": "2024-05-01T12:34:56.000Z",
+        }
+        for idx in range(n)
+    ]
+
+
+def make_api_posts(n: int, comments: int = 20) -> List[Dict[str, Any]]:
+    """Post payloads in the camelCase dict shape `write_posts` used to receive."""
+    return [
+        {
+            "sourceId": f"src-{idx % 500}",
+            "externalPostId": f"/p/C{idx:08d}",
+            "postDate": "2024-05-01T12:34:56+00:00",
+            "postUrl": f"https://www.instagram.com/p/C{idx:08d}",
+            "content": f"Caption {idx} " + "word " * 30,
+            "keywords": "",
+            "keywordMatchedCount": 0,
+            "isSummarized": False,
+            "sentimentScore": 850,
+            "commentCount": comments,
+            "comments": [{"author": f"fan{c}", "text": f"comment {c} on {idx}"} for c in range(comments)],
+        }
+        for idx in range(n)
+    ]
+
+
+def make_post_records(n: int, comments: int = 20) -> List[PostRecord]:
+    return [
+        PostRecord(
+            source_id=p["sourceId"],
+            external_post_id=p["externalPostId"],
+            post_date=p["postDate"],
+            post_url=p["postUrl"],
+            content=p["content"],
+            sentiment_score=p["sentimentScore"],
+            comments=[Comment(c["author"], c["text"]) for c in p["comments"]],
+        )
+        for p in make_api_posts(n, comments)
+    ]
+
+
+def make_post_batches(n: int, batch: int = 50) -> List[List[Dict[str, Any]]]:
+    """`n` posts with comments, grouped the way a bulk `write_posts` PUT would send them."""
+    posts_ = make_api_posts(n)
+    return [posts_[i:i + batch] for i in range(0, len(posts_), batch)]
+
+
+def _httpx_json(batch: Any) -> bytes:
+    # What httpx does for `json=`: stdlib json, compact, then UTF-8 encode.
+    return json.dumps(batch, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def make_target_dicts(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"username": f"user_{idx}", "source_id": f"src-{idx}", "source_url": f"https://www.instagram.com/user_{idx}/"}
+        for idx in range(n)
+    ]
+
+
+def make_target_records(n: int) -> List[Target]:
+    return [Target(f"user_{idx}", f"src-{idx}", f"https://www.instagram.com/user_{idx}/") for idx in range(n)]
+
+
+def _build_targets(sources: List[Dict[str, Any]]) -> int:
+    async def _iter_sources(**kwargs):
+        # Same page size the loader requests from /api/app/source.
+        for start in range(0, len(sources), 200):
+            yield sources[start:start + 200]
+
+    original = scraper_main.api_client.iter_sources
+    scraper_main.api_client.iter_sources = _iter_sources
+    try:
+        return len(asyncio.run(scraper_main.load_instagram_targets()))
+    finally:
+        scraper_main.api_client.iter_sources = original
+
+
+CASES: Dict[str, Dict[str, Any]] = {
+    "posts._normalize_external_post_id": {
+        "make": make_post_ids,
+        "run": lambda data: [posts._normalize_external_post_id(v) for v in data],
+    },
+    "api_client._normalize_external_post_id": {
+        "make": make_post_ids,
+        "run": lambda data: [api_client.APIClient._normalize_external_post_id(v) for v in data],
+    },
+    "posts._parse_iso_utc": {
+        "make": make_timestamps,
+        "run": lambda data: [posts._parse_iso_utc(v) for v in data],
+    },
+    "main._extract_username_from_url": {
+        "make": lambda n: [s["sourceUrl"] for s in make_sources(n)],
+        "run": lambda data: [scraper_main._extract_username_from_url(v) for v in data],
+    },
+    "main._is_instagram_source": {
+        "make": make_sources,
+        "run": lambda data: [scraper_main._is_instagram_source(v) for v in data],
+    },
+    "confidence.score": {
+        "make": make_post_payloads,
+        "run": lambda data: [score(v) for v in data],
+    },
+    "targets.build_targets_scalar": {
+        "make": make_sources,
+        "run": lambda data: targets.build_targets_scalar(data, True),
+    },
+    "targets.build_targets_bulk": {
+        "make": make_sources,
+        "run": lambda data: targets.build_targets_bulk(data, True),
+    },
+    "main.load_instagram_targets": {
+        "make": make_sources,
+        "run": _build_targets,
+    },
+    "records.json_dict_posts": {
+        "make": make_api_posts,
+        "run": lambda data: [json.dumps(v) for v in data],
+    },
+    "records.json_PostRecord.to_api": {
+        "make": make_post_records,
+        "run": lambda data: [json.dumps(v.to_api()) for v in data],
+    },
+    "records.json_dataclasses.asdict": {
+        "make": make_post_records,
+        "run": lambda data: [json.dumps(dataclasses.asdict(v)) for v in data],
+    },
+    "serialization.httpx_json_batches": {
+        "make": make_post_batches,
+        "run": lambda data: [_httpx_json(b) for b in data],
+    },
+    f"serialization.dumps_batches[{serialization.BACKEND}]": {
+        "make": make_post_batches,
+        "run": lambda data: [serialization.dumps(b) for b in data],
+    },
+}
+
+# Retained heap per item, measured with tracemalloc while the objects are alive.
+MEMORY_CASES: Dict[str, Callable[[int], Any]] = {
+    "targets.dict": make_target_dicts,
+    "targets.Target": make_target_records,
+    "posts.dict": lambda n: make_api_posts(n),
+    "posts.PostRecord": lambda n: make_post_records(n),
+}
+
+
+def run_case(run: Callable[[Any], Any], data: Any, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(data)
+        timings.append(time.perf_counter() - started)
+    n = max(1, len(data))
+    return {
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "ns_per_item": min(timings) / n * 1e9,
+    }
+
+
+def measure_memory(make: Callable[[int], Any], size: int) -> Dict[str, float]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        data = make(size)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del data
+    return {"bytes": current, "bytes_per_item": current / max(1, size)}
+
+
+def run_all(sizes: List[int], repeat: int, only: List[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    memory: Dict[str, Any] = {}
+    for name, make in MEMORY_CASES.items():
+        if only and not any(token in name for token in only):
+            continue
+        for size in sizes:
+            memory[f"{name}[{size}]"] = measure_memory(make, size)
+    for name, case in CASES.items():
+        if only and not any(token in name for token in only):
+            continue
+        for size in sizes:
+            data = case["make"](size)
+            # Large inputs get fewer repeats so the 1M runs stay tolerable.
+            reps = max(1, repeat if size <= 100_000 else repeat // 3)
+            results[f"{name}[{size}]"] = run_case(case["run"], data, reps)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions = []
+    base_results = baseline.get("results", {})
+    for key, row in current["results"].items():
+        base = base_results.get(key)
+        if not base:
+            continue
+        ratio = row["ns_per_item"] / max(base["ns_per_item"], 1e-9)
+        status = "REGRESSION" if ratio > threshold else "ok"
+        print(f"{key:<55} {base['ns_per_item']:>10.1f} -> {row['ns_per_item']:>10.1f} ns/item  x{ratio:.2f}  {status}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated input sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default="", help="comma-separated substrings of case names")
+    parser.add_argument("--save", default="", help="write results to this JSON baseline")
+    parser.add_argument("--compare", default="", help="compare against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed slowdown ratio")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    only = [x.strip() for x in args.only.split(",") if x.strip()]
+    current = run_all(sizes, max(1, args.repeat), only)
+
+    if not args.compare:
+        for key, row in current["results"].items():
+            print(f"{key:<55} {row['ns_per_item']:>10.1f} ns/item  (best {row['best_s'] * 1000:.1f} ms)")
+        for key, row in current["memory"].items():
+            print(f"{key:<55} {row['bytes_per_item']:>10.1f} bytes/item  ({row['bytes'] / 1e6:.1f} MB)")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than x{args.threshold}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
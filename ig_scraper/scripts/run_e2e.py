@@ -5,6 +5,7 @@ import json
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+from core.log import setup_logging
 from core.runner import run_account
 
 async def main():
@@ -19,4 +20,5 @@ async def main():
     await run_account(acc, usernames)
 
 if __name__ == '__main__':
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1 @@
+"""Offline simulation harness (fake Instagram site and fake Lens API)."""
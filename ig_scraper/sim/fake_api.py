@@ -0,0 +1,316 @@
+"""Fake Lens API for offline runs and benchmarks.
+
+Implements the endpoints `storage.api_client` talks to (`/connect/token`,
+`/api/app/source`, `/api/app/scraper/posts`, profiles, baselines,
+post history and cooldowns) on a local `ThreadingHTTPServer`, with
+configurable latency and error injection. Everything is kept in memory so a
+benchmark or regression script can assert on what was written.
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class FakeAPIConfig:
+    username: str = "sim"
+    password: str = "sim"
+    token_ttl_seconds: int = 3600
+    # Added to every request: base + uniform(0, jitter) seconds.
+    latency_seconds: float = 0.0
+    latency_jitter_seconds: float = 0.0
+    # Probability that a non-token request fails with one of `error_statuses`.
+    error_rate: float = 0.0
+    error_statuses: Tuple[int, ...] = (500, 502, 503)
+    # Sent with injected 429/503 responses when set.
+    retry_after_seconds: Optional[float] = None
+    # Probability that an authenticated request is answered with 401.
+    unauthorized_rate: float = 0.0
+    # Path -> status forced for every request to that path.
+    forced_status: Dict[str, int] = field(default_factory=dict)
+    # Request Content-Encodings the server decodes; anything else gets a 415.
+    accept_encodings: Tuple[str, ...] = ("gzip",)
+    # Gzip JSON responses for clients that send `Accept-Encoding: gzip`.
+    compress_responses: bool = False
+    seed: Optional[int] = None
+
+
+def make_sources(usernames: List[str], platform: int = 4) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, u)),
+            "sourceUrl": f"https://www.instagram.com/{u}/",
+            "sourceHandle": u,
+            "platform": platform,
+            "isActive": True,
+        }
+        for u in usernames
+    ]
+
+
+class FakeLensAPI:
+    def __init__(self, sources: Optional[List[Dict[str, Any]]] = None, config: Optional[FakeAPIConfig] = None):
+        self.config = config or FakeAPIConfig()
+        self.sources: List[Dict[str, Any]] = list(sources or [])
+        self.posts: Dict[str, Dict[str, Any]] = {}
+        self.profiles: List[Dict[str, Any]] = []
+        self.baselines: List[Dict[str, Any]] = []
+        self.post_history: List[Dict[str, Any]] = []
+        self.cooldowns: Dict[str, Dict[str, Any]] = {}
+        self.tokens: Dict[str, float] = {}
+        self.grants: Dict[str, int] = {}
+        self.request_log: List[Tuple[str, str, int, float]] = []
+        self.bytes_in = {"wire": 0, "decoded": 0}
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None, "server not started"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> "FakeLensAPI":
+        api = self
+
+        class Handler(_Handler):
+            fake = api
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-lens-api", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -- stats -----------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            for method, path, status, _ in self.request_log:
+                key = f"{method} {path} {status}"
+                by_status[key] = by_status.get(key, 0) + 1
+            return {
+                "requests": len(self.request_log),
+                "by_endpoint": by_status,
+                "posts_stored": len(self.posts),
+                "tokens_issued": len(self.tokens),
+                "grants": dict(self.grants),
+                "request_bytes_wire": self.bytes_in["wire"],
+                "request_bytes_decoded": self.bytes_in["decoded"],
+            }
+
+    # -- request handling ----------------------------------------------------
+
+    def _injected_failure(self, path: str) -> Optional[int]:
+        cfg = self.config
+        if path in cfg.forced_status:
+            return cfg.forced_status[path]
+        if path == "/connect/token":
+            return None
+        with self._lock:
+            roll = self._rng.random()
+        if roll < cfg.error_rate and cfg.error_statuses:
+            return self._rng.choice(cfg.error_statuses)
+        if roll < cfg.error_rate + cfg.unauthorized_rate:
+            return 401
+        return None
+
+    def _authorized(self, headers) -> bool:
+        auth = headers.get("Authorization", "")
+        if not auth.startswith("Bearer "):
+            return False
+        expiry = self.tokens.get(auth[7:])
+        return expiry is not None and time.time() < expiry
+
+    def _issue_token(self, form: Dict[str, str]) -> Tuple[int, Any]:
+        grant = form.get("grant_type")
+        if grant == "password":
+            if form.get("username") != self.config.username or form.get("password") != self.config.password:
+                return 400, {"error": "invalid_grant"}
+        elif grant == "refresh_token":
+            if form.get("refresh_token") not in self.tokens:
+                return 400, {"error": "invalid_grant"}
+        else:
+            return 400, {"error": "unsupported_grant_type"}
+        token = uuid.uuid4().hex
+        refresh = uuid.uuid4().hex
+        with self._lock:
+            self.grants[grant] = self.grants.get(grant, 0) + 1
+            self.tokens[token] = time.time() + self.config.token_ttl_seconds
+            self.tokens[refresh] = time.time() + self.config.token_ttl_seconds * 10
+        return 200, {
+            "access_token": token,
+            "refresh_token": refresh,
+            "expires_in": self.config.token_ttl_seconds,
+            "token_type": "Bearer",
+        }
+
+    @staticmethod
+    def _page(items: List[Any], query: Dict[str, str]) -> Dict[str, Any]:
+        skip = max(0, int(query.get("SkipCount", 0) or 0))
+        take = max(1, int(query.get("MaxResultCount", 10) or 10))
+        return {"totalCount": len(items), "items": items[skip:skip + take]}
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Any) -> Tuple[int, Any]:
+        if path == "/api/app/source" and method == "GET":
+            items = self.sources
+            if "Platform" in query:
+                items = [s for s in items if str(s.get("platform")) == query["Platform"]]
+            if query.get("IsActive", "").lower() == "true":
+                items = [s for s in items if s.get("isActive", True)]
+            return 200, self._page(items, query)
+
+        if path == "/api/app/scraper/posts":
+            if method == "GET":
+                with self._lock:
+                    items = list(self.posts.values())
+                if query.get("SourceId"):
+                    items = [p for p in items if p.get("sourceId") == query["SourceId"]]
+                items.sort(key=lambda p: p.get("postDate") or "", reverse=True)
+                return 200, self._page(items, query)
+            if method == "PUT":
+                rows = body if isinstance(body, list) else []
+                with self._lock:
+                    for row in rows:
+                        if isinstance(row, dict) and row.get("externalPostId"):
+                            self.posts[row["externalPostId"]] = {"id": uuid.uuid4().hex, **row}
+                return 200, {"items": rows}
+
+        if path == "/api/app/profiles":
+            if method == "PUT":
+                self.profiles.append(body)
+                return 200, body
+            return 200, self._page(self.profiles, query)
+
+        if path == "/api/app/baselines" and method == "PUT":
+            self.baselines.append(body)
+            return 200, body
+
+        if path == "/api/app/post_history":
+            if method == "PUT":
+                self.post_history.append(body)
+                return 200, body
+            return 200, self._page(self.post_history, query)
+
+        if path == "/api/app/cooldowns":
+            if method == "PUT" and isinstance(body, dict):
+                self.cooldowns[body.get("username", "")] = body
+                return 200, body
+            return 200, self.cooldowns.get(query.get("username", ""), {})
+
+        return 404, {"error": "not_found"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeLensAPI
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", "0") or "0")
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        headers = dict(headers or {})
+        if self.fake.config.compress_responses and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _decode_body(self, raw: bytes) -> Optional[bytes]:
+        encoding = self.headers.get("Content-Encoding", "identity").strip().lower() or "identity"
+        if encoding == "identity":
+            return raw
+        if encoding not in self.fake.config.accept_encodings or encoding != "gzip":
+            return None
+        return gzip.decompress(raw)
+
+    def _dispatch(self, method: str) -> None:
+        fake = self.fake
+        cfg = fake.config
+        started = time.perf_counter()
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/") or "/"
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        raw = self._read_body()
+        decoded = self._decode_body(raw)
+        if decoded is None:
+            self._send(415, {"error": "unsupported_content_encoding"}, {
+                "Accept-Encoding": ", ".join(cfg.accept_encodings) or "identity",
+            })
+            with fake._lock:
+                fake.request_log.append((method, path, 415, time.perf_counter() - started))
+            return
+        with fake._lock:
+            fake.bytes_in["wire"] += len(raw)
+            fake.bytes_in["decoded"] += len(decoded)
+        raw = decoded
+
+        if cfg.latency_seconds or cfg.latency_jitter_seconds:
+            time.sleep(cfg.latency_seconds + random.uniform(0, cfg.latency_jitter_seconds))
+
+        status: int
+        payload: Any
+        headers: Dict[str, str] = {}
+        injected = fake._injected_failure(path)
+        if injected is not None:
+            status, payload = injected, {"error": "injected"}
+            if injected in (429, 503) and cfg.retry_after_seconds is not None:
+                headers["Retry-After"] = str(cfg.retry_after_seconds)
+        elif path == "/connect/token" and method == "POST":
+            form = {k: v[-1] for k, v in parse_qs(raw.decode("utf-8")).items()}
+            status, payload = fake._issue_token(form)
+        elif not fake._authorized(self.headers):
+            status, payload = 401, {"error": "unauthorized"}
+        else:
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                self._send(400, {"error": "invalid_json"})
+                return
+            status, payload = fake.handle(method, path, query, body)
+
+        self._send(status, payload, headers)
+        with fake._lock:
+            fake.request_log.append((method, path, status, time.perf_counter() - started))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
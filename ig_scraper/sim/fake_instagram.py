@@ -0,0 +1,241 @@
+"""Templated fake Instagram site for offline scraping runs.
+
+`FakeInstagram` renders the pages the scraper touches (home, login,
+challenge, profile grid with scroll-loaded posts, post pages with comments)
+from deterministic synthetic data. It can be attached to a Playwright browser
+context with `install(context)`, which fulfils every `www.instagram.com`
+request from the renderer so the scraper keeps its real `BASE_URL`, or served
+over plain HTTP with `serve()` for manual inspection.
+"""
+
+import asyncio
+import html
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+
+@dataclass
+class FakeInstagramConfig:
+    posts_per_profile: int = 24
+    # Links rendered up front; the rest are appended as the grid is scrolled.
+    grid_batch: int = 12
+    comments_per_post: int = 5
+    # Minutes between consecutive posts of a profile (newest is `post_age_start`).
+    post_interval_minutes: int = 45
+    post_age_start_minutes: int = 10
+    logged_in: bool = True
+    challenge_users: Set[str] = field(default_factory=set)
+    missing_users: Set[str] = field(default_factory=set)
+    # Render empty captions/grids to simulate layout breakage.
+    broken_captions: bool = False
+    empty_grids: bool = False
+    # Per-page server latency applied by `install`/`serve`.
+    latency_seconds: float = 0.0
+    seed: int = 7
+
+
+_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>{title}</title>{head}</head>
+<body>{nav}<main role="main">{main}</main>{script}</body></html>"""
+
+_NAV = """<nav><a href="/"><svg aria-label="Home"></svg></a><a href="/direct/inbox/">Inbox</a>
+<input placeholder="Search"><a href="/accounts/edit/">Edit</a></nav>"""
+
+_GRID_SCRIPT = """<script>
+(() => {
+  const pending = %s;
+  const grid = document.querySelector('#grid');
+  const more = () => {
+    if (!pending.length) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 400) return;
+    for (const href of pending.splice(0, %d)) {
+      const a = document.createElement('a');
+      a.href = href;
+      a.innerHTML = '<div class="tile" style="height:300px"></div>';
+      grid.appendChild(a);
+    }
+  };
+  window.addEventListener('scroll', () => setTimeout(more, 50));
+  window.addEventListener('wheel', () => setTimeout(more, 50));
+})();
+</script>"""
+
+
+class FakeInstagram:
+    def __init__(self, usernames: List[str], config: Optional[FakeInstagramConfig] = None):
+        self.config = config or FakeInstagramConfig()
+        self.usernames = list(usernames)
+        self.now = datetime.now(timezone.utc)
+        self.hits: Dict[str, int] = {}
+        self._codes: Dict[str, Tuple[str, int]] = {
+            code: (username, idx)
+            for username in self.usernames
+            for idx, code in enumerate(self.post_codes(username))
+        }
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # -- synthetic data ----------------------------------------------------
+
+    def post_codes(self, username: str) -> List[str]:
+        return [f"{username[:4]}{idx:05d}" for idx in range(self.config.posts_per_profile)]
+
+    def _post(self, code: str) -> Optional[Dict[str, Any]]:
+        entry = self._codes.get(code)
+        if entry is None:
+            return None
+        username, idx = entry
+        rng = random.Random(f"{self.config.seed}:{code}")
+        published = self.now - timedelta(
+            minutes=self.config.post_age_start_minutes + idx * self.config.post_interval_minutes
+        )
+        comments = [
+            {"author": f"fan{rng.randint(1, 9999)}", "text": f"Comment {n} on {code}"}
+            for n in range(self.config.comments_per_post)
+        ]
+        return {
+            "code": code,
+            "username": username,
+            "caption": "" if self.config.broken_captions else f"Caption for {code} by @{username} #sim",
+            "likes": rng.randint(0, 250_000),
+            "published_at": published.isoformat().replace("+00:00", "Z"),
+            "comments": comments,
+        }
+
+    # -- rendering -----------------------------------------------------------
+
+    def _page(self, title: str, main: str, head: str = "", script: str = "", nav: bool = True) -> str:
+        return _PAGE.format(title=html.escape(title), head=head, nav=_NAV if nav else "", main=main, script=script)
+
+    def render(self, method: str, path: str, cookies: Dict[str, str]) -> Tuple[int, str, Dict[str, str]]:
+        """Return `(status, html, headers)` for a request path."""
+        self.hits[path] = self.hits.get(path, 0) + 1
+        logged_in = self.config.logged_in or ("sessionid" in cookies and "ds_user_id" in cookies)
+        parts = [p for p in path.split("/") if p]
+
+        if parts[:2] == ["accounts", "login"]:
+            if method == "POST":
+                return 302, "", {
+                    "Location": "/",
+                    # Playwright splits multiple cookies on newlines.
+                    "Set-Cookie": "sessionid=sim-session; Path=/\nds_user_id=1; Path=/",
+                }
+            return 200, self._login_page(), {}
+        if parts and parts[0] in {"challenge", "checkpoint"}:
+            return 200, self._page("Challenge", "<h2>We detected an unusual login attempt</h2>", nav=False), {}
+        if not logged_in:
+            return 302, "", {"Location": "/accounts/login/"}
+        if not parts:
+            return 200, self._page("Instagram", "<section>Feed</section>"), {}
+        if parts[0] in {"p", "reel"} and len(parts) > 1:
+            post = self._post(parts[1])
+            if not post:
+                return 404, self._page("Not found", "<h2>Sorry, this page isn't available.</h2>"), {}
+            return 200, self._post_page(post), {}
+
+        username = parts[0].lower()
+        if username in self.config.challenge_users:
+            return 302, "", {"Location": "/challenge/action/"}
+        if username not in self.usernames or username in self.config.missing_users:
+            return 404, self._page("Not found", "<h2>Sorry, this page isn't available.</h2>"), {}
+        return 200, self._profile_page(username), {}
+
+    def _login_page(self) -> str:
+        form = """<form method="post" action="/accounts/login/">
+<input name="username" aria-label="Phone number, username, or email" type="text">
+<input name="password" type="password" autocomplete="current-password">
+<button type="submit">Log in</button></form>"""
+        return self._page("Login", form, nav=False)
+
+    def _profile_page(self, username: str) -> str:
+        hrefs = [] if self.config.empty_grids else [f"/p/{code}/" for code in self.post_codes(username)]
+        first, rest = hrefs[: self.config.grid_batch], hrefs[self.config.grid_batch:]
+        tiles = "".join(f'<a href="{h}"><div class="tile" style="height:300px"></div></a>' for h in first)
+        header = f"""<header><section><h2>{html.escape(username)}</h2>
+<div><span>Bio of {html.escape(username)}</span></div>
+<a href="/{username}/followers/"><span>{len(username) * 1234:,}</span></a>
+<a href="/{username}/following/"><span>{len(username) * 12}</span></a></section></header>"""
+        main = f'{header}<article><div id="grid">{tiles}</div></article>'
+        return self._page(username, main, script=_GRID_SCRIPT % (json.dumps(rest), self.config.grid_batch))
+
+    def _post_page(self, post: Dict[str, Any]) -> str:
+        caption = html.escape(post["caption"])
+        comments = "".join(
+            f'<li><h3><a href="/{html.escape(c["author"])}/">{html.escape(c["author"])}</a></h3>'
+            f'<span>{html.escape(c["text"])}</span></li>'
+            for c in post["comments"]
+        )
+        head = f'<meta property="og:description" content="{post["likes"]} likes - {html.escape(post["username"])}: &quot;{caption}&quot;">'
+        main = f"""<article><header><a href="/{post['username']}/">{post['username']}</a></header>
+<ul><li><h1>{caption}</h1></li><li><ul>{comments}</ul></li></ul>
+<section><a href="/p/{post['code']}/liked_by/"><span>{post['likes']:,}</span></a></section>
+<time datetime="{post['published_at']}">{post['published_at']}</time></article>"""
+        return self._page(f"Post {post['code']}", main, head=head)
+
+    # -- transports ----------------------------------------------------------
+
+    async def install(self, context) -> None:
+        """Route every instagram.com request of a Playwright context to `render`."""
+
+        async def _handle(route, request):
+            if self.config.latency_seconds:
+                await asyncio.sleep(self.config.latency_seconds)
+            cookie_header = request.headers.get("cookie", "")
+            cookies = dict(
+                pair.strip().split("=", 1) for pair in cookie_header.split(";") if "=" in pair
+            )
+            status, body, headers = self.render(request.method, urlparse(request.url).path, cookies)
+            await route.fulfill(status=status, body=body, headers=headers, content_type="text/html; charset=utf-8")
+
+        await context.route("https://www.instagram.com/**", _handle)
+        if self.config.logged_in:
+            await context.add_cookies([
+                {"name": "sessionid", "value": "sim-session", "domain": ".instagram.com", "path": "/"},
+                {"name": "ds_user_id", "value": "1", "domain": ".instagram.com", "path": "/"},
+            ])
+
+    def serve(self, port: int = 0) -> str:
+        """Serve the site over HTTP on localhost and return its base URL."""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, method):
+                cookies = dict(
+                    pair.strip().split("=", 1) for pair in self.headers.get("Cookie", "").split(";") if "=" in pair
+                )
+                status, body, headers = site.render(method, urlparse(self.path).path, cookies)
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    for line in value.split("\n"):
+                        self.send_header(key, line)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-instagram", daemon=True).start()
+        host, bound_port = self._server.server_address[:2]
+        return f"http://{host}:{bound_port}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
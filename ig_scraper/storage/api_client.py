@@ -1,12 +1,18 @@
 import asyncio
 import logging
 import os
+import threading
 import time
-from typing import Any
+from collections import deque
+from typing import Any, AsyncIterator
 
 import httpx
 from dotenv import load_dotenv
 
+from analytics import metrics
+from core.background import create_logged_task
+from storage import compression, retry, serialization, tokens, wal
+
 load_dotenv()
 
 API_BASE = os.getenv("API_BASE", "http://localhost:5000").rstrip("/")
@@ -15,47 +21,70 @@ API_PASS = os.getenv("API_PASS", "")
 API_CLIENT_ID = os.getenv("API_CLIENT_ID", "Lens_App")
 API_SCOPE = os.getenv("API_SCOPE", "Lens")
 API_TIMEOUT_SECONDS = float(os.getenv("API_TIMEOUT_SECONDS", "30"))
+# Writes queued in memory while the circuit is open (0 disables spooling).
+API_SPOOL_MAX = int(os.getenv("API_SPOOL_MAX", "1000") or "1000")
+# How often the background replayer retries the on-disk post spool.
+POST_SPOOL_REPLAY_SECONDS = float(os.getenv("POST_SPOOL_REPLAY_SECONDS", "30") or "30")
+POSTS_ENDPOINT = "/api/app/scraper/posts"
 
 logger = logging.getLogger("ig_scraper.api_client")
-if not logger.handlers:
-    handler = logging.StreamHandler()
-    fmt = logging.Formatter("%(asctime)s %(levelname)s [api_client] %(message)s")
-    handler.setFormatter(fmt)
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
 
 
 class APIClient:
     def __init__(self) -> None:
         self.base = API_BASE
         self._client: httpx.AsyncClient | None = None
-        self._access_token: str | None = None
-        self._token_expiry: float | None = None
-        self._lock = asyncio.Lock()
-        self._max_retries = 3
-        self._backoff_factor = 0.5
+        self._tokens = tokens.TokenManager(self._password_form)
+        self._token_refresher: asyncio.Task | None = None
+        self._spool_drainer: asyncio.Task | None = None
+        self._compression = compression.Negotiator()
+        self._breaker = retry.CircuitBreaker()
+        self._spool: deque[tuple[str, str, dict[str, Any]]] = deque()
+        self._draining = False
+        self._wal: wal.WriteAheadLog | None = None
+        self._wal_opened = False
 
     def _build_client(self) -> httpx.AsyncClient:
         return httpx.AsyncClient(base_url=self.base, timeout=API_TIMEOUT_SECONDS)
 
-    async def _ensure_client(self) -> None:
+    async def _ensure_client(self) -> tokens.Token | None:
+        """The HTTP client plus a usable token; only blocks when there is none yet."""
         if self._client is None:
             self._client = self._build_client()
-        if not self._has_valid_token():
-            await self.login()
+        token = await self._tokens.ensure(self._client)
+        self._start_token_refresher()
+        return token
 
-    def _has_valid_token(self) -> bool:
-        if not self._access_token:
-            return False
-        if not self._token_expiry:
-            return True
-        return time.time() < (self._token_expiry - 30)
+    def _start_token_refresher(self) -> None:
+        if self._client is None or (self._token_refresher is not None and not self._token_refresher.done()):
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._token_refresher = None
+            return
+        self._token_refresher = create_logged_task(self._tokens.run(self._client), "OAuth token refresher")
+
+    @staticmethod
+    def _password_form(username: str | None = None, password: str | None = None) -> dict[str, str]:
+        return {
+            "grant_type": "password",
+            "username": username or API_USER,
+            "password": password or API_PASS,
+            "client_id": API_CLIENT_ID,
+            "scope": API_SCOPE,
+        }
 
     @staticmethod
     def _parse_json_safe(resp: httpx.Response | None) -> Any:
         if resp is None:
             return None
         try:
+            return serialization.loads(resp.content)
+        except Exception:
+            pass
+        try:
+            # Non-UTF-8 bodies: let httpx sniff the encoding.
             return resp.json()
         except Exception:
             return None
@@ -83,42 +112,75 @@ class APIClient:
 
         return cleaned.rstrip("/")
 
-    async def _request_with_retries(self, method: str, url: str, **kwargs) -> httpx.Response | None:
-        await self._ensure_client()
+    async def _request_with_retries(
+        self, method: str, url: str, spool: bool = False, **kwargs
+    ) -> httpx.Response | None:
+        """Send a request under its endpoint's `RetryPolicy` and the client circuit breaker.
+
+        With `spool=True` (idempotent writes), a request that cannot be
+        delivered because the API is unhealthy is queued for replay once the
+        circuit closes, and a synthetic `202 {"spooled": true}` response is
+        returned instead of None.
+        """
         last_exc: Exception | None = None
-        retriable_statuses = {408, 429, 500, 502, 503, 504}
+        resp: httpx.Response | None = None
+        policy = retry.policy_for(method, url)
+
+        # Encode JSON bodies once with the fast backend instead of letting httpx
+        # re-run stdlib json on every attempt.
+        if "json" in kwargs:
+            kwargs["content"] = serialization.dumps(kwargs.pop("json"))
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "Content-Type": "application/json"}
+
+        raw_body = kwargs.get("content") if isinstance(kwargs.get("content"), bytes) else None
+        plain_kwargs = kwargs
+        encoding = None
+        if raw_body is not None and method.lower() in {"put", "post"}:
+            encoding = self._compression.choose(len(raw_body))
+            if encoding:
+                kwargs = self._encode_body(kwargs, raw_body, encoding)
+
+        if not self._breaker.allow():
+            metrics.API_RETRIES.inc(endpoint=url, reason="circuit_open")
+            logger.warning("Circuit open; failing fast for %s %s", method.upper(), url)
+            return self._spool_or_none(method, url, plain_kwargs, spool)
 
-        for attempt in range(1, self._max_retries + 1):
+        try:
+            token = await self._ensure_client()
+        except Exception as exc:
+            logger.error("Could not authenticate for %s %s: %s", method.upper(), url, exc)
+            self._record_health(False)
+            return self._spool_or_none(method, url, plain_kwargs, spool)
+
+        attempt = 0
+        while attempt < policy.max_attempts:
+            attempt += 1
+            started = time.perf_counter()
             try:
                 assert self._client is not None
-                resp = await self._client.request(method, url, follow_redirects=True, **kwargs)
-                logger.info("%s %s -> %d", method.upper(), url, resp.status_code)
-
-                if resp.status_code == 401:
-                    logger.warning("401 on %s %s; refreshing OAuth token", method.upper(), url)
-                    self._access_token = None
-                    self._token_expiry = None
-                    login_ok = await self.login()
-                    if login_ok:
-                        continue
-
-                if resp.status_code in retriable_statuses and attempt < self._max_retries:
-                    sleep_for = self._backoff_factor * (2 ** (attempt - 1))
-                    logger.warning(
-                        "Retryable HTTP status %d for %s %s attempt %d; retrying in %.2fs",
-                        resp.status_code,
-                        method.upper(),
-                        url,
-                        attempt,
-                        sleep_for,
-                    )
-                    await asyncio.sleep(sleep_for)
-                    continue
-
-                return resp
+                # The token is fixed per attempt; a background refresh swapping
+                # in a new one does not affect requests already in flight.
+                send_kwargs = kwargs
+                if token is not None:
+                    send_kwargs = {
+                        **kwargs,
+                        "headers": {**(kwargs.get("headers") or {}), "Authorization": f"Bearer {token.access_token}"},
+                    }
+                resp = await self._client.request(method, url, follow_redirects=True, **send_kwargs)
+                last_exc = None
             except Exception as exc:
                 last_exc = exc
-                sleep_for = self._backoff_factor * (2 ** (attempt - 1))
+                metrics.API_LATENCY.observe(
+                    time.perf_counter() - started, method=method.upper(), endpoint=url, status="error"
+                )
+                opened = self._record_health(False)
+                if not policy.should_retry_exception(exc):
+                    logger.warning("Request failed %s %s: %s; not retrying (non-idempotent)", method.upper(), url, exc)
+                    break
+                if opened or self._breaker.state == retry.CircuitBreaker.OPEN or attempt >= policy.max_attempts:
+                    break
+                sleep_for = policy.backoff(attempt)
+                metrics.API_RETRIES.inc(endpoint=url, reason=type(exc).__name__)
                 logger.warning(
                     "Request failed %s %s attempt %d: %s; retrying in %.2fs",
                     method.upper(),
@@ -128,66 +190,260 @@ class APIClient:
                     sleep_for,
                 )
                 await asyncio.sleep(sleep_for)
+                continue
 
-        logger.error("Request ultimately failed: %s %s: %s", method.upper(), url, last_exc)
-        return None
-
-    async def login(self, username: str | None = None, password: str | None = None) -> bool:
-        async with self._lock:
-            if self._client is None:
-                self._client = self._build_client()
-
-            if self._has_valid_token():
-                return True
-
-            resolved_username = username or API_USER
-            resolved_password = password or API_PASS
-            if not resolved_username or not resolved_password:
-                logger.error("Missing API credentials. Set API_USER and API_PASS in environment.")
-                return False
-
-            form_payload = {
-                "grant_type": "password",
-                "username": resolved_username,
-                "password": resolved_password,
-                "client_id": API_CLIENT_ID,
-                "scope": API_SCOPE,
-            }
-            token_resp = await self._client.post(
-                "/connect/token",
-                data=form_payload,
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                follow_redirects=True,
+            metrics.API_LATENCY.observe(
+                time.perf_counter() - started, method=method.upper(), endpoint=url, status=resp.status_code
             )
+            logger.debug("%s %s -> %d", method.upper(), url, resp.status_code)
+            self._record_transfer(url, raw_body, kwargs.get("content"), encoding, resp)
 
-            token_json = self._parse_json_safe(token_resp)
-            token = token_json.get("access_token") if isinstance(token_json, dict) else None
-            expires = token_json.get("expires_in") if isinstance(token_json, dict) else None
+            if resp.status_code == 415 and encoding:
+                # Server refused the Content-Encoding: renegotiate and resend
+                # without spending a retry.
+                fallback = self._compression.rejected(encoding, resp.headers.get("accept-encoding", ""))
+                logger.warning(
+                    "%s %s rejected Content-Encoding %s; falling back to %s",
+                    method.upper(), url, encoding, fallback or "identity",
+                )
+                metrics.API_RETRIES.inc(endpoint=url, reason="415")
+                encoding = fallback
+                kwargs = self._encode_body(kwargs, raw_body, encoding)
+                attempt -= 1
+                continue
 
-            if token:
-                self._access_token = token
+            if resp.status_code == 401 and attempt < policy.max_attempts:
+                logger.warning("401 on %s %s; refreshing OAuth token", method.upper(), url)
+                metrics.API_RETRIES.inc(endpoint=url, reason="401")
                 try:
-                    self._token_expiry = time.time() + int(expires)
-                except Exception:
-                    self._token_expiry = None
-                self._client.headers.update({"Authorization": f"Bearer {token}"})
-                logger.info("Obtained OAuth access token")
-                return True
+                    refreshed = await self._tokens.invalidate(self._client, token)
+                except Exception as exc:
+                    logger.error("Token refresh after 401 failed: %s", exc)
+                    refreshed = None
+                if refreshed is not None:
+                    token = refreshed
+                    continue
 
-            logger.error("Failed to fetch OAuth token from /connect/token")
+            if resp.status_code not in policy.retry_statuses:
+                # Any answer the server chose to give (2xx-4xx) means it is healthy.
+                self._record_health(resp.status_code < 500)
+                return resp
+
+            opened = self._record_health(False)
+            # Once the breaker is open, in-flight requests stop retrying too.
+            if opened or self._breaker.state == retry.CircuitBreaker.OPEN or attempt >= policy.max_attempts:
+                break
+            sleep_for = policy.backoff(attempt)
+            retry_after = retry.retry_after_seconds(resp) if policy.respect_retry_after else None
+            if retry_after is not None:
+                if retry_after > policy.max_retry_after:
+                    logger.warning(
+                        "Retry-After %.1fs for %s %s exceeds %.1fs; giving up",
+                        retry_after, method.upper(), url, policy.max_retry_after,
+                    )
+                    break
+                sleep_for = max(sleep_for, retry_after)
+            metrics.API_RETRIES.inc(endpoint=url, reason=str(resp.status_code))
+            logger.warning(
+                "Retryable HTTP status %d for %s %s attempt %d; retrying in %.2fs",
+                resp.status_code,
+                method.upper(),
+                url,
+                attempt,
+                sleep_for,
+            )
+            await asyncio.sleep(sleep_for)
+
+        if last_exc is None and resp is not None:
+            logger.error("Request ultimately failed: %s %s: HTTP %s", method.upper(), url, resp.status_code)
+            if not spool:
+                return resp
+        else:
+            logger.error("Request ultimately failed: %s %s: %s", method.upper(), url, last_exc)
+        return self._spool_or_none(method, url, plain_kwargs, spool)
+
+    def _record_health(self, ok: bool) -> bool:
+        """Feed the circuit breaker; returns True when a failure just opened it."""
+        if ok:
+            if self._breaker.record_success():
+                logger.info("Lens API healthy again; circuit closed")
+                metrics.API_CIRCUIT_OPEN.set(0)
+                self._schedule_spool_drain()
             return False
+        opened = self._breaker.record_failure()
+        if opened:
+            logger.warning(
+                "Lens API unhealthy after %d consecutive failures; circuit open for %.0fs",
+                self._breaker.failures, self._breaker.reset_timeout,
+            )
+            metrics.API_CIRCUIT_OPEN.set(1)
+        return opened
 
-    async def _get_all_paged_items(
+    def _spool_or_none(self, method: str, url: str, kwargs: dict[str, Any], spool: bool) -> httpx.Response | None:
+        if not spool or API_SPOOL_MAX <= 0:
+            return None
+        if len(self._spool) >= API_SPOOL_MAX:
+            dropped_method, dropped_url, _ = self._spool.popleft()
+            metrics.API_SPOOLED.inc(endpoint=dropped_url, outcome="dropped")
+            logger.warning("Write spool full (%d); dropped oldest %s %s", API_SPOOL_MAX, dropped_method.upper(), dropped_url)
+        self._spool.append((method, url, {k: v for k, v in kwargs.items() if k in {"content", "headers", "params"}}))
+        metrics.API_SPOOLED.inc(endpoint=url, outcome="spooled")
+        metrics.API_SPOOL_DEPTH.set(len(self._spool))
+        logger.warning("Spooled %s %s for replay (%d pending)", method.upper(), url, len(self._spool))
+        return httpx.Response(
+            202,
+            json={"items": [], "spooled": True},
+            headers={"X-Spooled": "1"},
+            request=httpx.Request(method.upper(), f"{self.base}{url}"),
+        )
+
+    def _schedule_spool_drain(self) -> None:
+        if not self.spool_depth or self._draining:
+            return
+        if self._spool_drainer is not None and not self._spool_drainer.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._spool_drainer = create_logged_task(self.drain_spool(), "API spool drain")
+
+    async def drain_spool(self) -> int:
+        """Replay spooled writes in order; stops at the first one that still fails."""
+        drainer = self._spool_drainer
+        if drainer is not None and not drainer.done() and drainer is not asyncio.current_task():
+            # Let the background drain finish first so an explicit drain (e.g. at exit) is not a no-op.
+            await asyncio.wait([drainer])
+        if self._draining:
+            return 0
+        self._draining = True
+        replayed = 0
+        try:
+            while self._spool:
+                method, url, kwargs = self._spool[0]
+                resp = await self._request_with_retries(method, url, **kwargs)
+                if resp is None or resp.status_code >= 500 or resp.status_code in {408, 429}:
+                    break
+                self._spool.popleft()
+                replayed += 1
+                metrics.API_SPOOLED.inc(endpoint=url, outcome="replayed" if resp.is_success else "rejected")
+            if not self._spool and self._wal is not None:
+                replayed += await self._drain_post_spool()
+            if replayed:
+                logger.info("Replayed %d spooled write(s); %d still pending", replayed, self.spool_depth)
+        finally:
+            self._draining = False
+            metrics.API_SPOOL_DEPTH.set(len(self._spool))
+        return replayed
+
+    async def _drain_post_spool(self) -> int:
+        assert self._wal is not None
+        replayed = 0
+        entries = self._wal.claim()
+        try:
+            for seq, url, payload in entries:
+                resp = await self._request_with_retries("put", url, json=payload)
+                if self._is_transient(resp):
+                    break
+                self._wal.ack(seq)
+                replayed += 1
+                metrics.API_SPOOLED.inc(endpoint=url, outcome="replayed" if resp.is_success else "rejected")
+        finally:
+            # Anything not acknowledged goes back to the queue for the next pass.
+            for seq, _, _ in entries:
+                self._wal.release(seq)
+        return replayed
+
+    @property
+    def spool_depth(self) -> int:
+        return len(self._spool) + (self._wal.pending if self._wal is not None else 0)
+
+    def _post_spool(self) -> wal.WriteAheadLog | None:
+        if not self._wal_opened:
+            self._wal_opened = True
+            self._wal = wal.open_default()
+        return self._wal
+
+    @staticmethod
+    def _is_transient(resp: httpx.Response | None) -> bool:
+        """Failures worth replaying later; other 4xx answers will never succeed."""
+        return resp is None or resp.status_code >= 500 or resp.status_code in {401, 408, 429}
+
+    async def run_spool_replay(self, interval: float = POST_SPOOL_REPLAY_SECONDS) -> None:
+        """Replay spooled writes now and then every `interval` seconds until cancelled."""
+        self._post_spool()
+        while True:
+            if self.spool_depth and self._breaker.state != retry.CircuitBreaker.OPEN:
+                await self.drain_spool()
+            await asyncio.sleep(max(1.0, interval))
+
+    def close_spool(self) -> None:
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        self._wal_opened = False
+
+    async def close(self) -> None:
+        """Stop the token refresher and spool drain and close the HTTP client; call after `drain_spool`."""
+        for task in (self._token_refresher, self._spool_drainer):
+            if task is not None and not task.done():
+                task.cancel()
+                await asyncio.wait([task])
+        self._token_refresher = None
+        self._spool_drainer = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _encode_body(kwargs: dict[str, Any], raw_body: bytes, encoding: str | None) -> dict[str, Any]:
+        headers = {k: v for k, v in (kwargs.get("headers") or {}).items() if k.lower() != "content-encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return {**kwargs, "content": compression.compress(raw_body, encoding), "headers": headers}
+        return {**kwargs, "content": raw_body, "headers": headers}
+
+    @staticmethod
+    def _record_transfer(
+        url: str,
+        raw_body: bytes | None,
+        sent_body: Any,
+        encoding: str | None,
+        resp: httpx.Response,
+    ) -> None:
+        if raw_body is not None:
+            metrics.API_BYTES.inc(len(raw_body), endpoint=url, direction="request_raw", encoding=encoding or "identity")
+            if isinstance(sent_body, bytes):
+                metrics.API_BYTES.inc(len(sent_body), endpoint=url, direction="request_wire", encoding=encoding or "identity")
+        # httpx has already decoded gzip/deflate/br (and zstd when available) bodies.
+        response_encoding = resp.headers.get("content-encoding", "identity") or "identity"
+        metrics.API_BYTES.inc(resp.num_bytes_downloaded, endpoint=url, direction="response_wire", encoding=response_encoding)
+        metrics.API_BYTES.inc(len(resp.content), endpoint=url, direction="response_decoded", encoding=response_encoding)
+
+    async def login(self, username: str | None = None, password: str | None = None) -> bool:
+        if self._client is None:
+            self._client = self._build_client()
+        if self._tokens.current() is not None:
+            return True
+        form = self._password_form(username, password) if (username or password) else None
+        token = await self._tokens.refresh(self._client, reason="initial", form=form)
+        self._start_token_refresher()
+        if token is None:
+            logger.error("Failed to fetch OAuth token from /connect/token")
+        return token is not None
+
+    async def _iter_paged_items(
         self,
         path: str,
         base_params: dict[str, Any] | None = None,
         total_limit: int | None = None,
-    ) -> list[dict[str, Any]]:
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Yield the items of an ABP paged endpoint one page at a time."""
         params = dict(base_params or {})
         max_result_count = int(params.pop("MaxResultCount", 200))
         skip_count = int(params.pop("SkipCount", 0))
 
-        items: list[dict[str, Any]] = []
+        yielded = 0
         total_count = None
 
         while True:
@@ -199,29 +455,53 @@ class APIClient:
             resp = await self._request_with_retries("get", path, params=query)
             data = self._parse_json_safe(resp)
             if not isinstance(data, dict):
-                break
+                return
 
             page_items = data.get("items")
             if not isinstance(page_items, list):
-                break
-
-            items.extend([x for x in page_items if isinstance(x, dict)])
+                return
 
-            if total_limit and len(items) >= total_limit:
-                return items[:total_limit]
+            page = [x for x in page_items if isinstance(x, dict)]
+            if total_limit and yielded + len(page) >= total_limit:
+                yield page[: total_limit - yielded]
+                return
+            if page:
+                yielded += len(page)
+                yield page
 
             if total_count is None:
                 total_count = data.get("totalCount") if isinstance(data.get("totalCount"), int) else None
 
             if not page_items:
-                break
+                return
 
             skip_count += len(page_items)
             if total_count is not None and skip_count >= total_count:
-                break
+                return
 
+    async def _get_all_paged_items(
+        self,
+        path: str,
+        base_params: dict[str, Any] | None = None,
+        total_limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        async for page in self._iter_paged_items(path, base_params, total_limit=total_limit):
+            items.extend(page)
         return items
 
+    def iter_sources(
+        self,
+        platform: int | None = None,
+        is_active: bool = True,
+        max_result_count: int = 200,
+        total_limit: int | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        params: dict[str, Any] = {"IsActive": is_active, "MaxResultCount": max_result_count}
+        if platform is not None:
+            params["Platform"] = platform
+        return self._iter_paged_items("/api/app/source", params, total_limit=total_limit)
+
     async def fetch_sources(
         self,
         platform: int | None = None,
@@ -266,22 +546,47 @@ class APIClient:
         return post_ids
 
     async def write_posts(self, posts: list[dict[str, Any]]) -> Any:
+        """Upsert posts; the payload hits the on-disk spool before it is sent.
+
+        Returns the API response, `{"items": [], "spooled": True}` when it
+        could not be delivered yet and will be replayed, or None when the API
+        rejected it outright.
+        """
         if not posts:
             return {"items": []}
-        resp = await self._request_with_retries("put", "/api/app/scraper/posts", json=posts)
+        spool = self._post_spool()
+        if spool is None:
+            resp = await self._request_with_retries("put", POSTS_ENDPOINT, json=posts, spool=True)
+            return self._parse_json_safe(resp)
+        try:
+            seq = await spool.append(POSTS_ENDPOINT, posts)
+        except OSError as exc:
+            logger.error("Could not spool post write to disk: %s", exc)
+            resp = await self._request_with_retries("put", POSTS_ENDPOINT, json=posts, spool=True)
+            return self._parse_json_safe(resp)
+        resp = await self._request_with_retries("put", POSTS_ENDPOINT, json=posts)
+        if self._is_transient(resp):
+            spool.release(seq)
+            metrics.API_SPOOLED.inc(endpoint=POSTS_ENDPOINT, outcome="spooled")
+            logger.warning("Post write kept in the disk spool for replay (%d pending)", spool.pending)
+            return {"items": [], "spooled": True}
+        spool.ack(seq)
+        if not resp.is_success:
+            logger.error("Post write rejected with HTTP %s; dropped from the spool", resp.status_code)
+            return None
         return self._parse_json_safe(resp)
 
     async def write_profile(self, profile: dict[str, Any]) -> Any:
-        resp = await self._request_with_retries("put", "/api/app/profiles", json=profile)
+        resp = await self._request_with_retries("put", "/api/app/profiles", json=profile, spool=True)
         return self._parse_json_safe(resp)
 
     async def record_baseline(self, selector: str, hash_value: str, last_seen: str | None = None) -> Any:
         payload = {"selector": selector, "hash": hash_value, "lastSeen": last_seen}
-        resp = await self._request_with_retries("put", "/api/app/baselines", json=payload)
+        resp = await self._request_with_retries("put", "/api/app/baselines", json=payload, spool=True)
         return self._parse_json_safe(resp)
 
     async def record_post_history(self, entry: dict[str, Any]) -> Any:
-        resp = await self._request_with_retries("put", "/api/app/post_history", json=entry)
+        resp = await self._request_with_retries("put", "/api/app/post_history", json=entry, spool=True)
         return self._parse_json_safe(resp)
 
     async def check_cooldown(self, username: str) -> Any:
@@ -297,6 +602,21 @@ class APIClient:
 client = APIClient()
 
 
+def transfer_stats() -> dict[str, Any]:
+    """Totals of `ig_api_bytes_total` by direction plus request/response compression ratios."""
+    totals: dict[str, float] = {}
+    for sample in metrics.API_BYTES.samples():
+        direction = sample["labels"].get("direction", "")
+        totals[direction] = totals.get(direction, 0.0) + sample["value"]
+    request_raw = totals.get("request_raw", 0.0)
+    response_decoded = totals.get("response_decoded", 0.0)
+    return {
+        **{k: int(v) for k, v in totals.items()},
+        "request_ratio": (totals.get("request_wire", 0.0) / request_raw) if request_raw else None,
+        "response_ratio": (totals.get("response_wire", 0.0) / response_decoded) if response_decoded else None,
+    }
+
+
 async def fetch_sources(
     platform: int | None = None,
     is_active: bool = True,
@@ -311,10 +631,40 @@ async def fetch_sources(
     )
 
 
+def iter_sources(
+    platform: int | None = None,
+    is_active: bool = True,
+    max_result_count: int = 200,
+    total_limit: int | None = None,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    return client.iter_sources(
+        platform=platform,
+        is_active=is_active,
+        max_result_count=max_result_count,
+        total_limit=total_limit,
+    )
+
+
 async def write_posts(posts: list[dict[str, Any]]):
     return await client.write_posts(posts)
 
 
+async def drain_spool() -> int:
+    return await client.drain_spool()
+
+
+async def run_spool_replay(interval: float = POST_SPOOL_REPLAY_SECONDS) -> None:
+    await client.run_spool_replay(interval)
+
+
+def close_spool() -> None:
+    client.close_spool()
+
+
+async def close() -> None:
+    await client.close()
+
+
 async def get_recent_post_ids(source_id: str, limit: int = 50):
     return await client.get_recent_post_ids(source_id, limit=limit)
 
@@ -339,7 +689,7 @@ async def set_cooldown_api(username: str, hours: int = 24):
     return await client.set_cooldown(username, hours)
 
 
-def _sync_login() -> httpx.Client:
+def _sync_login_with_expiry() -> tuple[httpx.Client, float | None]:
     c = httpx.Client(base_url=API_BASE, timeout=20.0)
     r = c.post(
         "/connect/token",
@@ -354,14 +704,44 @@ def _sync_login() -> httpx.Client:
     )
     r.raise_for_status()
     token = None
+    expires = None
     try:
-        token = r.json().get("access_token")
+        payload = r.json()
+        token = payload.get("access_token")
+        expires = payload.get("expires_in")
     except Exception:
         token = None
     if not token:
         raise RuntimeError("Unable to obtain access_token from /connect/token")
     c.headers.update({"Authorization": f"Bearer {token}"})
-    return c
+    try:
+        expiry = time.time() + int(expires)
+    except Exception:
+        expiry = None
+    return c, expiry
+
+
+def _sync_login() -> httpx.Client:
+    return _sync_login_with_expiry()[0]
+
+
+_shared_sync_client: httpx.Client | None = None
+_shared_sync_expiry: float | None = None
+# Streamlit runs each session's script in its own thread.
+_shared_sync_lock = threading.Lock()
+
+
+def _get_sync_client() -> httpx.Client:
+    """Return a logged-in sync client, reusing the token until it nears expiry."""
+    global _shared_sync_client, _shared_sync_expiry
+    with _shared_sync_lock:
+        c = _shared_sync_client
+        if c is not None and not c.is_closed:
+            if not _shared_sync_expiry or time.time() < _shared_sync_expiry - 30:
+                return c
+            c.close()
+        _shared_sync_client, _shared_sync_expiry = _sync_login_with_expiry()
+        return _shared_sync_client
 
 
 def _extract_items(payload: Any) -> list[Any]:
@@ -372,34 +752,44 @@ def _extract_items(payload: Any) -> list[Any]:
     return []
 
 
-def fetch_profiles_sync():
-    with _sync_login() as c:
-        r = c.get("/api/app/profiles", params={"MaxResultCount": 200})
-        if r.status_code >= 400:
-            return []
-        try:
-            return _extract_items(r.json())
-        except Exception:
-            return []
+def fetch_page_sync(
+    path: str,
+    skip_count: int = 0,
+    max_result_count: int = 200,
+    params: dict[str, Any] | None = None,
+) -> tuple[list[Any], int | None]:
+    """Fetch one page of `path` and return `(items, totalCount)`.
+
+    Uses the shared sync client so repeated calls do not re-authenticate.
+    `totalCount` is None when the endpoint does not report it.
+    """
+    query = {
+        **{k: v for k, v in (params or {}).items() if v not in (None, "")},
+        "SkipCount": max(0, int(skip_count)),
+        "MaxResultCount": max(1, int(max_result_count)),
+    }
+    c = _get_sync_client()
+    r = c.get(path, params=query)
+    if r.status_code == 401:
+        c.close()
+        r = _get_sync_client().get(path, params=query)
+    if r.status_code >= 400:
+        return [], None
+    try:
+        payload = r.json()
+    except Exception:
+        return [], None
+    total = payload.get("totalCount") if isinstance(payload, dict) else None
+    return _extract_items(payload), (total if isinstance(total, int) else None)
 
 
-def fetch_posts_sync():
-    with _sync_login() as c:
-        r = c.get("/api/app/scraper/posts", params={"MaxResultCount": 200})
-        if r.status_code >= 400:
-            return []
-        try:
-            return _extract_items(r.json())
-        except Exception:
-            return []
+def fetch_profiles_sync(skip_count: int = 0, max_result_count: int = 200, params: dict[str, Any] | None = None):
+    return fetch_page_sync("/api/app/profiles", skip_count, max_result_count, params)[0]
 
 
-def fetch_post_history_sync():
-    with _sync_login() as c:
-        r = c.get("/api/app/post_history", params={"MaxResultCount": 200})
-        if r.status_code >= 400:
-            return []
-        try:
-            return _extract_items(r.json())
-        except Exception:
-            return []
+def fetch_posts_sync(skip_count: int = 0, max_result_count: int = 200, params: dict[str, Any] | None = None):
+    return fetch_page_sync("/api/app/scraper/posts", skip_count, max_result_count, params)[0]
+
+
+def fetch_post_history_sync(skip_count: int = 0, max_result_count: int = 200, params: dict[str, Any] | None = None):
+    return fetch_page_sync("/api/app/post_history", skip_count, max_result_count, params)[0]
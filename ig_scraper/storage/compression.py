@@ -0,0 +1,83 @@
+"""Request-body compression for large Lens API writes.
+
+`API_COMPRESSION` selects the encoding tried for bodies of at least
+`API_COMPRESSION_MIN_BYTES`: `off` (default), `gzip`, `zstd`, or `auto`
+(zstd when a zstd module is importable, else gzip). zstd comes from the
+stdlib `compression.zstd` (Python 3.14+) or the `zstandard` package; when
+neither is installed a `zstd` setting degrades to gzip.
+
+`Negotiator` tracks which encodings the server has accepted. A `415
+Unsupported Media Type` answer to a compressed body downgrades to the
+encodings listed in the response's `Accept-Encoding` header (RFC 7694), or
+turns compression off for the rest of the process when none are usable.
+"""
+
+import gzip
+import os
+from typing import Callable, Dict, List, Optional
+
+
+API_COMPRESSION = os.getenv("API_COMPRESSION", "off").strip().lower()
+API_COMPRESSION_MIN_BYTES = int(os.getenv("API_COMPRESSION_MIN_BYTES", "2048") or "2048")
+GZIP_LEVEL = int(os.getenv("API_COMPRESSION_GZIP_LEVEL", "6") or "6")
+ZSTD_LEVEL = int(os.getenv("API_COMPRESSION_ZSTD_LEVEL", "3") or "3")
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output deterministic for identical payloads.
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+
+try:
+    from compression import zstd as _stdlib_zstd
+
+    COMPRESSORS["zstd"] = lambda data: _stdlib_zstd.compress(data, level=ZSTD_LEVEL)
+except ImportError:
+    try:
+        import zstandard as _zstandard
+
+        _zstd_compressor = _zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        COMPRESSORS["zstd"] = _zstd_compressor.compress
+    except ImportError:
+        pass
+
+
+def _preference(setting: str) -> List[str]:
+    if setting in {"", "0", "off", "none", "false", "identity"}:
+        return []
+    if setting == "auto":
+        return [name for name in ("zstd", "gzip") if name in COMPRESSORS]
+    if setting in COMPRESSORS:
+        return [setting] + (["gzip"] if setting != "gzip" else [])
+    return ["gzip"]
+
+
+class Negotiator:
+    def __init__(self, setting: str = API_COMPRESSION, min_bytes: int = API_COMPRESSION_MIN_BYTES):
+        self.candidates = _preference(setting)
+        self.min_bytes = max(0, min_bytes)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.candidates)
+
+    def choose(self, size: int) -> Optional[str]:
+        """Encoding to use for a body of `size` bytes, or None to send it as-is."""
+        if not self.candidates or size < self.min_bytes:
+            return None
+        return self.candidates[0]
+
+    def rejected(self, encoding: str, accept_encoding: str = "") -> Optional[str]:
+        """Record a 415 for `encoding`; returns the next encoding to try, if any."""
+        offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",") if part.strip()}
+        remaining = [name for name in self.candidates if name != encoding]
+        if offered:
+            remaining = [name for name in remaining if name in offered]
+        self.candidates = remaining
+        return remaining[0] if remaining else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    return COMPRESSORS[encoding](data)
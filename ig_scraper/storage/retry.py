@@ -0,0 +1,160 @@
+"""Retry policies and circuit breaker for the Lens API client.
+
+`policy_for(method, path)` picks the `RetryPolicy` for a request from
+`DEFAULT_POLICIES` (most specific `"METHOD /path"` key wins, then
+`"METHOD *"`, then `"*"`), with per-key overrides from the
+`API_RETRY_POLICIES` env var, e.g.::
+
+    API_RETRY_POLICIES='{"PUT /api/app/scraper/posts": {"max_attempts": 5, "max_delay": 20}}'
+
+Backoff uses full jitter (`uniform(0, min(max_delay, base * 2**n))`) and
+honours `Retry-After` on 429/503. Non-idempotent requests are only retried
+when the failure proves the request never reached the server (connect
+errors, pool timeouts).
+
+`CircuitBreaker` opens after `API_BREAKER_FAILURES` consecutive server-side
+failures (5xx, 408/429, transport errors), fails requests fast for
+`API_BREAKER_RESET_SECONDS`, then lets a single probe through (half-open).
+"""
+
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field, replace
+from email.utils import parsedate_to_datetime
+from typing import Dict, FrozenSet, Optional
+
+import httpx
+
+
+logger = logging.getLogger("ig_scraper.api_client")
+
+# Exceptions raised before the request left the client; safe to retry even for POST.
+NOT_SENT_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 10.0
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({408, 429, 500, 502, 503, 504}))
+    idempotent: bool = True
+    respect_retry_after: bool = True
+    # Longer Retry-After values are not waited out; the request fails instead.
+    max_retry_after: float = 60.0
+
+    def backoff(self, attempt: int, rng: Optional[random.Random] = None) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return (rng or random).uniform(0, ceiling)
+
+    def should_retry_exception(self, exc: Exception) -> bool:
+        if isinstance(exc, NOT_SENT_EXCEPTIONS):
+            return True
+        return self.idempotent and isinstance(exc, httpx.TransportError)
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    "*": RetryPolicy(),
+    "GET *": RetryPolicy(max_attempts=4),
+    # Upserts keyed by externalPostId, so replays are harmless.
+    "PUT /api/app/scraper/posts": RetryPolicy(max_attempts=4, max_delay=15.0),
+    "PUT *": RetryPolicy(),
+    "POST *": RetryPolicy(max_attempts=2, idempotent=False),
+}
+
+
+def _load_overrides(raw: str) -> Dict[str, RetryPolicy]:
+    policies = dict(DEFAULT_POLICIES)
+    if not raw.strip():
+        return policies
+    try:
+        overrides = json.loads(raw)
+    except ValueError as exc:
+        logger.warning("Ignoring invalid API_RETRY_POLICIES: %s", exc)
+        return policies
+    for key, values in (overrides or {}).items():
+        if not isinstance(values, dict):
+            continue
+        base = policies.get(key) or policies.get(f"{key.split(' ')[0]} *") or policies["*"]
+        if "retry_statuses" in values:
+            values = {**values, "retry_statuses": frozenset(int(s) for s in values["retry_statuses"])}
+        try:
+            policies[key] = replace(base, **values)
+        except TypeError as exc:
+            logger.warning("Ignoring API_RETRY_POLICIES entry %s: %s", key, exc)
+    return policies
+
+
+POLICIES = _load_overrides(os.getenv("API_RETRY_POLICIES", ""))
+
+
+def policy_for(method: str, path: str) -> RetryPolicy:
+    method = method.upper()
+    return POLICIES.get(f"{method} {path}") or POLICIES.get(f"{method} *") or POLICIES["*"]
+
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """Parse a `Retry-After` header given as delta-seconds or an HTTP date."""
+    value = resp.headers.get("retry-after", "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = int(os.getenv("API_BREAKER_FAILURES", "5") or "5"),
+        reset_timeout: float = float(os.getenv("API_BREAKER_RESET_SECONDS", "30") or "30"),
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = max(0.0, reset_timeout)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; moves open -> half-open after the timeout."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> bool:
+        """Returns True when this success closed a previously open circuit."""
+        reopened = self.state != self.CLOSED
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+        return reopened
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure opened the circuit."""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
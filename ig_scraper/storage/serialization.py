@@ -0,0 +1,132 @@
+"""JSON encoding for API payloads and local state files.
+
+`dumps`/`loads` go through the active backend: orjson when it is installed,
+otherwise the stdlib `json` module with compact separators. Set
+`JSON_BACKEND=json` to force the stdlib path, or `register_backend` another
+implementation and select it with `set_backend`.
+
+State files (`write_state`/`read_state`) are machine state, so they are
+written compact and replaced atomically; `STATE_JSON_PRETTY=1` switches back
+to indented output for debugging. Readers accept either form. State files
+shared by several processes go through `update_state`, which re-reads and
+merges under a file lock so one process's write does not drop another's.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking, single process assumed.
+    fcntl = None
+
+
+Dumps = Callable[[Any, bool], bytes]
+Loads = Callable[[Union[bytes, str]], Any]
+
+STATE_JSON_PRETTY = os.getenv("STATE_JSON_PRETTY", "0").strip().lower() in {"1", "true", "yes"}
+
+
+def _stdlib_dumps(obj: Any, pretty: bool = False) -> bytes:
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+_BACKENDS: Dict[str, Tuple[Dumps, Loads]] = {"json": (_stdlib_dumps, _stdlib_loads)}
+
+try:
+    import orjson
+
+    def _orjson_dumps(obj: Any, pretty: bool = False) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(obj, option=option)
+
+    _BACKENDS["orjson"] = (_orjson_dumps, orjson.loads)
+except ImportError:
+    pass
+
+
+def register_backend(name: str, dumps: Dumps, loads: Loads) -> None:
+    _BACKENDS[name] = (dumps, loads)
+
+
+def set_backend(name: str) -> str:
+    """Select a registered backend; unknown names fall back to the best available one."""
+    global BACKEND, _dumps, _loads
+    if name not in _BACKENDS:
+        name = "orjson" if "orjson" in _BACKENDS else "json"
+    BACKEND = name
+    _dumps, _loads = _BACKENDS[name]
+    return name
+
+
+BACKEND = ""
+_dumps, _loads = _BACKENDS["json"]
+set_backend(os.getenv("JSON_BACKEND", "auto").strip().lower())
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """Encode `obj` as UTF-8 JSON bytes (compact unless `pretty`)."""
+    return _dumps(obj, pretty)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    return _loads(data)
+
+
+def read_state(path: Union[str, Path]) -> Any:
+    """Load a JSON state file; returns None when it is missing or unreadable."""
+    p = Path(path)
+    try:
+        data = p.read_bytes()
+    except OSError:
+        return None
+    if not data.strip():
+        return None
+    try:
+        return loads(data)
+    except ValueError:
+        return None
+
+
+def write_state(path: Union[str, Path], state: Any) -> None:
+    """Write a JSON state file via a temp file + rename so readers never see a partial file.
+
+    OS errors propagate so callers can keep their own handling.
+    """
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(dumps(state, pretty=STATE_JSON_PRETTY))
+        os.replace(tmp, p)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def update_state(path: Union[str, Path], update: Callable[[Any], Any]) -> Any:
+    """Re-read a state file, apply `update` to it and write the result, holding a file lock.
+
+    `update` gets the current content (None when missing) and returns the new
+    state, which is also returned. OS errors propagate as in `write_state`.
+    """
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(p.with_name(f".{p.name}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        state = update(read_state(p))
+        write_state(p, state)
+        return state
+    finally:
+        os.close(fd)
@@ -0,0 +1,180 @@
+"""OAuth token lifecycle for the Lens API client.
+
+`TokenManager` holds the current access token as one immutable `Token` and
+replaces it in a single assignment, so requests in flight keep the token they
+started with while a refresh runs. Refreshes are single-flight: concurrent
+callers that find the token missing or rejected wait on the same grant
+instead of each starting their own.
+
+A background task (`run`) refreshes ahead of expiry, once
+`API_TOKEN_REFRESH_FRACTION` of the token's lifetime has passed (default
+0.75). It uses the `refresh_token` grant when the server issued one and falls
+back to the password grant when that fails. Requests therefore only wait on
+`/connect/token` for the first login, after a hard expiry, or when the server
+rejects a token with 401.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from analytics import metrics
+
+
+API_TOKEN_REFRESH_FRACTION = min(0.95, max(0.1, float(os.getenv("API_TOKEN_REFRESH_FRACTION", "0.75") or "0.75")))
+# Tokens this close to expiry are treated as expired and refreshed inline.
+API_TOKEN_EXPIRY_SKEW_SECONDS = float(os.getenv("API_TOKEN_EXPIRY_SKEW_SECONDS", "10") or "10")
+# Wait before retrying a failed background refresh.
+API_TOKEN_RETRY_SECONDS = float(os.getenv("API_TOKEN_RETRY_SECONDS", "15") or "15")
+
+logger = logging.getLogger("ig_scraper.api_client")
+
+
+@dataclass(frozen=True)
+class Token:
+    access_token: str
+    refresh_token: Optional[str]
+    issued_at: float
+    expires_at: Optional[float]
+
+    @classmethod
+    def from_response(cls, payload: Any) -> Optional["Token"]:
+        if not isinstance(payload, dict) or not payload.get("access_token"):
+            return None
+        now = time.time()
+        try:
+            expires_at: Optional[float] = now + int(payload.get("expires_in"))
+        except (TypeError, ValueError):
+            expires_at = None
+        return cls(str(payload["access_token"]), payload.get("refresh_token") or None, now, expires_at)
+
+    @property
+    def refresh_at(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.issued_at + (self.expires_at - self.issued_at) * API_TOKEN_REFRESH_FRACTION
+
+    def usable(self, now: Optional[float] = None) -> bool:
+        if self.expires_at is None:
+            return True
+        return (now or time.time()) < self.expires_at - API_TOKEN_EXPIRY_SKEW_SECONDS
+
+
+class TokenManager:
+    def __init__(self, form: Callable[[], Dict[str, str]]):
+        # `form` builds the password-grant fields (credentials, client id, scope).
+        self._form = form
+        self.token: Optional[Token] = None
+        self._refreshing: Optional[asyncio.Future] = None
+
+    def current(self) -> Optional[Token]:
+        token = self.token
+        return token if token is not None and token.usable() else None
+
+    async def ensure(self, client: httpx.AsyncClient) -> Optional[Token]:
+        """The current token, refreshing inline only when there is no usable one."""
+        return self.current() or await self.refresh(client, reason="expired" if self.token else "initial")
+
+    async def invalidate(self, client: httpx.AsyncClient, rejected: Optional[Token]) -> Optional[Token]:
+        """Handle a 401 for `rejected`; only the first caller per token triggers a grant."""
+        if rejected is not None and self.token is not None and self.token is not rejected:
+            return self.current() or await self.refresh(client, reason="expired")
+        return await self.refresh(client, reason="unauthorized", force=True)
+
+    async def refresh(
+        self,
+        client: httpx.AsyncClient,
+        reason: str = "proactive",
+        force: bool = False,
+        form: Optional[Dict[str, str]] = None,
+    ) -> Optional[Token]:
+        """Run (or join) a single token grant and swap the result in."""
+        if self._refreshing is not None:
+            return await asyncio.shield(self._refreshing)
+        if not force and reason != "proactive" and self.current() is not None:
+            return self.current()
+        future = self._refreshing = asyncio.get_running_loop().create_future()
+        try:
+            token = await self._grant(client, reason, form)
+        except asyncio.CancelledError:
+            future.set_result(None)
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved when nobody else was waiting.
+            raise
+        finally:
+            self._refreshing = None
+        future.set_result(token)
+        return token
+
+    async def _grant(self, client: httpx.AsyncClient, reason: str, form: Optional[Dict[str, str]]) -> Optional[Token]:
+        previous = self.token
+        if form is None and previous is not None and previous.refresh_token:
+            token = await self._request(client, "refresh_token", reason, {
+                **{k: v for k, v in self._form().items() if k in {"client_id", "scope"}},
+                "grant_type": "refresh_token",
+                "refresh_token": previous.refresh_token,
+            })
+            if token is not None:
+                return token
+        return await self._request(client, "password", reason, form or self._form())
+
+    async def _request(self, client: httpx.AsyncClient, grant: str, reason: str, form: Dict[str, str]) -> Optional[Token]:
+        if grant == "password" and (not form.get("username") or not form.get("password")):
+            logger.error("Missing API credentials. Set API_USER and API_PASS in environment.")
+            return None
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await client.post(
+                "/connect/token",
+                data=form,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                follow_redirects=True,
+            )
+            try:
+                payload = resp.json()
+            except ValueError:
+                payload = None
+            token = Token.from_response(payload) if resp.is_success else None
+            outcome = "ok" if token is not None else "rejected"
+        finally:
+            metrics.API_TOKEN_REFRESH.observe(time.perf_counter() - started, grant=grant, reason=reason, outcome=outcome)
+        if token is None:
+            logger.warning("Token %s grant failed (HTTP %s)", grant, resp.status_code)
+            return None
+        # One assignment: requests already holding the old token keep using it.
+        self.token = token
+        if token.expires_at is not None:
+            metrics.API_TOKEN_TTL.set(token.expires_at - token.issued_at)
+        logger.info("Obtained OAuth access token (%s grant, %s)", grant, reason)
+        return token
+
+    async def run(self, client: httpx.AsyncClient) -> None:
+        """Refresh ahead of expiry until cancelled."""
+        while True:
+            token = self.token
+            refresh_at = token.refresh_at if token is not None else None
+            if refresh_at is None:
+                # No token yet, or one without an expiry: nothing to schedule.
+                await asyncio.sleep(API_TOKEN_RETRY_SECONDS)
+                continue
+            delay = refresh_at - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self.token is not token:
+                    continue  # Replaced inline (401 or hard expiry) meanwhile.
+            try:
+                refreshed = await self.refresh(client, reason="proactive")
+            except Exception as exc:
+                # Anything else would end the refresher until the next request restarts it.
+                logger.warning("Background token refresh failed: %s", exc)
+                refreshed = None
+            if refreshed is None:
+                await asyncio.sleep(API_TOKEN_RETRY_SECONDS)
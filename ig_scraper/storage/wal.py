@@ -0,0 +1,322 @@
+"""Durable write-ahead spool for post writes.
+
+Every `PUT /api/app/scraper/posts` payload is appended to an on-disk log
+before it is sent, so posts scraped during a backend outage survive a crash
+or restart and are replayed later instead of being lost.
+
+Layout: `POST_SPOOL_DIR` holds append-only segments (`segment-00000001.wal`).
+Each line is `<crc32 hex> <json>`, where the JSON is either a `put` record
+(sequence number, endpoint, payload) or an `ack` for an earlier sequence. A
+torn or corrupt line (crash mid-write) fails its checksum and is skipped.
+
+- `append` writes the record and waits for the next group fsync. Concurrent
+  appends within `POST_SPOOL_FSYNC_MS` share one `fsync`.
+- `ack` marks a sequence delivered. Acks are not fsynced on their own; losing
+  one only means an idempotent upsert is replayed.
+- `claim`/`release` hand pending entries to the replayer without racing the
+  live write that is still in flight for them.
+- Segments roll over at `POST_SPOOL_SEGMENT_BYTES`. Sealed segments whose puts
+  are all acknowledged are deleted (any of their acks that still matter are
+  carried forward), and an empty log is removed on `close`.
+
+The directory is guarded by an exclusive `flock`; a second process pointed at
+the same directory gets `SpoolLocked` and should use its own directory.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from analytics import metrics
+from storage import serialization
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking, single process assumed.
+    fcntl = None
+
+
+POST_SPOOL_ENABLED = os.getenv("POST_SPOOL", "1").strip().lower() in {"1", "true", "yes"}
+POST_SPOOL_DIR = os.getenv("POST_SPOOL_DIR", "").strip() or str(
+    Path(__file__).resolve().parent / "spool"
+)
+POST_SPOOL_SEGMENT_BYTES = int(os.getenv("POST_SPOOL_SEGMENT_BYTES", str(4 * 1024 * 1024)) or "4194304")
+POST_SPOOL_FSYNC_MS = float(os.getenv("POST_SPOOL_FSYNC_MS", "5") or "5")
+
+SEGMENT_GLOB = "segment-*.wal"
+
+logger = logging.getLogger("ig_scraper.wal")
+
+# (seq, url, payload)
+Entry = Tuple[int, str, Any]
+
+
+class SpoolLocked(RuntimeError):
+    pass
+
+
+def _encode(record: Dict[str, Any]) -> bytes:
+    body = serialization.dumps(record)
+    return b"%08x " % zlib.crc32(body) + body + b"\n"
+
+
+def _decode(line: bytes) -> Optional[Dict[str, Any]]:
+    crc, _, body = line.rstrip(b"\n").partition(b" ")
+    try:
+        if len(crc) != 8 or int(crc, 16) != zlib.crc32(body):
+            return None
+        record = serialization.loads(body)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+class WriteAheadLog:
+    def __init__(
+        self,
+        directory: Union[str, Path] = POST_SPOOL_DIR,
+        segment_bytes: int = POST_SPOOL_SEGMENT_BYTES,
+        fsync_ms: float = POST_SPOOL_FSYNC_MS,
+    ):
+        self.directory = Path(directory)
+        self.segment_bytes = max(4096, segment_bytes)
+        self.fsync_interval = max(0.0, fsync_ms) / 1000.0
+        self._pending: Dict[int, Tuple[int, str, Any]] = {}  # seq -> (segment, url, payload)
+        self._in_flight: Set[int] = set()
+        self._segment_puts: Dict[int, Set[int]] = {}  # segment -> unacked seqs
+        self._segment_acks: Dict[int, Set[int]] = {}  # segment -> seqs it acknowledges
+        self._put_segment: Dict[int, int] = {}  # seq -> segment holding its put
+        self._next_seq = 1
+        self._segment = 0
+        self._fd: Optional[int] = None
+        self._size = 0
+        self._lock_fd: Optional[int] = None
+        self._batch: Optional[asyncio.Future] = None
+        self._io_lock: Optional[asyncio.Lock] = None
+        self.recovered = 0
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def open(self) -> "WriteAheadLog":
+        """Lock the directory, load unacknowledged entries and start a fresh segment."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock()
+        segments = sorted(self.directory.glob(SEGMENT_GLOB))
+        for path in segments:
+            self._load_segment(path)
+        self.recovered = len(self._pending)
+        if self._pending:
+            logger.info("Post spool %s: %d unacknowledged write(s) to replay", self.directory, self.recovered)
+        self._segment = max([self._segment_id(p) for p in segments] or [0]) + 1
+        self._open_segment()
+        self.compact()
+        metrics.POST_SPOOL_PENDING.set(len(self._pending))
+        return self
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if not self._pending:
+            for path in self.directory.glob(SEGMENT_GLOB):
+                path.unlink(missing_ok=True)
+            self._segment_puts.clear()
+            self._segment_acks.clear()
+            self._put_segment.clear()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _lock(self) -> None:
+        fd = os.open(self.directory / "LOCK", os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                raise SpoolLocked(f"post spool {self.directory} is in use by another process")
+        self._lock_fd = fd
+
+    @staticmethod
+    def _segment_id(path: Path) -> int:
+        try:
+            return int(path.stem.split("-", 1)[1])
+        except (IndexError, ValueError):
+            return 0
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"segment-{segment:08d}.wal"
+
+    def _load_segment(self, path: Path) -> None:
+        segment = self._segment_id(path)
+        self._segment_puts.setdefault(segment, set())
+        self._segment_acks.setdefault(segment, set())
+        skipped = 0
+        with open(path, "rb") as f:
+            for line in f:
+                record = _decode(line)
+                if record is None:
+                    skipped += 1
+                    continue
+                seq = int(record.get("seq") or 0)
+                self._next_seq = max(self._next_seq, seq + 1)
+                if record.get("op") == "put":
+                    self._pending[seq] = (segment, record.get("url", ""), record.get("payload"))
+                    self._segment_puts[segment].add(seq)
+                    self._put_segment[seq] = segment
+                elif record.get("op") == "ack":
+                    self._segment_acks[segment].add(seq)
+                    self._forget(seq)
+        if skipped:
+            logger.warning("Post spool %s: skipped %d torn or corrupt record(s)", path.name, skipped)
+
+    def _open_segment(self) -> None:
+        path = self._segment_path(self._segment)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._segment_puts.setdefault(self._segment, set())
+        self._segment_acks.setdefault(self._segment, set())
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._fd is None:
+            raise RuntimeError("post spool is not open")
+        data = _encode(record)
+        os.write(self._fd, data)
+        self._size += len(data)
+        metrics.POST_SPOOL_BYTES.inc(len(data))
+
+    # -- entries -------------------------------------------------------------
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def append(self, url: str, payload: Any) -> int:
+        """Durably record a write; returns its sequence number once fsynced."""
+        if self._size >= self.segment_bytes:
+            await self._rotate()
+        seq = self._next_seq
+        self._next_seq += 1
+        self._write({"op": "put", "seq": seq, "url": url, "payload": payload})
+        self._pending[seq] = (self._segment, url, payload)
+        self._segment_puts[self._segment].add(seq)
+        self._put_segment[seq] = self._segment
+        self._in_flight.add(seq)
+        metrics.POST_SPOOL_PENDING.set(len(self._pending))
+        await self._sync()
+        return seq
+
+    def ack(self, seq: int) -> None:
+        """Mark `seq` delivered (or permanently rejected) and compact what it frees."""
+        self._in_flight.discard(seq)
+        if seq not in self._pending:
+            return
+        self._write({"op": "ack", "seq": seq})
+        self._segment_acks[self._segment].add(seq)
+        self._forget(seq)
+        metrics.POST_SPOOL_PENDING.set(len(self._pending))
+        self.compact()
+
+    def release(self, seq: int) -> None:
+        """Hand an undelivered entry back to the replayer."""
+        self._in_flight.discard(seq)
+
+    def claim(self, limit: int = 0) -> List[Entry]:
+        """Pending entries not currently being sent, oldest first; marks them in flight."""
+        entries: List[Entry] = []
+        for seq in sorted(self._pending):
+            if seq in self._in_flight:
+                continue
+            _, url, payload = self._pending[seq]
+            self._in_flight.add(seq)
+            entries.append((seq, url, payload))
+            if limit and len(entries) >= limit:
+                break
+        return entries
+
+    def _forget(self, seq: int) -> None:
+        entry = self._pending.pop(seq, None)
+        if entry is not None:
+            self._segment_puts.get(entry[0], set()).discard(seq)
+
+    # -- durability ----------------------------------------------------------
+
+    async def _sync(self) -> None:
+        """Group commit: every append in the same window waits on one fsync."""
+        if self._batch is None:
+            loop = asyncio.get_running_loop()
+            self._batch = loop.create_future()
+            loop.create_task(self._flush(self._batch))
+        await asyncio.shield(self._batch)
+
+    async def _flush(self, batch: asyncio.Future) -> None:
+        if self.fsync_interval:
+            await asyncio.sleep(self.fsync_interval)
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        # Appends after this point belong to the next batch.
+        if self._batch is batch:
+            self._batch = None
+        try:
+            async with self._io_lock:
+                started = time.perf_counter()
+                await asyncio.to_thread(os.fsync, self._fd)
+                metrics.POST_SPOOL_FSYNC.observe(time.perf_counter() - started)
+        except Exception as exc:
+            if not batch.done():
+                batch.set_exception(exc)
+            return
+        if not batch.done():
+            batch.set_result(None)
+
+    async def _rotate(self) -> None:
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        async with self._io_lock:
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+            self._segment += 1
+            self._open_segment()
+        self.compact()
+
+    def compact(self) -> int:
+        """Delete sealed segments with no unacknowledged puts; returns how many were removed."""
+        removed = 0
+        for segment in sorted(self._segment_puts):
+            if segment == self._segment or self._segment_puts[segment]:
+                continue
+            # Acks for puts that live in surviving segments must not be lost.
+            carried = [
+                seq
+                for seq in self._segment_acks.get(segment, ())
+                if self._put_segment.get(seq, segment) != segment
+            ]
+            for seq in carried:
+                self._write({"op": "ack", "seq": seq})
+                self._segment_acks[self._segment].add(seq)
+            self._segment_path(segment).unlink(missing_ok=True)
+            for seq in [s for s, seg in self._put_segment.items() if seg == segment]:
+                del self._put_segment[seq]
+            del self._segment_puts[segment]
+            self._segment_acks.pop(segment, None)
+            removed += 1
+        if removed:
+            metrics.POST_SPOOL_COMPACTIONS.inc(removed)
+        return removed
+
+
+def open_default() -> Optional[WriteAheadLog]:
+    """Open the configured post spool; None when disabled or unavailable."""
+    if not POST_SPOOL_ENABLED:
+        return None
+    try:
+        return WriteAheadLog().open()
+    except (OSError, SpoolLocked) as exc:
+        logger.warning("Post spool disabled (%s); falling back to the in-memory spool", exc)
+        return None
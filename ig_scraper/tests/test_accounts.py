@@ -0,0 +1,40 @@
+from core.account_stats import apply_account_stats, record_account_outcome
+from core.accounts import rank_accounts
+
+
+def _rotate(accounts, runs, outcome="ok", run_stats=None):
+    stats, picked = {}, []
+    for cursor in range(runs):
+        ordered = rank_accounts(apply_account_stats(accounts, stats), rotation_offset=cursor)
+        username = ordered[0]["username"]
+        picked.append(username)
+        record_account_outcome(stats, username, outcome, run_stats or {"processed_targets": 5, "target_errors": 0})
+    return picked
+
+
+def test_rotation_cycles_when_every_account_succeeds():
+    accounts = [{"username": u} for u in "abcd"]
+    picked = _rotate(accounts, 12)
+    assert set(picked) == set("abcd")
+    assert set(picked[:4]) == set("abcd")
+
+
+def test_failing_account_drops_out_of_rotation():
+    accounts = [{"username": u} for u in "abc"]
+    stats = {"a": {"success_rate": 0.0, "failures": 8}}
+    for cursor in range(6):
+        ordered = rank_accounts(apply_account_stats(accounts, stats), rotation_offset=cursor, margin=0.2)
+        assert ordered[0]["username"] != "a"
+        assert ordered[-1]["username"] == "a"
+
+
+def test_ok_run_with_only_errors_earns_no_recency():
+    stats = {"a": {"failures": 2}}
+    entry = record_account_outcome(stats, "a", "ok", {"processed_targets": 0, "target_errors": 4})
+    assert entry["failures"] == 2
+    assert "last_success" not in entry
+    assert entry["success_rate"] == 0.0
+
+    entry = record_account_outcome(stats, "a", "ok", {"processed_targets": 3, "target_errors": 1})
+    assert entry["failures"] == 0
+    assert "last_success" in entry
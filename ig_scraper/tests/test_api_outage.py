@@ -0,0 +1,73 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from sim.fake_api import FakeAPIConfig, FakeLensAPI
+from storage import api_client, retry, wal
+
+POSTS = api_client.POSTS_ENDPOINT
+
+
+@pytest.fixture
+def fake_api(monkeypatch, tmp_path):
+    fake = FakeLensAPI([], FakeAPIConfig(seed=1)).start()
+    monkeypatch.setattr(api_client, "API_USER", fake.config.username)
+    monkeypatch.setattr(api_client, "API_PASS", fake.config.password)
+    monkeypatch.setattr(retry, "POLICIES", {k: replace(p, base_delay=0.01, max_delay=0.02) for k, p in retry.POLICIES.items()})
+    monkeypatch.setattr(wal, "open_default", lambda: wal.WriteAheadLog(tmp_path / "spool").open())
+    yield fake
+    fake.stop()
+
+
+def _client(fake) -> api_client.APIClient:
+    client = api_client.APIClient()
+    client.base = fake.url
+    client._breaker = retry.CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    return client
+
+
+def _post(n: int) -> dict:
+    return {"sourceId": "s", "externalPostId": f"/p/{n}", "content": "x"}
+
+
+def test_outage_opens_breaker_and_spool_replays(fake_api):
+    async def scenario():
+        client = _client(fake_api)
+        try:
+            fake_api.config.forced_status[POSTS] = 503
+            result = await client.write_posts([_post(1)])
+            assert result == {"items": [], "spooled": True}
+            assert client._breaker.state == retry.CircuitBreaker.OPEN
+            assert client.spool_depth == 1
+            assert not fake_api.posts
+
+            fake_api.config.forced_status.pop(POSTS)
+            await asyncio.sleep(0.25)
+            # The half-open probe succeeds, closes the circuit and schedules the drain.
+            await client.write_posts([_post(2)])
+            assert client._breaker.state == retry.CircuitBreaker.CLOSED
+            await client.drain_spool()
+            assert client.spool_depth == 0
+            assert set(fake_api.posts) == {"/p/1", "/p/2"}
+        finally:
+            client.close_spool()
+            await client.close()
+        assert client._token_refresher is None and client._spool_drainer is None
+
+    asyncio.run(scenario())
+
+
+def test_rejected_write_is_not_spooled(fake_api):
+    async def scenario():
+        client = _client(fake_api)
+        try:
+            fake_api.config.forced_status[POSTS] = 400
+            assert await client.write_posts([_post(1)]) is None
+            assert client.spool_depth == 0
+            assert client._breaker.state == retry.CircuitBreaker.CLOSED
+        finally:
+            client.close_spool()
+            await client.close()
+
+    asyncio.run(scenario())
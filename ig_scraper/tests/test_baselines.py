@@ -0,0 +1,26 @@
+import json
+
+from core import baselines
+
+
+def test_processes_merge_their_baselines(tmp_path, monkeypatch):
+    path = tmp_path / "baselines.json"
+    monkeypatch.setattr(baselines, "BASELINE_STATE_PATH", path)
+    monkeypatch.setattr(baselines, "ENABLE_BASELINE_WRITE", True)
+    monkeypatch.setattr(baselines, "record", lambda selector, h: None)
+
+    # Both processes loaded the file before either saved.
+    monkeypatch.setattr(baselines, "_known", None)
+    baselines._load()
+    first = baselines._known
+    monkeypatch.setattr(baselines, "_known", None)
+    baselines._load()
+    second = baselines._known
+
+    monkeypatch.setattr(baselines, "_known", first)
+    assert baselines.observe({"header": "h1", "grid": "g1"}) == 2
+    monkeypatch.setattr(baselines, "_known", second)
+    assert baselines.observe({"grid": "g2", "bio": "b1"}) == 2
+
+    saved = json.loads(path.read_text())
+    assert saved == {"header": ["h1"], "grid": ["g2", "g1"], "bio": ["b1"]}
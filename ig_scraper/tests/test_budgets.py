@@ -0,0 +1,41 @@
+import json
+
+from core import budgets
+
+
+def _planner(monkeypatch, username):
+    # Each process starts with its own view of the state file.
+    monkeypatch.setattr(budgets, "_state", None)
+    return budgets.BudgetPlanner({"opens": 100}, username, expected_targets=0)
+
+
+def test_concurrent_processes_merge_their_yields(tmp_path, monkeypatch):
+    path = tmp_path / "yields.json"
+    monkeypatch.setattr(budgets, "BUDGET_YIELD_STATE_PATH", path)
+
+    first = _planner(monkeypatch, "alice")
+    second = _planner(monkeypatch, "bob")
+    for plan, observed in ((first, {"t1": 4}), (second, {"t2": 6, "t3": 2})):
+        for source_id, new_posts in observed.items():
+            plan.settle(plan.for_target(source_id), source_id, new_posts)
+    first.close(1)
+    second.close(2)
+
+    saved = json.loads(path.read_text())
+    assert saved["targets"] == {"t1": 4.0, "t2": 6.0, "t3": 2.0}
+    assert saved["accounts"] == {"alice": 1.0, "bob": 2.0}
+
+
+def test_close_replays_observations_onto_saved_estimate(tmp_path, monkeypatch):
+    path = tmp_path / "yields.json"
+    monkeypatch.setattr(budgets, "BUDGET_YIELD_STATE_PATH", path)
+    monkeypatch.setattr(budgets, "BUDGET_YIELD_ALPHA", 0.5)
+
+    first = _planner(monkeypatch, "alice")
+    second = _planner(monkeypatch, "bob")
+    first.settle(first.for_target("t1"), "t1", 10)
+    second.settle(second.for_target("t1"), "t1", 2)
+    first.close(1)
+    second.close(1)
+
+    assert json.loads(path.read_text())["targets"]["t1"] == 6.0
@@ -0,0 +1,57 @@
+import asyncio
+import gzip
+
+from sim.fake_api import FakeAPIConfig, FakeLensAPI
+from storage import api_client, compression, wal
+
+
+def test_negotiator_skips_small_bodies():
+    negotiator = compression.Negotiator("gzip", min_bytes=100)
+    assert negotiator.choose(99) is None
+    assert negotiator.choose(100) == "gzip"
+
+
+def test_415_falls_back_to_an_offered_encoding(monkeypatch):
+    monkeypatch.setitem(compression.COMPRESSORS, "zstd", lambda data: data)
+    negotiator = compression.Negotiator("zstd", min_bytes=0)
+    assert negotiator.choose(10) == "zstd"
+    assert negotiator.rejected("zstd", "gzip;q=1.0, br") == "gzip"
+    assert negotiator.choose(10) == "gzip"
+
+
+def test_415_without_usable_encoding_turns_compression_off():
+    negotiator = compression.Negotiator("gzip", min_bytes=0)
+    assert negotiator.rejected("gzip", "identity") is None
+    assert not negotiator.enabled
+    assert negotiator.choose(10_000) is None
+
+
+def test_client_resends_uncompressed_after_415(monkeypatch, tmp_path):
+    monkeypatch.setattr(wal, "open_default", lambda: wal.WriteAheadLog(tmp_path / "spool").open())
+    fake = FakeLensAPI([], FakeAPIConfig(seed=1, accept_encodings=())).start()
+    monkeypatch.setattr(api_client, "API_USER", fake.config.username)
+    monkeypatch.setattr(api_client, "API_PASS", fake.config.password)
+
+    async def scenario():
+        client = api_client.APIClient()
+        client.base = fake.url
+        client._compression = compression.Negotiator("gzip", min_bytes=0)
+        try:
+            post = {"sourceId": "s", "externalPostId": "/p/1", "content": "x" * 500}
+            assert await client.write_posts([post]) is not None
+            assert not client._compression.enabled
+        finally:
+            client.close_spool()
+            await client.close()
+
+    try:
+        asyncio.run(scenario())
+        statuses = [status for method, path, status, _ in fake.request_log if path == api_client.POSTS_ENDPOINT]
+        assert statuses[0] == 415 and statuses[-1] < 400
+        assert "/p/1" in fake.posts
+    finally:
+        fake.stop()
+
+
+def test_gzip_round_trips():
+    assert gzip.decompress(compression.compress(b"payload", "gzip")) == b"payload"
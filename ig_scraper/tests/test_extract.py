@@ -0,0 +1,39 @@
+import asyncio
+
+from core import extract
+
+
+class _Scope:
+    """A frame that only gets the bundle once it is evaluated in it."""
+
+    def __init__(self, installed=False):
+        self.installed = installed
+        self.scripts = []
+
+    async def evaluate(self, script, arg=None):
+        self.scripts.append(script)
+        if script == extract.BUNDLE_SCRIPT:
+            self.installed = True
+            return None
+        name, value = arg
+        return {"value": [name, value]} if self.installed else {"missing": True}
+
+
+def test_call_uses_the_installed_bundle():
+    scope = _Scope(installed=True)
+    assert asyncio.run(extract.call(scope, "probe", ["a"])) == ["probe", ["a"]]
+    assert extract.BUNDLE_SCRIPT not in scope.scripts
+
+
+def test_call_injects_the_bundle_into_a_scope_without_it():
+    scope = _Scope()
+    assert asyncio.run(extract.call(scope, "grid", {"op": "collect"})) == ["grid", {"op": "collect"}]
+    assert scope.scripts.count(extract.BUNDLE_SCRIPT) == 1
+    # Later calls find it in place.
+    asyncio.run(extract.call(scope, "grid", {"op": "scroll"}))
+    assert scope.scripts.count(extract.BUNDLE_SCRIPT) == 1
+
+
+def test_bundle_namespace_carries_the_version():
+    assert extract.BUNDLE_VERSION in extract.BUNDLE_SCRIPT
+    assert extract.BUNDLE_VERSION in extract._CALL_SCRIPT
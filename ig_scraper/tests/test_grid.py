@@ -0,0 +1,49 @@
+import asyncio
+
+from core import grid
+
+
+def _record_calls(monkeypatch):
+    calls = []
+
+    async def call(page, name, args):
+        calls.append((args["op"], args["reset"]))
+        return {"links": [f"/p/{len(calls)}"], "outcome": "links", "atEnd": False}
+
+    monkeypatch.setattr(grid.extract, "call", call)
+    return calls
+
+
+def test_scroll_as_first_op_resets_the_visit(monkeypatch):
+    calls = _record_calls(monkeypatch)
+    collector = grid.GridCollector(page=None, key="/alice/")
+
+    async def run():
+        await collector.scroll()
+        await collector.scroll()
+
+    asyncio.run(run())
+    assert calls == [("scroll", True), ("scroll", False)]
+
+
+def test_collect_as_first_op_resets_the_visit(monkeypatch):
+    calls = _record_calls(monkeypatch)
+    collector = grid.GridCollector(page=None, key="/alice/")
+
+    async def run():
+        return await collector.collect(), await collector.scroll()
+
+    assert asyncio.run(run()) == (["/p/1"], ["/p/2"])
+    assert calls == [("collect", True), ("scroll", False)]
+
+
+def test_primed_collector_does_not_reset_again(monkeypatch):
+    calls = _record_calls(monkeypatch)
+    collector = grid.GridCollector(page=None, key="/alice/")
+    collector.prime({"links": ["/p/0"], "outcome": "initial"})
+
+    async def run():
+        return await collector.collect(), await collector.scroll()
+
+    assert asyncio.run(run()) == (["/p/0"], ["/p/1"])
+    assert calls == [("scroll", False)]
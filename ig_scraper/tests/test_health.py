@@ -0,0 +1,50 @@
+from core import health
+from core.account_stats import record_account_outcome
+
+
+def _monitor(monkeypatch, samples=3):
+    monkeypatch.setattr(health, "EXTRACTION_HEALTH_MIN_SAMPLES", samples)
+    run = health.ExtractionHealth("run", window=5)
+    return run, health.ExtractionHealth("alice", parent=run, window=5)
+
+
+def test_captionless_posts_do_not_trip(monkeypatch):
+    run, account = _monitor(monkeypatch)
+    # Empty captions with the caption element present are content, not a layout break.
+    for _ in range(5):
+        account.record_post([])
+    assert not account.tripped
+
+
+def test_selector_misses_trip_account_and_run(monkeypatch):
+    run, account = _monitor(monkeypatch)
+    account.record_post([])
+    assert not account.tripped
+    for _ in range(2):
+        account.record_post(["caption", "likes"])
+    assert account.tripped
+    assert run.tripped
+    assert "selector hit rate" in account.trip_reason
+
+
+def test_empty_grids_trip_after_min_samples(monkeypatch):
+    run, account = _monitor(monkeypatch)
+    account.record_grid(False)
+    account.record_grid(False)
+    assert not account.tripped
+    account.record_grid(False)
+    assert account.trip_reason.startswith("empty grid rate")
+
+
+def test_run_trip_stops_every_account(monkeypatch):
+    run, first = _monitor(monkeypatch)
+    second = health.ExtractionHealth("bob", parent=run, window=5)
+    for _ in range(3):
+        first.record_grid(False)
+    assert second.tripped
+
+
+def test_degraded_outcome_leaves_reputation_alone():
+    stats = {"alice": {"success_rate": 0.9, "failures": 0}}
+    assert record_account_outcome(stats, "alice", "extraction_degraded", {"target_errors": 4}) is None
+    assert stats == {"alice": {"success_rate": 0.9, "failures": 0}}
@@ -0,0 +1,47 @@
+import time
+
+from core import leases
+from core.records import Target
+
+
+def _store(tmp_path, round_id="r1"):
+    store = leases.LeaseStore(str(tmp_path / "leases.sqlite3"), round_id)
+    for holder in ("a:1", "b:2"):
+        store.register(holder, holder[0], time.time())
+    return store
+
+
+def test_released_lease_is_not_renewed(tmp_path):
+    store = _store(tmp_path)
+    target = Target("user", "1")
+    key = leases.target_key(target)
+    now = time.time()
+    assert store.claim(key, target, "a:1", "a", now) == leases.CLAIMED
+    store.release([key], "a:1", now)
+    store.renew("a:1", now + 1)
+    assert [t.username for t in store.stragglers(now + 2)] == ["user"]
+    assert store.claim(key, target, "b:2", "b", now + 2) == leases.RECLAIMED
+
+
+def test_close_releases_everything_held(tmp_path):
+    store = _store(tmp_path)
+    targets = [Target(f"u{i}", str(i)) for i in range(3)]
+    now = time.time()
+    for t in targets:
+        store.claim(leases.target_key(t), t, "a:1", "a", now)
+    store.release([], "a:1", now)
+    store.heartbeat("a:1", now)
+    store.renew("a:1", now + 1)
+    assert sorted(t.username for t in store.stragglers(now + 2)) == ["u0", "u1", "u2"]
+
+
+def test_done_lasts_for_its_round_only(tmp_path):
+    store = _store(tmp_path)
+    target = Target("user", "1")
+    key = leases.target_key(target)
+    now = time.time()
+    store.claim(key, target, "a:1", "a", now)
+    store.complete(key, "a:1", now)
+    assert store.claim(key, target, "b:2", "b", now + 1) == leases.DONE
+    next_round = leases.LeaseStore(str(tmp_path / "leases.sqlite3"), "r2")
+    assert next_round.claim(key, target, "b:3", "b", now + 2) == leases.CLAIMED
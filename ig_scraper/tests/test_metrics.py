@@ -0,0 +1,9 @@
+from analytics import metrics
+
+
+def test_busy_metrics_port_is_not_fatal():
+    server = metrics.ThreadingHTTPServer(("127.0.0.1", 0), metrics._MetricsHandler)
+    try:
+        assert metrics.start_http_server(port=server.server_address[1]) is None
+    finally:
+        server.server_close()
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from core.pages import PagePool
+
+
+class _Page:
+    def __init__(self, stubborn=False):
+        self.stubborn = stubborn
+
+    async def goto(self, url, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            if not self.stubborn:
+                raise
+            # A navigation that takes a while to wind down after being cancelled.
+            await asyncio.sleep(10)
+
+
+def test_discard_prefetches_frees_pages():
+    async def run():
+        pool = PagePool(ctx=None, page=_Page(), size=2)
+        assert pool.prefetch("https://example.com/a/")
+        await asyncio.sleep(0)
+        await pool.discard_prefetches()
+        return pool
+
+    pool = asyncio.run(run())
+    assert len(pool._free) == 1
+    assert not pool._prefetched
+
+
+def test_discard_prefetches_keeps_caller_cancellation():
+    async def run():
+        pool = PagePool(ctx=None, page=_Page(stubborn=True), size=2)
+        pool.prefetch("https://example.com/a/")
+        await asyncio.sleep(0)
+        discard = asyncio.create_task(pool.discard_prefetches())
+        await asyncio.sleep(0.05)
+        discard.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await discard
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+import asyncio
+
+from core import probe
+
+
+def _page(monkeypatch, present):
+    calls = []
+
+    async def call(scope, name, selectors):
+        calls.append(selectors)
+        if present is None:
+            raise RuntimeError("frame detached")
+        return [sel in present for sel in selectors]
+
+    monkeypatch.setattr(probe.extract, "call", call)
+    return calls
+
+
+def test_first_match_follows_selector_order(monkeypatch):
+    calls = _page(monkeypatch, {"button.b", "text=Not Now"})
+    selectors = ["button.a", "", "text=Not Now", "button.b"]
+    assert asyncio.run(probe.first_match(None, selectors)) == "text=Not Now"
+    # One round-trip for the whole list; empty selectors are not sent.
+    assert calls == [["button.a", "text=Not Now", "button.b"]]
+
+
+def test_first_match_without_hits_or_on_errors(monkeypatch):
+    _page(monkeypatch, set())
+    assert asyncio.run(probe.first_match(None, ["button.a"])) == ""
+    _page(monkeypatch, None)
+    assert asyncio.run(probe.first_match(None, ["button.a"])) == ""
+    calls = _page(monkeypatch, {"x"})
+    assert asyncio.run(probe.first_match(None, [])) == ""
+    assert calls == []
+
+
+def test_probe_scopes_keeps_scope_order(monkeypatch):
+    async def call(scope, name, selectors):
+        await asyncio.sleep(0.01 if scope == "slow" else 0)
+        return [scope == "slow", True]
+
+    monkeypatch.setattr(probe.extract, "call", call)
+    result = asyncio.run(probe.probe_scopes(["slow", "fast"], ["#a", "#b"]))
+    assert result == [("slow", ["#a", "#b"]), ("fast", ["#b"])]
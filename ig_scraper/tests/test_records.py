@@ -0,0 +1,25 @@
+from core.records import Comment, PostRecord, Target
+
+
+def test_post_record_serializes_to_api_shape():
+    comments = [c for c in map(Comment.from_raw, [{"author": " a ", "text": " hi "}, {"text": "  "}, "junk"]) if c]
+    record = PostRecord("s1", "/p/1", "2026-01-01T00:00:00", "https://www.instagram.com/p/1", "caption", 700, comments)
+    assert record.to_api() == {
+        "sourceId": "s1",
+        "externalPostId": "/p/1",
+        "postDate": "2026-01-01T00:00:00",
+        "postUrl": "https://www.instagram.com/p/1",
+        "content": "caption",
+        "keywords": "",
+        "keywordMatchedCount": 0,
+        "isSummarized": False,
+        "sentimentScore": 700,
+        "commentCount": 1,
+        "comments": [{"author": "a", "text": "hi"}],
+    }
+
+
+def test_records_have_no_instance_dict():
+    target = Target("alice", "s1")
+    assert not hasattr(target, "__dict__")
+    assert target.to_dict() == {"username": "alice", "source_id": "s1", "source_url": ""}
@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+from core import shards
+from core.records import Target
+from core.targets import TargetFeed
+
+
+def test_shard_accounts_round_robin():
+    assert shards.shard_accounts(5, 2) == [[0, 2, 4], [1, 3]]
+    # Never more shards than accounts, never an empty shard.
+    assert shards.shard_accounts(2, 4) == [[0], [1]]
+    assert shards.shard_accounts(3, 0) == [[0, 1, 2]]
+
+
+def test_per_process_concurrency_rounds_up():
+    assert shards.per_process_concurrency(5, 2) == 3
+    assert shards.per_process_concurrency(1, 4) == 1
+    assert shards.per_process_concurrency(4, 0) == 4
+
+
+def _exiting_worker(worker, accounts, target_queues, results, concurrency):
+    """Stand-in for `_worker_main`: worker 0 dies after its first account."""
+    for n, (idx, account) in enumerate(accounts):
+        if worker == 0 and n == 1:
+            results.close()
+            results.join_thread()
+            os._exit(3)
+        count = 0
+        while target_queues[idx].get() not in (shards._END, shards._SKIP):
+            count += 1
+        results.put((idx, "ok", "ok", {"processed_targets": count}))
+
+
+async def _stream(count):
+    for i in range(count):
+        yield Target(f"u{i}", str(i), "")
+
+
+def test_run_sharded_fails_accounts_of_an_exited_worker(monkeypatch):
+    monkeypatch.setattr(shards, "_worker_main", _exiting_worker)
+    accounts = [{"username": name} for name in ("a", "b", "c")]
+    recorded = []
+
+    async def run():
+        feed = TargetFeed(len(accounts))
+        producer = asyncio.create_task(feed.run(_stream(6)))
+        results = await shards.run_sharded(
+            accounts, feed, 2, 1, 0, lambda acc, result: recorded.append((acc["username"], result))
+        )
+        await producer
+        return results
+
+    results = asyncio.run(run())
+    assert results[:2] == ["ok", "ok"]
+    assert isinstance(results[2], RuntimeError)
+    assert "exited with code 3" in str(results[2])
+    assert accounts[0]["_run_stats"] == {"processed_targets": 2}
+    assert sorted(name for name, _ in recorded) == ["a", "b", "c"]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from core.records import Target
+from core.targets import TargetFeed, build_targets_bulk, build_targets_scalar
+
+
+def _source(i, url=None, handle=None, platform=4):
+    return {"id": f"s{i}", "sourceUrl": url, "sourceHandle": handle, "platform": platform}
+
+
+SOURCES = [
+    _source(0, "https://www.instagram.com/Alice/"),
+    _source(1, None, "\xa0bob\xa0"),
+    _source(2, "", "@İzmir"),
+    _source(3, "https://instagram.com/\xa0carol"),
+    _source(4, "https://INSTAGRAM.com/p/abc", "@Dave/"),
+    _source(5, "https://İnstagram.com/erin", "erin_handle"),
+    _source(6, "https://facebook.com/frank", "frank"),
+    _source(7, "https://instagram.com/İLKER", None),
+    _source(8, None, " \x1fgina "),
+    _source(9, "https://instagram.com/STORİES", "h"),
+    _source(10, "https://instagram.com/alice", "alice", platform="3"),
+    _source(11, "//instagram.com/@Ivy?hl=en", None),
+]
+
+
+@pytest.mark.parametrize("dedup", [True, False])
+def test_bulk_and_scalar_paths_agree(dedup):
+    pytest.importorskip("pandas")
+    assert build_targets_bulk(SOURCES, dedup) == build_targets_scalar(SOURCES, dedup)
+
+
+async def _stream(names):
+    for name in names:
+        yield Target(name, name, "")
+
+
+def test_failover_replays_targets_the_failed_account_pulled():
+    names = [f"u{i}" for i in range(5)]
+
+    async def run():
+        feed = TargetFeed(1, maxsize=2, replayable=True)
+        producer = asyncio.create_task(feed.run(_stream(names)))
+        assert await feed.ready(0)
+        first = feed.targets(0)
+        # The failed account pulled two targets (one in progress, one prefetched) and stopped.
+        pulled = [(await first.__anext__()).username for _ in range(2)]
+        await first.aclose()
+        assert feed.handed_out(0) == 2
+        second = [t.username async for t in feed.targets(0, replay=True)]
+        await producer
+        return pulled, second
+
+    pulled, second = asyncio.run(run())
+    assert pulled == ["u0", "u1"]
+    assert second == names
@@ -0,0 +1,83 @@
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from sim.fake_api import FakeAPIConfig, FakeLensAPI
+from storage import api_client, retry, wal
+
+
+def _log(path):
+    return wal.WriteAheadLog(path, fsync_ms=0).open()
+
+
+def test_unacked_writes_are_replayed_after_restart(tmp_path):
+    log = _log(tmp_path)
+
+    async def write():
+        return [await log.append("/api/posts", {"n": n}) for n in range(3)]
+
+    seqs = asyncio.run(write())
+    log.ack(seqs[0])
+    # Simulate a crash: the segment stays behind, only the lock goes away.
+    log.close()
+
+    # A line torn by the crash fails its checksum and is skipped.
+    segment = next(tmp_path.glob(wal.SEGMENT_GLOB))
+    with open(segment, "ab") as f:
+        f.write(b'deadbeef {"op":"put","seq":9')
+
+    reopened = _log(tmp_path)
+    try:
+        assert reopened.recovered == 2
+        assert reopened.claim() == [(seqs[1], "/api/posts", {"n": 1}), (seqs[2], "/api/posts", {"n": 2})]
+        # Claimed entries are not handed out twice until released.
+        assert reopened.claim() == []
+        reopened.release(seqs[1])
+        assert [seq for seq, _, _ in reopened.claim()] == [seqs[1]]
+    finally:
+        reopened.close()
+
+
+def test_fully_acked_log_leaves_no_segments(tmp_path):
+    log = _log(tmp_path)
+    seq = asyncio.run(log.append("/api/posts", {"n": 1}))
+    log.ack(seq)
+    log.close()
+    assert not list(tmp_path.glob(wal.SEGMENT_GLOB))
+
+
+@pytest.mark.skipif(wal.fcntl is None, reason="no advisory locking on this platform")
+def test_locked_spool_falls_back_to_memory(tmp_path, monkeypatch):
+    holder = _log(tmp_path / "spool")
+    with pytest.raises(wal.SpoolLocked):
+        _log(tmp_path / "spool")
+
+    original = wal.WriteAheadLog
+    monkeypatch.setattr(wal, "WriteAheadLog", lambda: original(tmp_path / "spool"))
+    assert wal.open_default() is None
+
+    fake = FakeLensAPI([], FakeAPIConfig(seed=1)).start()
+    monkeypatch.setattr(api_client, "API_USER", fake.config.username)
+    monkeypatch.setattr(api_client, "API_PASS", fake.config.password)
+    monkeypatch.setattr(retry, "POLICIES", {k: replace(p, base_delay=0.01, max_delay=0.02) for k, p in retry.POLICIES.items()})
+
+    async def scenario():
+        client = api_client.APIClient()
+        client.base = fake.url
+        client._breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        try:
+            fake.config.forced_status[api_client.POSTS_ENDPOINT] = 503
+            post = {"sourceId": "s", "externalPostId": "/p/1", "content": "x"}
+            assert await client.write_posts([post]) == {"items": [], "spooled": True}
+            assert client._wal is None
+            assert client.spool_depth == 1
+        finally:
+            client.close_spool()
+            await client.close()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        fake.stop()
+        holder.close()